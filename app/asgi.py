@@ -0,0 +1,164 @@
+# app/asgi.py
+"""
+ASGI entry point that serves the session status streams from a single asyncio
+event loop, so idle browsers do not each hold a worker thread.
+
+Requests for /session/<session_id>/upload-status are answered here with the same
+event format as the Flask SSE route. All other requests are passed to the Flask
+app through asgiref.
+
+Run with any ASGI server from the app directory, for example:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Each worker process builds its own app; set EVENT_BROKER=sqlite when running
+several (e.g. --workers 4) so streams receive events of jobs in other workers.
+"""
+
+import os
+import re
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import parse_qs
+from asgiref.wsgi import WsgiToAsgi
+from main import create_app
+from handlers.route_handler import event_type, parse_last_event_id
+from services.tracing import span
+
+STATUS_PATH = re.compile(r'^/session/(?P<session_id>[^/]+)/upload-status/?$')
+
+class EventStreamApp:
+    def __init__(self, status_service, fallback=None, heartbeat_interval: float = 30):
+        """
+        Initialize the ASGI event stream application.
+
+        Args:
+            status_service: Status broker providing the session events
+            fallback: Optional ASGI app handling all other requests
+            heartbeat_interval: Seconds without events after which a heartbeat is sent
+        """
+        self.status_service = status_service
+        self.fallback = fallback
+        self.heartbeat_interval = heartbeat_interval
+        self.logger = logging.getLogger(__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        match = STATUS_PATH.match(scope.get('path', '')) if scope['type'] == 'http' else None
+        if match and scope.get('method') == 'GET':
+            await self._stream(match.group('session_id'), scope, receive, send)
+        elif self.fallback is not None:
+            await self.fallback(scope, receive, send)
+        else:
+            await self._not_found(send)
+
+    async def _lifespan(self, receive, send) -> None:
+        """Acknowledge server startup and shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _not_found(self, send) -> None:
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'text/plain')]
+        })
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+
+    async def _stream(self, session_id: str, scope, receive, send) -> None:
+        """
+        Stream a session's status events until the client disconnects, first
+        replaying those after the client's Last-Event-ID.
+
+        Args:
+            session_id: The session identifier
+            scope: ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        client = scope.get('client') or ('unknown', 0)
+        headers = dict(scope.get('headers') or [])
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        last_event_id = parse_last_event_id(
+            headers.get(b'last-event-id', b'').decode('latin-1') or query.get('last_event_id', [None])[0]
+        )
+        subscription = self.status_service.subscribe_async(
+            session_id, asyncio.get_running_loop(), last_event_id
+        )
+        disconnected = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        self.logger.info(f"Async client connected from: {client[0]} (session {session_id})")
+
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'connection', b'keep-alive'),
+                    (b'x-accel-buffering', b'no')
+                ]
+            })
+
+            while not disconnected.done():
+                next_event = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {next_event, disconnected},
+                    timeout=self.heartbeat_interval,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if next_event in done:
+                    event_id, event = next_event.result()
+                    with span('sse', 'delivery', session_id=session_id, event=event_type(event)):
+                        await send({'type': 'http.response.body',
+                                    'body': f"id: {event_id}\ndata: {event}\n\n".encode('utf-8'),
+                                    'more_body': True})
+                    continue
+
+                next_event.cancel()
+                if disconnected in done:
+                    break
+                await send({'type': 'http.response.body', 'body': b'data: {"type": "heartbeat"}\n\n', 'more_body': True})
+
+        except OSError:
+            # The client went away while an event was being written
+            pass
+        finally:
+            disconnected.cancel()
+            self.status_service.unsubscribe(subscription)
+            self.logger.info(f"Async client disconnected: {client[0]} (session {session_id})")
+
+    @staticmethod
+    async def _wait_for_disconnect(receive) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+def create_asgi_app(heartbeat_interval: Optional[float] = None) -> EventStreamApp:
+    """
+    Create the Flask app and build the ASGI application around its status service.
+
+    Args:
+        heartbeat_interval: Optional seconds between heartbeats on idle streams
+
+    Returns:
+        EventStreamApp: ASGI application
+    """
+    flask_app = create_app()
+    return EventStreamApp(
+        flask_app.extensions['status_service'],
+        fallback=WsgiToAsgi(flask_app),
+        heartbeat_interval=heartbeat_interval or 30
+    )
+
+application = create_asgi_app(float(os.getenv('SSE_HEARTBEAT_INTERVAL', 30)))
@@ -1,21 +1,43 @@
 # app/handlers/route_handler.py
 
+import json
 import logging
-import threading
 import queue 
-from typing import Tuple
+from typing import Any, Dict, Optional, Tuple
 from flask import jsonify, render_template, redirect, url_for, Response, request
 from flask import stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.job_executor import QueueFullError
+from services.file_handler import UploadRejectedError
+from services.metrics import UPLOADS_REJECTED, UPLOADS_DEDUPLICATED
+from services.tracing import activate, span
+
+def event_type(event: Any) -> str:
+    """Get the type of a status event for its delivery span (e.g. 'license', 'progress')."""
+    try:
+        data = json.loads(event) if isinstance(event, str) else event
+        return str(data.get('type') or data.get('status') or 'unknown')
+    except (ValueError, AttributeError):
+        return 'unknown'
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    """Parse the Last-Event-ID a reconnecting client sends, ignoring malformed values."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
 
 class RouteHandler:
     def __init__(self, session_manager, file_handler, processing_service, status_service,
-                 process_license_and_upload, process_tire_brand_and_upload):
+                 job_queue, job_executor, plate_index, trace_store):
         self.session_manager = session_manager
         self.file_handler = file_handler
         self.processing_service = processing_service
         self.status_service = status_service
-        self.process_license_and_upload = process_license_and_upload
-        self.process_tire_brand_and_upload = process_tire_brand_and_upload
+        self.job_queue = job_queue
+        self.job_executor = job_executor
+        self.plate_index = plate_index
+        self.trace_store = trace_store
         self.logger = logging.getLogger(__name__)
 
     def index(self):
@@ -58,78 +80,214 @@ class RouteHandler:
             self.logger.error(f"Error loading tire brand page: {e}")
             return render_template('tire_brand.html', session_id=session_id)
 
-    def handle_license_plate_upload(self, session_id: str) -> Tuple[dict, int]:
+    def _receive_upload(self, session_id: str, prefix: str):
+        """
+        Receive the uploaded image of a request, refusing it as early as possible.
+
+        The session quota is checked against the announced length before the body
+        is read; the size and image header are checked while it is received.
+
+        Args:
+            session_id: The session identifier
+            prefix: Prefix for the filename (e.g., 'license', 'tire_brand')
+
+        Returns:
+            ImageBuffer: Buffer holding the upload, counted against the session quota
+
+        Raises:
+            UploadRejectedError: If the upload is refused
+        """
+        self.session_manager.check_upload_quota(session_id, request.content_length)
+
         try:
-            if 'image' not in request.files:
-                return {'error': 'No image file provided'}, 400
+            files = request.files
+        except RequestEntityTooLarge:
+            raise UploadRejectedError("Upload exceeds the maximum request size", 413)
+        if 'image' not in files:
+            raise UploadRejectedError("No image file provided", 400)
+
+        with span('request', 'save', prefix=prefix):
+            image = self.file_handler.save_temporary_file(files['image'], session_id, prefix)
+        if image is None:
+            raise UploadRejectedError("Failed to save uploaded file", 500)
 
-            image = request.files['image']
-            image_path = self.file_handler.save_temporary_file(image, session_id, 'license')
+        try:
+            self.session_manager.reserve_upload(session_id, image.size)
+        except Exception:
+            image.close()
+            raise
+        return image
+
+    def _submit_job(self, kind: str, image, session_id: str) -> Tuple[dict, int, Dict[str, str]]:
+        """
+        Hand an upload job to the durable job queue.
+
+        A repeated upload of an image already being processed for the session and
+        step gets the running job's ID, and its results arrive on the same status
+        stream; it is not counted against the session's upload limits.
+        
+        Args:
+            kind: Job type ('license' or 'tire_brand')
+            image: ImageBuffer holding the upload, owned by the job from here on
+            session_id: The session identifier
             
-            if not image_path:
-                return {'error': 'Failed to save uploaded file'}, 500
+        Returns:
+            Tuple[dict, int, Dict[str, str]]: Response body, status code and headers
+
+        Raises:
+            Exception: If the job could not be queued; the quota and image are released first
+        """
+        # The queue closes a duplicate's image, so keep its size for releasing the quota
+        size = image.size
+        try:
+            job_id, created = self.job_queue.submit(kind, image, session_id)
+        except QueueFullError as e:
+            UPLOADS_REJECTED.inc(status='503')
+            self.session_manager.release_upload(session_id, size)
+            image.close()
+            return (
+                {'error': 'Server is busy, please retry shortly', 'retry_after': e.retry_after},
+                503,
+                {'Retry-After': str(e.retry_after)}
+            )
+        except Exception:
+            # Nothing was queued, so the upload neither counts nor keeps its buffer or spool file
+            self.session_manager.release_upload(session_id, size)
+            image.close()
+            raise
+
+        if not created:
+            UPLOADS_DEDUPLICATED.inc(job=kind)
+            self.session_manager.release_upload(session_id, size)
+            return (
+                {'message': 'File upload already in progress', 'job_id': job_id, 'duplicate': True},
+                202,
+                {'Location': f'/jobs/{job_id}'}
+            )
 
-            # Use the instance method instead of global function
-            threading.Thread(
-                target=self.process_license_and_upload,
-                args=(image_path, session_id)
-            ).start()
+        return {'message': 'File upload started', 'job_id': job_id}, 202, {'Location': f'/jobs/{job_id}'}
 
-            return {'message': 'File upload started'}, 202
+    def handle_license_plate_upload(self, session_id: str) -> Tuple[dict, int, Dict[str, str]]:
+        try:
+            with activate(session_id), span('request', 'intake', step='license') as attributes:
+                image = self._receive_upload(session_id, 'license')
+                attributes['image_bytes'] = image.size
+                return self._submit_job('license', image, session_id)
 
+        except UploadRejectedError as e:
+            UPLOADS_REJECTED.inc(status=str(e.status_code))
+            return {'error': str(e)}, e.status_code, {}
         except Exception as e:
             self.logger.error(f"An error occurred while uploading: {e}")
-            return {'error': str(e)}, 500
+            return {'error': str(e)}, 500, {}
 
-    def handle_tire_brand_upload(self, session_id: str) -> Tuple[dict, int]:
+    def handle_tire_brand_upload(self, session_id: str) -> Tuple[dict, int, Dict[str, str]]:
         try:
             self.logger.info(f"Starting tire brand upload for session {session_id}")
             
-            if 'image' not in request.files:
-                self.logger.error("No image file in request")
-                return {'error': 'No image file provided'}, 400
+            with activate(session_id), span('request', 'intake', step='tire_brand') as attributes:
+                image = self._receive_upload(session_id, 'tire_brand')
+                attributes['image_bytes'] = image.size
+                return self._submit_job('tire_brand', image, session_id)
+
+        except UploadRejectedError as e:
+            self.logger.error(f"Tire brand upload rejected: {e}")
+            UPLOADS_REJECTED.inc(status=str(e.status_code))
+            return {'error': str(e)}, e.status_code, {}
+        except Exception as e:
+            self.logger.error(f"Error in upload_tire_brand: {str(e)}")
+            return {'error': str(e)}, 500, {}
+
+    def plate_history(self, plate: str) -> Tuple[dict, int]:
+        """
+        List past inspections of a license plate.
+        
+        Args:
+            plate: License plate in any formatting
             
-            image = request.files['image']
-            image_path = self.file_handler.save_temporary_file(image, session_id, 'tire_brand')
+        Returns:
+            Tuple[dict, int]: Paginated inspections and status code
+        """
+        try:
+            page = request.args.get('page', 1, type=int)
+            per_page = request.args.get('per_page', 20, type=int)
+            if not self.plate_index.normalize_plate(plate):
+                return {'error': 'Invalid license plate'}, 400
+            return self.plate_index.find_by_plate(plate, page=page, per_page=per_page), 200
+        except Exception as e:
+            self.logger.error(f"Error querying plate history: {e}")
+            return {'error': str(e)}, 500
+
+    def session_trace(self, session_id: str) -> Tuple[dict, int]:
+        """
+        Get the span timeline of a session.
+        
+        Args:
+            session_id: The session identifier
             
-            if not image_path:
-                return {'error': 'Failed to save uploaded file'}, 500
+        Returns:
+            Tuple[dict, int]: Trace and status code
+        """
+        trace = self.trace_store.get_trace(session_id)
+        if trace is None:
+            return {'error': 'No trace recorded for this session'}, 404
+        return trace, 200
 
-            # Use the instance method instead of global function
-            threading.Thread(
-                target=self.process_tire_brand_and_upload,
-                args=(image_path, session_id)
-            ).start()
+    def job_status(self, job_id: str) -> Tuple[dict, int]:
+        """
+        Get the state of an upload job.
+        
+        Args:
+            job_id: Job identifier returned by the upload
+            
+        Returns:
+            Tuple[dict, int]: Job and status code
+        """
+        job = self.job_queue.get_job(job_id)
+        if job is None:
+            return {'error': 'Unknown job'}, 404
+        return job, 200
 
-            return {'message': 'File upload started'}, 202
+    def job_queue_status(self) -> Dict[str, Any]:
+        """Get worker pool statistics (queue depth, wait times) and persisted job counts."""
+        return {**self.job_executor.get_stats(), 'jobs': self.job_queue.get_stats()}
+        
+    def handle_status_updates(self, session_id: str) -> Response:
+        """
+        Handle the status update stream of a session.
 
-        except Exception as e:
-            self.logger.error(f"Error in upload_tire_brand: {str(e)}")
-            return {'error': str(e)}, 500
+        Events carry their ID; a client reconnecting with the Last-Event-ID header
+        (or the last_event_id query parameter) is sent the events it missed first.
         
-    def handle_status_updates(self) -> Response:
-        """Handle status update stream."""
-        status_queue = self.status_service.get_status_queue()
+        Args:
+            session_id: The session identifier
+        """
+        last_event_id = parse_last_event_id(
+            request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        )
+        subscription = self.status_service.subscribe(session_id, last_event_id)
         
         @stream_with_context
         def generate():
             try:
                 client_ip = request.remote_addr
-                self.logger.info(f"Client connected from: {client_ip}")
+                self.logger.info(f"Client connected from: {client_ip} (session {session_id})")
                 
                 while True:
                     try:
-                        update = status_queue.get(timeout=30)
+                        event_id, update = subscription.get(timeout=30)
                         
                         if update == 'DONE':
                             yield f"data: {json.dumps({'status': 'done'})}\n\n"
                             self.logger.info(f"Processing completed for client: {client_ip}")
                             break
                         
-                        if isinstance(update, str):
-                            yield f"data: {update}\n\n"
-                        else:
-                            yield f"data: {json.dumps(update)}\n\n"
+                        # The span ends once the server asks for the next chunk, i.e. after the write
+                        with span('sse', 'delivery', session_id=session_id, event=event_type(update)):
+                            if isinstance(update, str):
+                                yield f"id: {event_id}\ndata: {update}\n\n"
+                            else:
+                                yield f"id: {event_id}\ndata: {json.dumps(update)}\n\n"
                             
                     except queue.Empty:
                         yield 'data: {"type": "heartbeat"}\n\n'
@@ -140,6 +298,8 @@ class RouteHandler:
                 self.logger.error(f"SSE error: {str(e)}")
                 error_msg = json.dumps({"type": "error", "message": str(e)})
                 yield f"data: {error_msg}\n\n"
+            finally:
+                self.status_service.unsubscribe(subscription)
 
         return Response(
             generate(),
@@ -1,8 +1,9 @@
 # Imports
-from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, session, current_app
+from flask import Flask, Request, render_template, redirect, url_for, request, flash, jsonify, Response, session, current_app
 from flask import stream_with_context
 from contextlib import contextmanager
 import os
+import time
 import datetime
 import json
 import paramiko
@@ -13,11 +14,25 @@ import logging
 import sys
 import subprocess
 import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from services.ftp_service import FTPService
 from services.processing_service import ProcessingService
 from services.status_service import StatusService
+from services.event_broker import create_event_broker
 from services.file_handler import FileHandler
+from utils.image_validator import ImageValidator
 from services.session_manager import SessionManager
+from services.session_store import create_session_repository
+from services.plate_index import PlateHistoryIndex
+from services.job_executor import JobExecutor
+from services.job_store import JobStore
+from services.job_queue import DurableJobQueue
+from services.cancellation import JobCancelledError
+from services.recognition_cache import get_recognition_cache
+from services.openai_service import get_openai_service
+from services.metrics import get_metrics, JOB_DURATION, JOBS_IN_FLIGHT, QUEUE_DEPTH, SSE_SUBSCRIBERS
+from services.tracing import activate, span, get_trace_store
 from handlers.route_handler import RouteHandler
 
 # Configuration loading
@@ -62,51 +77,64 @@ logging.debug("Logging is set up.")
 # Load all configurations
 load_configurations()
 
-# Flask app initialization
-app = Flask(__name__)
-app.secret_key = os.getenv('FLASK_SECRET_KEY')
-app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER')
-
-# Initialize services
-ftp_service = FTPService(
-    host=os.getenv('SFTP_HOST'),
-    port=int(os.getenv('SFTP_PORT')),
-    username=os.getenv('SFTP_USER'),
-    password=os.getenv('SFTP_PASS')
-)
-
-file_handler = FileHandler(app.config['UPLOAD_FOLDER'])
-processing_service = ProcessingService(app.config['UPLOAD_FOLDER'])
-status_service = StatusService()
-session_manager = SessionManager(file_handler)
+class UploadRequest(Request):
+    """Request that receives uploaded files through the file handler's checks"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return file_handler.create_upload_stream()
 
 # Helper functions
-def send_progress_update(progress):
+def send_progress_update(session_id, progress):
     """Helper function to send progress updates"""
     try:
-        status_service.send_progress_update(progress)
+        status_service.send_progress_update(session_id, progress)
     except Exception as e:
         logging.error(f"Error sending progress update: {e}")
 
-def process_license_and_upload(image_path, session_id):
+def traced_job(component):
+    """Decorator recording a job's spans into its session's timeline"""
+    def decorator(job):
+        @functools.wraps(job)
+        def traced(image, session_id, handle):
+            with activate(session_id), span(component, 'job', record_metric=False, image_bytes=image.size,
+                                            job_id=handle.job_id, attempt=handle.attempt):
+                return job(image, session_id, handle)
+        return traced
+    return decorator
+
+@traced_job('license')
+def process_license_and_upload(image, session_id, job):
+    staged_upload = None
+    # Staged per job so a superseded job's upload never touches its replacement's
+    staged_filename = f"{job.job_id}_license_plate.jpg"
+    outcome = 'error'
+    started_at = time.perf_counter()
+    JOBS_IN_FLIGHT.inc(job='license')
     try:
         logging.info(f"Started processing for session {session_id}")
         status_service.send_processing_status(
-            "license", 
+            session_id,
+            "license",
             "processing",
             "Processing license plate..."
         )
 
-        result = processing_service.process_license_plate(image_path, session_id)
+        if pipelined_upload:
+            # The plate is not known yet, so stream the image to staging while recognition runs
+            staged_upload = stage_upload(image, session_id, staged_filename)
+
+        result = processing_service.process_license_plate(image, session_id)
         if result is None:
             status_service.send_processing_status(
+                session_id,
                 "license",
                 "error",
                 "License plate detection failed"
             )
+            outcome = 'recognition_failed'
             return
 
         status_service.send_processing_status(
+            session_id,
             "license",
             "success",
             "License plate and car brand detected.",
@@ -126,24 +154,49 @@ def process_license_and_upload(image_path, session_id):
             session_id
         ).replace('\\', '/')  # Convert Windows paths to Unix
 
-        upload_to_ftp(image_path, remote_path, 'license_plate.jpg')
-
+        job.set_state('uploading')
+        with span('license', 'upload'):
+            if staged_upload is not None:
+                uploaded = promote_staged_upload(staged_upload, image, remote_path, 'license_plate.jpg',
+                                                 session_id, staged_filename)
+                staged_upload = None
+            else:
+                uploaded = upload_to_ftp(image, remote_path, 'license_plate.jpg', session_id)
+        outcome = 'success' if uploaded else 'upload_failed'
+
+    except JobCancelledError as e:
+        # Superseded or abandoned: the session is not told, a newer job reports to it if any
+        logging.info(f"License job for session {session_id} cancelled: {e.reason}")
+        outcome = 'cancelled'
+        raise
     except Exception as e:
         logging.error(f"Error in process_license_and_upload: {e}")
-        status_service.send_error(str(e))
+        status_service.send_error(session_id, str(e))
     finally:
-        file_handler.cleanup_file(image_path)
-        status_service.send_completion()
+        if staged_upload is not None:
+            discard_staged_upload(staged_upload, session_id, staged_filename)
+        if outcome not in ('success', 'cancelled'):
+            job.fail(outcome)
+        image.close()
+        JOBS_IN_FLIGHT.dec(job='license')
+        JOB_DURATION.observe(time.perf_counter() - started_at, job='license', outcome=outcome)
+        if outcome != 'cancelled':
+            status_service.send_completion(session_id)
         
-def process_tire_brand_and_upload(image_path, session_id):
+@traced_job('tire_brand')
+def process_tire_brand_and_upload(image, session_id, job):
+    outcome = 'error'
+    started_at = time.perf_counter()
+    JOBS_IN_FLIGHT.inc(job='tire_brand')
     try:
         logging.info(f"Starting tire brand processing for session {session_id}")
         
-        session_data = file_handler.load_session_data(session_id) or {}
+        session_data = session_store.get(session_id) or {}
         license_plate = session_data.get('license_plate', '')
         car_brand = session_data.get('car_brand', '')
         
         status_service.send_processing_status(
+            session_id,
             "tire_brand",
             "processing",
             "Processing tire brand...",
@@ -153,9 +206,10 @@ def process_tire_brand_and_upload(image_path, session_id):
             }
         )
 
-        result = processing_service.process_tire_brand(image_path, session_id)
+        result = processing_service.process_tire_brand(image, session_id)
         if result is None:
             status_service.send_processing_status(
+                session_id,
                 "tire_brand",
                 "error",
                 "Tire brand detection failed",
@@ -164,9 +218,11 @@ def process_tire_brand_and_upload(image_path, session_id):
                     "car_brand": car_brand
                 }
             )
+            outcome = 'recognition_failed'
             return
 
         status_service.send_processing_status(
+            session_id,
             "tire_brand",
             "success",
             "Tire brand detected",
@@ -185,11 +241,19 @@ def process_tire_brand_and_upload(image_path, session_id):
             'tire',
             session_id
         )
-        upload_to_ftp(image_path, remote_path, 'tire_brand.jpg')
-
+        job.set_state('uploading')
+        with span('tire_brand', 'upload'):
+            uploaded = upload_to_ftp(image, remote_path, 'tire_brand.jpg', session_id)
+        outcome = 'success' if uploaded else 'upload_failed'
+
+    except JobCancelledError as e:
+        logging.info(f"Tire brand job for session {session_id} cancelled: {e.reason}")
+        outcome = 'cancelled'
+        raise
     except Exception as e:
         logging.error(f"Error in process_tire_brand_and_upload: {e}")
         status_service.send_processing_status(
+            session_id,
             "tire_brand",
             "error",
             str(e),
@@ -199,20 +263,51 @@ def process_tire_brand_and_upload(image_path, session_id):
             }
         )
     finally:
-        file_handler.cleanup_file(image_path)
-        status_service.send_completion()
+        if outcome not in ('success', 'cancelled'):
+            job.fail(outcome)
+        image.close()
+        JOBS_IN_FLIGHT.dec(job='tire_brand')
+        JOB_DURATION.observe(time.perf_counter() - started_at, job='tire_brand', outcome=outcome)
+        if outcome != 'cancelled':
+            status_service.send_completion(session_id)
+
+def make_progress_callback(session_id):
+    """Create an FTP progress callback that reports percentages for a session"""
+    def progress_callback(sent, total):
+        try:
+            progress = min(int((sent / total) * 100), 100)
+            send_progress_update(session_id, progress)
+        except Exception as e:
+            logging.error(f"Progress callback error: {e}")
+    return progress_callback
+
+def publish_upload_result(remote_path, session_id):
+    """Report a finished upload and its public URL"""
+    send_progress_update(session_id, 100)
+    public_url = ftp_service.get_public_url(remote_path)
+    plate_index.record_public_url(session_id, public_url)
+    status_service.send_ftp_status(
+        session_id=session_id,
+        status="uploaded",
+        message="File uploaded successfully",
+        link=public_url
+    )
+
+def upload_image(image, remote_path, filename, session_id):
+    """Upload an image buffer to the FTP server, reporting progress for the session"""
+    with image.open() as source:
+        return ftp_service.upload_fileobj(
+            source=source,
+            size=image.size,
+            remote_path=remote_path,
+            filename=filename,
+            progress_callback=make_progress_callback(session_id)
+        )
 
-def upload_to_ftp(image_path, remote_path, filename):
-    """Upload file to FTP server with progress updates"""
+def upload_to_ftp(image, remote_path, filename, session_id):
+    """Upload file to FTP server with progress updates, returning whether it succeeded"""
     try:
-        def progress_callback(sent, total):
-            try:
-                progress = min(int((sent / total) * 100), 100)
-                send_progress_update(progress)
-            except Exception as e:
-                logging.error(f"Progress callback error: {e}")
-
-        send_progress_update(0)
+        send_progress_update(session_id, 0)
         
         # Ensure remote path uses forward slashes
         remote_path = remote_path.replace('\\', '/')
@@ -221,68 +316,287 @@ def upload_to_ftp(image_path, remote_path, filename):
         logging.debug(f"Creating remote directory: {remote_path}")
         ftp_service.create_remote_directory(remote_path)
         
-        upload_success = ftp_service.upload_file(
-            local_path=image_path,
-            remote_path=remote_path,
-            filename=filename,
-            progress_callback=progress_callback
-        )
+        upload_success = upload_image(image, remote_path, filename, session_id)
 
         if not upload_success:
             raise Exception("FTP upload failed")
 
-        send_progress_update(100)
-        public_url = ftp_service.get_public_url(remote_path)
-        status_service.send_ftp_status(
-            status="uploaded",
-            message="File uploaded successfully",
-            link=public_url
-        )
+        publish_upload_result(remote_path, session_id)
+        return True
 
+    except JobCancelledError:
+        raise
     except Exception as e:
         logging.error(f"FTP upload failed: {e}")
-        status_service.send_error(f"FTP upload failed: {str(e)}")
-        
-# Route handler initialization
-route_handler = RouteHandler(
-    session_manager=session_manager,
-    file_handler=file_handler,
-    processing_service=processing_service,
-    status_service=status_service,
-    process_license_and_upload=process_license_and_upload,
-    process_tire_brand_and_upload=process_tire_brand_and_upload
-)
-
-# Route definitions
-@app.route('/')
-def index():
-    return route_handler.index()
-
-@app.route('/start-session', methods=['POST'])
-def start_session():
-    return route_handler.start_session()
-
-@app.route('/session/<session_id>')
-def session_page(session_id):
-    return route_handler.session_page(session_id, session)
-
-@app.route('/session/<session_id>/tire-brand')
-def tire_brand_page(session_id):
-    return route_handler.tire_brand_page(session_id)
+        status_service.send_error(session_id, f"FTP upload failed: {str(e)}")
+        return False
+
+def get_staging_path(session_id):
+    """Get the remote staging directory for a session's uploads"""
+    return os.path.join(staging_base_path, session_id).replace('\\', '/')
+
+def stage_upload(image, session_id, filename):
+    """Start uploading a file to the session's staging directory in the background"""
+    send_progress_update(session_id, 0)
+    # Run in a copy of the job's context so the upload is recorded in the session's timeline
+    return staging_executor.submit(
+        contextvars.copy_context().run, upload_image, image, get_staging_path(session_id), filename, session_id
+    )
+
+def promote_staged_upload(staged_upload, image, remote_path, filename, session_id, staged_filename):
+    """Move a staged upload to its final path, uploading directly if staging failed; returns whether it succeeded"""
+    staging_path = get_staging_path(session_id)
+    remote_path = remote_path.replace('\\', '/')
+    try:
+        if staged_upload.result():
+            ftp_service.create_remote_directory(remote_path)
+            ftp_service.move_file(f"{staging_path}/{staged_filename}", f"{remote_path}/{filename}")
+            publish_upload_result(remote_path, session_id)
+            ftp_service.remove_directory(staging_path)
+            return True
+        logging.warning(f"Staged upload failed for session {session_id}, uploading directly")
+    except JobCancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"Promoting staged upload failed for session {session_id}: {e}")
+        ftp_service.remove_file(f"{staging_path}/{staged_filename}")
 
-@app.route('/session/<session_id>/upload_license_plate', methods=['POST'])
-def upload_license_plate(session_id):
-    response, status_code = route_handler.handle_license_plate_upload(session_id)
-    return jsonify(response), status_code
+    return upload_to_ftp(image, remote_path, filename, session_id)
 
-@app.route('/session/<session_id>/upload_tire_brand', methods=['POST'])
-def upload_tire_brand(session_id):
-    response, status_code = route_handler.handle_tire_brand_upload(session_id)
-    return jsonify(response), status_code
-        
-@app.route('/upload-status')
-def upload_status():
-    return route_handler.handle_status_updates()
+def discard_staged_upload(staged_upload, session_id, staged_filename):
+    """Wait for a staged upload that is no longer needed and remove it"""
+    staging_path = get_staging_path(session_id)
+    try:
+        if staged_upload.result():
+            ftp_service.remove_file(f"{staging_path}/{staged_filename}")
+            ftp_service.remove_directory(staging_path)
+    except JobCancelledError:
+        # The cancelled upload removed its partial file
+        ftp_service.remove_directory(staging_path)
+    except Exception as e:
+        logging.error(f"Error discarding staged upload for session {session_id}: {e}")
+
+def report_abandoned_job(job):
+    """Tell a session that a job interrupted too often was given up"""
+    status_service.send_error(job['session_id'], "Processing was interrupted, please upload the image again")
+    status_service.send_completion(job['session_id'])
+
+# Flask app and the services shared by the jobs and routes, created by create_app()
+app = None
+
+def create_app():
+    """
+    Create the Flask app and the services it runs on.
+
+    Call once per process. Multi-process servers should call it in each worker
+    after forking (e.g. gunicorn 'main:create_app()'), so every worker starts its
+    own job workers, connections and background threads. With EVENT_BROKER=sqlite
+    the workers share status events, so an SSE client connected to one worker
+    receives the events of a job running in another.
+
+    Returns:
+        Flask: The app; later calls return the same app
+    """
+    global app, ftp_service, file_handler, session_store, plate_index, processing_service, status_service
+    global pipelined_upload, staging_base_path, staging_executor
+    if app is not None:
+        return app
+
+    # Flask app initialization
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.secret_key = os.getenv('FLASK_SECRET_KEY')
+    app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER')
+    max_upload_size = int(os.getenv('MAX_UPLOAD_SIZE', 20 * 1024 * 1024))
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_REQUEST_SIZE', max_upload_size + 64 * 1024))
+
+    # Initialize services
+    ftp_service = FTPService(
+        host=os.getenv('SFTP_HOST'),
+        port=int(os.getenv('SFTP_PORT')),
+        username=os.getenv('SFTP_USER'),
+        password=os.getenv('SFTP_PASS'),
+        pool_size=int(os.getenv('SFTP_POOL_SIZE', 4)),
+        idle_timeout=float(os.getenv('SFTP_POOL_IDLE_TIMEOUT', 300)),
+        dir_cache_ttl=float(os.getenv('SFTP_DIR_CACHE_TTL', 0)) or None,
+        dir_cache_size=int(os.getenv('SFTP_DIR_CACHE_SIZE', 0)) or None,
+        chunk_size=int(os.getenv('SFTP_CHUNK_SIZE', 32768)),
+        pipelined=os.getenv('SFTP_PIPELINED', 'True').lower() == 'true',
+        window_size=int(os.getenv('SFTP_WINDOW_SIZE', 0)) or None,
+        max_packet_size=int(os.getenv('SFTP_MAX_PACKET_SIZE', 0)) or None
+    )
+
+    image_validator = ImageValidator(
+        allowed_formats=os.getenv('IMAGE_ALLOWED_FORMATS', 'JPEG,PNG,WEBP').split(','),
+        min_dimension=int(os.getenv('IMAGE_MIN_DIMENSION', 200)),
+        max_dimension=int(os.getenv('IMAGE_MAX_DIMENSION', 16000)),
+        max_pixels=int(os.getenv('IMAGE_MAX_PIXELS', 60000000))
+    )
+    file_handler = FileHandler(
+        app.config['UPLOAD_FOLDER'],
+        spool_threshold=int(os.getenv('IMAGE_SPOOL_THRESHOLD', 8 * 1024 * 1024)),
+        validator=image_validator,
+        max_file_size=max_upload_size
+    )
+    session_store = create_session_repository(
+        backend=os.getenv('SESSION_STORE', 'sqlite'),
+        folder=app.config['UPLOAD_FOLDER'],
+        db_path=os.getenv('SESSION_DB_PATH') or None,
+        cache_size=int(os.getenv('SESSION_CACHE_SIZE', 1000)),
+        cache_ttl=float(os.getenv('SESSION_CACHE_TTL', 5)) or None
+    )
+    plate_index = PlateHistoryIndex(
+        os.getenv('PLATE_INDEX_DB_PATH') or os.path.join(app.config['UPLOAD_FOLDER'], 'plate_index.db')
+    )
+    processing_service = ProcessingService(session_store, plate_index)
+    event_broker = create_event_broker(
+        backend=os.getenv('EVENT_BROKER', 'local'),
+        db_path=os.getenv('EVENT_DB_PATH') or os.path.join(app.config['UPLOAD_FOLDER'], 'events.db'),
+        poll_interval=float(os.getenv('EVENT_POLL_INTERVAL', 0.05)),
+        retention=float(os.getenv('EVENT_RETENTION', 300))
+    )
+    status_service = StatusService(
+        progress_min_step=int(os.getenv('PROGRESS_MIN_STEP', 5)),
+        progress_min_interval=float(os.getenv('PROGRESS_MIN_INTERVAL', 0.25)),
+        history_size=int(os.getenv('SSE_HISTORY_SIZE', 100)),
+        history_ttl=float(os.getenv('SSE_HISTORY_TTL', 300)),
+        broker=event_broker
+    )
+    SSE_SUBSCRIBERS.set_function(status_service.get_subscriber_count)
+    session_manager = SessionManager(
+        file_handler,
+        session_store,
+        max_uploads=int(os.getenv('SESSION_MAX_UPLOADS', 0)) or None,
+        max_upload_bytes=int(os.getenv('SESSION_MAX_UPLOAD_BYTES', 0)) or None
+    )
+    job_executor = JobExecutor(
+        max_workers=int(os.getenv('JOB_WORKERS', 4)),
+        max_queue_size=int(os.getenv('JOB_QUEUE_SIZE', 32)),
+        retry_after=int(os.getenv('JOB_RETRY_AFTER', 5))
+    )
+
+    # Pipelined uploads stream the license image to a staging directory while it is recognized
+    pipelined_upload = os.getenv('PIPELINED_UPLOAD', 'False').lower() == 'true'
+    staging_base_path = os.getenv(
+        'FTP_STAGING_PATH',
+        os.path.join(os.getenv('FTP_BASE_PATH', '/home/appuwauto/public_html/apps/5/webdisk'), 'staging')
+    )
+    staging_executor = ThreadPoolExecutor(
+        max_workers=job_executor.max_workers,
+        thread_name_prefix='staging-upload'
+    )
+
+    QUEUE_DEPTH.set_function(lambda: job_executor.queue.qsize(), queue='jobs')
+    QUEUE_DEPTH.set_function(lambda: get_openai_service().admission.get_stats()['waiting'], queue='vision_api')
+
+    # Durable job queue: accepted uploads are persisted and resumed after a restart
+    job_store = JobStore(
+        os.getenv('JOB_DB_PATH') or os.path.join(app.config['UPLOAD_FOLDER'], 'jobs.db')
+    )
+    durable_job_queue = DurableJobQueue(
+        job_store,
+        job_executor,
+        payload_folder=os.path.join(app.config['UPLOAD_FOLDER'], 'jobs'),
+        load_image=file_handler.load_saved_image,
+        lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', 30)),
+        max_attempts=int(os.getenv('JOB_MAX_ATTEMPTS', 3)),
+        retention=float(os.getenv('JOB_RETENTION', 7 * 86400)),
+        on_abandoned=report_abandoned_job,
+        abandon_after=float(os.getenv('JOB_ABANDON_TIMEOUT', 120)) or None,
+        last_seen=status_service.last_seen
+    )
+    durable_job_queue.register('license', process_license_and_upload)
+    durable_job_queue.register('tire_brand', process_tire_brand_and_upload)
+
+    # The reloader's watcher process serves no requests and must not resume jobs
+    if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        durable_job_queue.start()
+
+    # Route handler initialization
+    route_handler = RouteHandler(
+        session_manager=session_manager,
+        file_handler=file_handler,
+        processing_service=processing_service,
+        status_service=status_service,
+        job_queue=durable_job_queue,
+        job_executor=job_executor,
+        plate_index=plate_index,
+        trace_store=get_trace_store()
+    )
+    app.extensions['status_service'] = status_service
+    app.extensions['job_queue'] = durable_job_queue
+
+    # Route definitions
+    @app.route('/')
+    def index():
+        return route_handler.index()
+
+    @app.route('/start-session', methods=['POST'])
+    def start_session():
+        return route_handler.start_session()
+
+    @app.route('/session/<session_id>')
+    def session_page(session_id):
+        return route_handler.session_page(session_id, session)
+
+    @app.route('/session/<session_id>/tire-brand')
+    def tire_brand_page(session_id):
+        return route_handler.tire_brand_page(session_id)
+
+    @app.route('/session/<session_id>/upload_license_plate', methods=['POST'])
+    def upload_license_plate(session_id):
+        response, status_code, headers = route_handler.handle_license_plate_upload(session_id)
+        return jsonify(response), status_code, headers
+
+    @app.route('/session/<session_id>/upload_tire_brand', methods=['POST'])
+    def upload_tire_brand(session_id):
+        response, status_code, headers = route_handler.handle_tire_brand_upload(session_id)
+        return jsonify(response), status_code, headers
+
+    @app.route('/session/<session_id>/trace')
+    def session_trace(session_id):
+        response, status_code = route_handler.session_trace(session_id)
+        return jsonify(response), status_code
+
+    @app.route('/session/<session_id>/upload-status')
+    def upload_status(session_id):
+        return route_handler.handle_status_updates(session_id)
+
+    @app.route('/job-queue')
+    def job_queue():
+        return jsonify(route_handler.job_queue_status())
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        response, status_code = route_handler.job_status(job_id)
+        return jsonify(response), status_code
+
+    @app.route('/plates/<plate>/inspections')
+    def plate_inspections(plate):
+        response, status_code = route_handler.plate_history(plate)
+        return jsonify(response), status_code
+
+    @app.route('/vision-api')
+    def vision_api():
+        return jsonify(get_openai_service().admission.get_stats())
+
+    @app.route('/recognition-cache')
+    def recognition_cache():
+        return jsonify(get_recognition_cache().get_stats())
+
+    @app.route('/event-broker')
+    def event_broker_status():
+        return jsonify(event_broker.get_stats())
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(get_metrics().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.errorhandler(413)
+    def request_entity_too_large(error):
+        return jsonify({'error': 'Upload exceeds the maximum request size'}), 413
+
+    return app
 
 # App context decorator
 def with_app_context(f):
@@ -297,6 +611,7 @@ def with_app_context(f):
 if __name__ == '__main__':
     # Ensure required directories exist
     os.makedirs('logs', exist_ok=True)
+    create_app()
     file_handler.ensure_upload_folder_exists()
     
     # Start the Flask application
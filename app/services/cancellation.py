@@ -0,0 +1,87 @@
+# app/services/cancellation.py
+
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Token of the job running in the current context
+_active_token: contextvars.ContextVar = contextvars.ContextVar('cancel_token', default=None)
+
+class JobCancelledError(Exception):
+    def __init__(self, reason: str):
+        """
+        Raised at a cancellation checkpoint of a job that was cancelled.
+
+        Args:
+            reason: Why the job was cancelled (e.g., 'superseded', 'abandoned')
+        """
+        super().__init__(f"Job cancelled: {reason}")
+        self.reason = reason
+
+class CancelToken:
+    def __init__(self):
+        """Flag through which a running job is asked to stop at its next checkpoint."""
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str) -> bool:
+        """
+        Request cancellation; when several requests race, the first one's reason is kept.
+
+        Args:
+            reason: Why the job is cancelled
+
+        Returns:
+            bool: True if this call cancelled the token, False if it already was
+        """
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            return True
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested."""
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Raises:
+            JobCancelledError: If cancellation was requested
+        """
+        if self._event.is_set():
+            raise JobCancelledError(self.reason or 'cancelled')
+
+@contextmanager
+def cancellable(token: CancelToken) -> Iterator[CancelToken]:
+    """
+    Make a token the one checked by check_cancelled() in a block.
+
+    The token is bound to the current context; hand work to other threads
+    with contextvars.copy_context().run to keep it cancellable.
+
+    Args:
+        token: Token of the running job
+    """
+    context_token = _active_token.set(token)
+    try:
+        yield token
+    finally:
+        _active_token.reset(context_token)
+
+def check_cancelled() -> None:
+    """
+    Cancellation checkpoint: stop the current job if it was cancelled.
+
+    Does nothing outside a job.
+
+    Raises:
+        JobCancelledError: If the current job was cancelled
+    """
+    token = _active_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
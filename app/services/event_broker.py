@@ -0,0 +1,244 @@
+# app/services/event_broker.py
+
+import os
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional
+
+# Called as deliver(session_id, event, replaceable, event_id) for events published by other processes
+DeliverCallback = Callable[[str, str, bool, Optional[int]], None]
+# Returns the sessions with a status subscriber in this process
+SubscribedCallback = Callable[[], List[str]]
+
+class EventBroker:
+    """
+    Carries status events between the processes serving the app.
+
+    The status service delivers events to its own subscribers directly and
+    hands them to the broker, which delivers them to the status services of
+    the other processes. The base broker is used by single-process deployments
+    and forwards nothing.
+    """
+
+    def start(self, deliver: DeliverCallback, subscribed: Optional[SubscribedCallback] = None) -> None:
+        """
+        Start receiving events published by other processes.
+
+        Args:
+            deliver: Callback receiving each remote event
+            subscribed: Optional callback listing the sessions watched in this process,
+                whose presence is then shared with the other processes
+        """
+
+    def publish(self, session_id: str, event: str, replaceable: bool = False) -> Optional[int]:
+        """
+        Forward an event to the other processes.
+
+        Args:
+            session_id: Session the event belongs to
+            event: Serialized event
+            replaceable: Whether the event may be replaced by a newer one before delivery
+
+        Returns:
+            Optional[int]: Event ID shared by all processes, or None if the caller numbers the event
+
+        Raises:
+            Exception: If a sharing broker could not record the event. The event must then
+                not be delivered: numbering it locally would mix two ID ranges in one
+                session's history and break Last-Event-ID replay.
+        """
+        return None
+
+    def mark_seen(self, session_ids: Iterable[str]) -> None:
+        """
+        Record that sessions have a status subscriber now.
+
+        Args:
+            session_ids: Watched sessions
+        """
+
+    def last_seen(self, session_id: str) -> Optional[float]:
+        """
+        Get when a session last had a status subscriber in another process.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Optional[float]: Epoch seconds, or None if unknown
+        """
+        return None
+
+    def close(self) -> None:
+        """Stop receiving events."""
+
+    def get_stats(self) -> dict:
+        """Get broker statistics."""
+        return {"backend": "local"}
+
+class SQLiteEventBroker(EventBroker):
+    def __init__(self, db_path: str, poll_interval: float = 0.05, retention: float = 300,
+                 presence_interval: float = 5):
+        """
+        Event broker for processes on one host sharing an SQLite database in WAL mode.
+
+        Published events are appended to an events table. Each process polls
+        PRAGMA data_version, which only changes when another connection has
+        committed, and reads the new rows when it does, so idle polling costs
+        no queries against the table.
+
+        Args:
+            db_path: Path to the database file shared by the processes
+            poll_interval: Seconds between checks for new events
+            retention: Seconds events are kept for processes that fell behind
+            presence_interval: Seconds between refreshes of the sessions watched in this process
+        """
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.presence_interval = presence_interval
+        self.origin = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(__name__)
+
+        self._local = threading.local()
+        self._deliver: Optional[DeliverCallback] = None
+        self._subscribed: Optional[SubscribedCallback] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_id = 0
+        self._published = 0
+        self._received = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, session_id TEXT NOT NULL, "
+            "event TEXT NOT NULL, replaceable INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS events_by_created ON events (created_at)")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS presence (session_id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def start(self, deliver: DeliverCallback, subscribed: Optional[SubscribedCallback] = None) -> None:
+        if self._thread is not None:
+            return
+        self._deliver = deliver
+        self._subscribed = subscribed
+        # Only events published from now on are delivered; earlier ones belong to other subscribers
+        row = self._connection().execute("SELECT MAX(id) FROM events").fetchone()
+        self._last_id = row[0] or 0
+        self._thread = threading.Thread(target=self._poll_loop, name="event-broker", daemon=True)
+        self._thread.start()
+
+    def publish(self, session_id: str, event: str, replaceable: bool = False) -> Optional[int]:
+        cursor = self._connection().execute(
+            "INSERT INTO events (origin, session_id, event, replaceable, created_at) VALUES (?, ?, ?, ?, ?)",
+            (self.origin, session_id, event, int(replaceable), time.time())
+        )
+        self._published += 1
+        # AUTOINCREMENT row IDs never decrease, also across restarts
+        return cursor.lastrowid
+
+    def mark_seen(self, session_ids: Iterable[str]) -> None:
+        rows = [(session_id, time.time()) for session_id in session_ids]
+        if not rows:
+            return
+        try:
+            self._connection().executemany(
+                "INSERT INTO presence (session_id, seen_at) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET seen_at = excluded.seen_at",
+                rows
+            )
+        except Exception as e:
+            self.logger.error(f"Error recording watched sessions: {e}")
+
+    def last_seen(self, session_id: str) -> Optional[float]:
+        try:
+            row = self._connection().execute(
+                "SELECT seen_at FROM presence WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        except Exception as e:
+            self.logger.error(f"Error reading presence of session {session_id}: {e}")
+            return None
+        return row[0] if row else None
+
+    def _poll_loop(self) -> None:
+        """Deliver events published by other processes as they are committed."""
+        connection = self._connection()
+        data_version = None
+        last_prune = 0.0
+        last_presence = 0.0
+        while not self._stop.wait(self.poll_interval):
+            try:
+                version = connection.execute("PRAGMA data_version").fetchone()[0]
+                if version != data_version:
+                    data_version = version
+                    self._read_new_events(connection)
+
+                now = time.time()
+                if self._subscribed is not None and now - last_presence > self.presence_interval:
+                    last_presence = now
+                    self.mark_seen(self._subscribed())
+                if now - last_prune > self.retention / 10:
+                    last_prune = now
+                    connection.execute("DELETE FROM events WHERE created_at < ?", (now - self.retention,))
+                    connection.execute("DELETE FROM presence WHERE seen_at < ?", (now - self.retention,))
+            except Exception as e:
+                self.logger.error(f"Error reading events: {e}")
+
+    def _read_new_events(self, connection: sqlite3.Connection) -> None:
+        rows = connection.execute(
+            "SELECT id, origin, session_id, event, replaceable FROM events WHERE id > ? ORDER BY id",
+            (self._last_id,)
+        ).fetchall()
+        for event_id, origin, session_id, event, replaceable in rows:
+            self._last_id = event_id
+            if origin == self.origin:
+                continue
+            self._received += 1
+            self._deliver(session_id, event, bool(replaceable), event_id)
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def get_stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "origin": self.origin,
+            "published": self._published,
+            "received": self._received,
+            "last_event_id": self._last_id
+        }
+
+def create_event_broker(backend: str, db_path: str, poll_interval: float = 0.05,
+                        retention: float = 300) -> EventBroker:
+    """
+    Build the configured event broker.
+
+    Args:
+        backend: 'local' for a single process, 'sqlite' for several processes on one host
+        db_path: Database file shared by the processes (sqlite backend)
+        poll_interval: Seconds between checks for new events (sqlite backend)
+        retention: Seconds events are kept (sqlite backend)
+
+    Returns:
+        EventBroker: The broker
+    """
+    if backend == 'sqlite':
+        return SQLiteEventBroker(db_path, poll_interval=poll_interval, retention=retention)
+    return EventBroker()
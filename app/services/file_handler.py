@@ -1,18 +1,174 @@
 # app/services/file_handler.py
 
+import io
 import os
-import json
+import uuid
 import logging
-from typing import Optional, Dict, Any
+import tempfile
+from typing import BinaryIO, Optional
+from utils.image_buffer import ImageBuffer
+from utils.image_validator import ImageInfo, ImageValidator, ImageValidationError
+
+# Bytes needed to recognize any supported format
+_MIN_HEADER_SIZE = 32
+_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+class UploadRejectedError(Exception):
+    """Raised when an upload is refused before any processing is spent on it."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def rejection_for(error: ImageValidationError) -> UploadRejectedError:
+    """Map an image validation error to the response status of the upload."""
+    return UploadRejectedError(str(error), 415 if error.reason == 'format' else 422)
+
+class UploadStream(io.RawIOBase):
+    def __init__(self, validator: Optional[ImageValidator], max_size: Optional[int],
+                 spool_threshold: int, spool_dir: Optional[str] = None, probe_limit: int = 256 * 1024):
+        """
+        Writable spool for one uploaded file, checked while the request body is received.
+
+        Werkzeug writes each file part here as it parses the body. The size limit is
+        enforced on every write and the image header is validated as soon as enough
+        of it has arrived, so bad uploads are refused before the rest is read.
+
+        Args:
+            validator: Validator for the image header, or None to skip validation
+            max_size: Largest accepted file in bytes, or None for no limit
+            spool_threshold: Largest size in bytes kept in memory while receiving
+            spool_dir: Directory for the spool file of larger uploads
+            probe_limit: Bytes after which a header that cannot be read is rejected
+        """
+        super().__init__()
+        self.validator = validator
+        self.max_size = max_size
+        self.probe_limit = probe_limit
+        self.image_info: Optional[ImageInfo] = None
+        self.spool_threshold = spool_threshold
+        self.spool_dir = spool_dir
+        self.spool_path: Optional[str] = None
+        self._file: BinaryIO = io.BytesIO()
+        self._head = bytearray()
+        self._size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._size += len(data)
+        if self.max_size is not None and self._size > self.max_size:
+            raise UploadRejectedError(f"File exceeds the maximum size of {self.max_size} bytes", 413)
+        if self.validator is not None and self.image_info is None:
+            self._head += data[:self.probe_limit - len(self._head)]
+            self._probe_head()
+        if self.spool_path is None and self._size > self.spool_threshold:
+            self._rollover()
+        return self._file.write(data)
+
+    def _rollover(self) -> None:
+        """Move the data received so far into a named spool file that can later be handed over."""
+        fd, path = tempfile.mkstemp(suffix='.part', dir=self.spool_dir)
+        spool_file = os.fdopen(fd, 'w+b')
+        with self._file.getbuffer() as received:
+            spool_file.write(received)
+        self._file = spool_file
+        self.spool_path = path
+
+    def _probe_head(self) -> None:
+        """Validate the received header, waiting for more data while it is incomplete."""
+        if len(self._head) < _MIN_HEADER_SIZE:
+            return
+        try:
+            self.image_info = self.validator.validate(io.BytesIO(self._head))
+        except ImageValidationError as e:
+            if e.reason == 'corrupt' and len(self._head) < self.probe_limit:
+                return
+            raise rejection_for(e)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._file.readline(size)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def detach_spool(self, path: str) -> bool:
+        """
+        Hand a spooled upload over by renaming its spool file, so it is not copied again.
+
+        The stream is closed once the file has been handed over.
+
+        Args:
+            path: Path the spool file is moved to
+
+        Returns:
+            bool: True if the upload was moved to path, False if it is held in memory
+        """
+        if self.spool_path is None:
+            return False
+        os.replace(self.spool_path, path)
+        self.spool_path = None
+        self.close()
+        return True
+
+    def close(self) -> None:
+        self._file.close()
+        if self.spool_path is not None:
+            try:
+                os.remove(self.spool_path)
+            except OSError:
+                pass
+            self.spool_path = None
+        super().close()
 
 class FileHandler:
-    def __init__(self, upload_folder: str):
+    def __init__(self, upload_folder: str, spool_threshold: int = 8 * 1024 * 1024,
+                 validator: Optional[ImageValidator] = None, max_file_size: Optional[int] = None):
+        """
+        Initialize the upload file handler.
+
+        Args:
+            upload_folder: Directory for temporary files
+            spool_threshold: Largest upload in bytes kept in memory; larger ones are spooled to disk
+            validator: Validator for uploaded images, or None to accept any file
+            max_file_size: Largest accepted upload in bytes, or None for no limit
+        """
         self.upload_folder = upload_folder
+        self.spool_threshold = spool_threshold
+        self.validator = validator
+        self.max_file_size = max_file_size
         self.logger = logging.getLogger(__name__)
 
-    def save_temporary_file(self, file, session_id: str, prefix: str) -> Optional[str]:
+    def create_upload_stream(self) -> UploadStream:
+        """
+        Create the stream a file part of the request body is received into.
+
+        Returns:
+            UploadStream: Stream enforcing the size limit and validating the image
+        """
+        return UploadStream(self.validator, self.max_file_size, self.spool_threshold, self.upload_folder)
+
+    def save_temporary_file(self, file, session_id: str, prefix: str) -> Optional[ImageBuffer]:
         """
-        Save an uploaded file temporarily.
+        Read an uploaded file once into an image buffer for the job.
         
         Args:
             file: The uploaded file object
@@ -20,43 +176,98 @@ class FileHandler:
             prefix: Prefix for the filename (e.g., 'license', 'tire_brand')
             
         Returns:
-            str: Path to the saved file, or None if save failed
+            ImageBuffer: Buffer holding the upload, or None if reading it failed
+
+        Raises:
+            UploadRejectedError: If the upload is too large or not an acceptable image
         """
         try:
             if not file or file.filename == '':
                 self.logger.error("No valid file provided")
                 return None
 
-            filename = f"{prefix}_{session_id}.jpg"
-            file_path = os.path.join(self.upload_folder, filename)
-            file.save(file_path)
-            self.logger.info(f"File saved temporarily at: {file_path}")
-            return file_path
+            info = self.validate_upload(file.stream)
 
+            # Only spooled uploads reach the disk; the suffix keeps repeated uploads apart
+            extension = _EXTENSIONS.get(info.format, '.jpg') if info else '.jpg'
+            spool_path = os.path.join(
+                self.upload_folder, f"{prefix}_{session_id}_{uuid.uuid4().hex[:8]}{extension}"
+            )
+            name = f"{prefix}_{session_id}"
+            if isinstance(file.stream, UploadStream) and file.stream.detach_spool(spool_path):
+                # Spooled while the request was received; the spool file becomes the image
+                image = ImageBuffer(name, path=spool_path)
+            else:
+                image = ImageBuffer.from_stream(file.stream, name, self.spool_threshold, spool_path)
+            if image.spooled:
+                self.logger.info(f"File spooled temporarily at: {spool_path}")
+            else:
+                self.logger.info(f"File held in memory: {image.name} ({image.size} bytes)")
+            return image
+
+        except UploadRejectedError as e:
+            self.logger.warning(f"Rejected upload for session {session_id}: {e}")
+            raise
         except Exception as e:
-            self.logger.error(f"Error saving temporary file: {e}")
+            self.logger.error(f"Error reading uploaded file: {e}")
             return None
 
-    def load_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def load_saved_image(self, file_path: str, session_id: str, prefix: str) -> ImageBuffer:
         """
-        Load session data from file.
-        
+        Read a previously saved upload back into an image buffer, e.g. to resume a job.
+
+        The saved file is left in place; large images are spooled to a copy.
+
         Args:
+            file_path: Path to the saved upload
             session_id: Session identifier
-            
+            prefix: Prefix for the filename (e.g., 'license', 'tire_brand')
+
         Returns:
-            Optional[Dict]: Session data or None if not found
+            ImageBuffer: Buffer holding the upload
+
+        Raises:
+            OSError: If the file cannot be read
         """
-        try:
-            session_file = os.path.join(self.upload_folder, f'session_{session_id}.json')
-            if os.path.exists(session_file):
-                with open(session_file, 'r') as f:
-                    return json.load(f)
-            return None
-        except Exception as e:
-            self.logger.error(f"Error loading session data: {e}")
+        spool_path = os.path.join(self.upload_folder, f"{prefix}_{session_id}_{uuid.uuid4().hex[:8]}.img")
+        with open(file_path, 'rb') as saved_file:
+            return ImageBuffer.from_stream(saved_file, f"{prefix}_{session_id}", self.spool_threshold, spool_path)
+
+    def validate_upload(self, stream) -> Optional[ImageInfo]:
+        """
+        Check the size and image header of a received upload.
+
+        Uploads received through an UploadStream were checked while they arrived;
+        other streams, and headers that only completed with the last write, are
+        checked here.
+
+        Args:
+            stream: Seekable stream holding the upload
+
+        Returns:
+            Optional[ImageInfo]: Format and dimensions, or None without a validator
+
+        Raises:
+            UploadRejectedError: If the upload is empty, too large or not an acceptable image
+        """
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        if size == 0:
+            raise UploadRejectedError("Uploaded file is empty", 400)
+        if self.max_file_size is not None and size > self.max_file_size:
+            raise UploadRejectedError(f"File exceeds the maximum size of {self.max_file_size} bytes", 413)
+        if self.validator is None:
             return None
 
+        info = getattr(stream, 'image_info', None)
+        if info is not None:
+            return info
+        try:
+            return self.validator.validate(stream)
+        except ImageValidationError as e:
+            raise rejection_for(e)
+
     def cleanup_file(self, file_path: str) -> bool:
         """
         Remove a temporary file.
@@ -1,11 +1,20 @@
 import os
+import uuid
 import logging
-import paramiko
-from typing import Optional, Callable
+from typing import BinaryIO, Optional, Callable
 from dotenv import load_dotenv
+from services.sftp_pool import SFTPConnectionPool
+from services.remote_dir_cache import RemoteDirectoryCache
+from services.metrics import SFTP_UPLOADS, SFTP_UPLOAD_BYTES
+from services.tracing import span
+from services.cancellation import JobCancelledError, check_cancelled
 
 class FTPService:
-    def __init__(self, host: str, port: int, username: str, password: str):
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 pool_size: int = 4, idle_timeout: float = 300,
+                 dir_cache_ttl: Optional[float] = None, dir_cache_size: Optional[int] = None,
+                 chunk_size: int = 32768, pipelined: bool = True,
+                 window_size: Optional[int] = None, max_packet_size: Optional[int] = None):
         """
         Initialize FTP service with configuration.
         
@@ -14,12 +23,33 @@ class FTPService:
             port: SFTP port number
             username: SFTP username
             password: SFTP password
+            pool_size: Maximum number of pooled SFTP connections
+            idle_timeout: Seconds after which an idle pooled connection is closed
+            dir_cache_ttl: Optional seconds to trust a cached remote directory
+            dir_cache_size: Optional maximum number of cached remote directories
+            chunk_size: Bytes read from the local file per write
+            pipelined: Send writes without waiting for each acknowledgement
+            window_size: Optional SSH channel window in bytes
+            max_packet_size: Optional maximum SSH packet size in bytes
         """
         self.host = host
         self.port = port
         self.username = username
         self.password = password
+        self.chunk_size = chunk_size
+        self.pipelined = pipelined
         self.logger = logging.getLogger(__name__)
+        self.pool = SFTPConnectionPool(
+            host=host,
+            port=port,
+            username=username,
+            password=password,
+            max_size=pool_size,
+            idle_timeout=idle_timeout,
+            window_size=window_size,
+            max_packet_size=max_packet_size
+        )
+        self.dir_cache = RemoteDirectoryCache(ttl=dir_cache_ttl, max_entries=dir_cache_size)
         
         # Load FTP configuration
         config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'ftp', '.env')
@@ -30,6 +60,38 @@ class FTPService:
         self.public_base_url = os.getenv('FTP_PUBLIC_BASE_URL')
         self.webdisk_path = os.getenv('FTP_WEBDISK_PATH')
 
+    def _ensure_remote_directory(self, sftp, path: str) -> None:
+        """
+        Create a remote directory tree, skipping levels known to exist.
+        
+        Args:
+            sftp: Connected SFTP client
+            path: Remote path to create
+        """
+        if self.dir_cache.contains(path):
+            return
+
+        levels = self.dir_cache.prefixes(path)
+        # Resume the walk below the deepest level already known to exist
+        start = 0
+        for index in range(len(levels) - 1, -1, -1):
+            if self.dir_cache.contains(levels[index]):
+                start = index + 1
+                break
+
+        for current_path in levels[start:]:
+            try:
+                sftp.stat(current_path)
+            except FileNotFoundError:
+                self.logger.debug(f"Creating directory: {current_path}")
+                try:
+                    sftp.mkdir(current_path)
+                except IOError:
+                    # Another worker may have created it in the meantime
+                    sftp.stat(current_path)
+
+        self.dir_cache.add(path)
+
     def create_remote_directory(self, path: str) -> None:
         """
         Create remote directory and all intermediate directories.
@@ -37,29 +99,14 @@ class FTPService:
         Args:
             path: Remote path to create
         """
-        transport = paramiko.Transport((self.host, self.port))
         try:
-            transport.connect(username=self.username, password=self.password)
-            sftp = paramiko.SFTPClient.from_transport(transport)
-            
-            # Split path and create each directory level
-            path_parts = path.split('/')
-            current_path = ''
-            for part in path_parts:
-                if part:
-                    current_path += '/' + part
-                    try:
-                        sftp.stat(current_path)
-                    except FileNotFoundError:
-                        self.logger.debug(f"Creating directory: {current_path}")
-                        sftp.mkdir(current_path)
+            with self.pool.connection() as sftp, span('sftp', 'mkdir'):
+                self._ensure_remote_directory(sftp, path)
                         
         except Exception as e:
+            self.dir_cache.invalidate(path)
             self.logger.error(f"Error creating remote directory: {e}")
             raise
-        finally:
-            sftp.close()
-            transport.close()
 
     def upload_file(
         self, 
@@ -81,47 +128,185 @@ class FTPService:
             bool: True if upload successful, False otherwise
         """
         try:
-            transport = paramiko.Transport((self.host, self.port))
-            transport.connect(username=self.username, password=self.password)
-            sftp = paramiko.SFTPClient.from_transport(transport)
+            file_size = os.path.getsize(local_path)
+            local_file = open(local_path, 'rb')
+        except OSError as e:
+            self.logger.error(f"FTP upload failed: {str(e)}")
+            return False
 
-            try:
+        with local_file:
+            return self.upload_fileobj(local_file, file_size, remote_path, filename, progress_callback)
+
+    def upload_fileobj(
+        self,
+        source: BinaryIO,
+        size: int,
+        remote_path: str,
+        filename: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> bool:
+        """
+        Upload the contents of a readable stream with progress tracking.
+        
+        Args:
+            source: Binary stream positioned at the start of the content
+            size: Number of bytes the stream holds
+            remote_path: Remote directory path
+            filename: Name for the uploaded file
+            progress_callback: Optional callback for progress updates
+            
+        Returns:
+            bool: True if upload successful, False otherwise
+
+        Raises:
+            JobCancelledError: If the calling job was cancelled; the partial file is removed
+        """
+        try:
+            with self.pool.connection() as sftp:
                 # Create directory structure
-                current_path = ''
-                for folder in remote_path.split('/'):
-                    if folder:
-                        current_path += '/' + folder
-                        try:
-                            sftp.stat(current_path)
-                        except FileNotFoundError:
-                            sftp.mkdir(current_path)
+                with span('sftp', 'mkdir'):
+                    self._ensure_remote_directory(sftp, remote_path)
 
                 # Perform upload
                 remote_file_path = os.path.join(remote_path, filename).replace('\\', '/')
                 self.logger.info(f"Uploading file to: {remote_file_path}")
                 
-                # Get file size for progress tracking
-                file_size = os.path.getsize(local_path)
-                
-                with open(local_path, 'rb') as local_file:
-                    with sftp.file(remote_file_path, 'wb') as remote_file:
-                        sent_bytes = 0
-                        for chunk in iter(lambda: local_file.read(32768), b''):
-                            remote_file.write(chunk)
-                            sent_bytes += len(chunk)
-                            if progress_callback:
-                                progress_callback(sent_bytes, file_size)
-                                
-                return True
+                with span('sftp', 'transfer', bytes=size):
+                    try:
+                        with sftp.file(remote_file_path, 'wb') as remote_file:
+                            # Pipelined writes do not wait a round trip per chunk; errors surface on close
+                            remote_file.set_pipelined(self.pipelined)
+                            sent_bytes = 0
+                            for chunk in iter(lambda: source.read(self.chunk_size), b''):
+                                check_cancelled()
+                                remote_file.write(chunk)
+                                sent_bytes += len(chunk)
+                                # Completion is reported once the server has acknowledged every write
+                                if progress_callback and sent_bytes < size:
+                                    progress_callback(sent_bytes, size)
+                    except JobCancelledError:
+                        self._remove_partial(sftp, remote_file_path)
+                        raise
+
+                    if self.pipelined:
+                        # As putfo does, confirm the size since failed pipelined writes may go unnoticed
+                        remote_size = sftp.stat(remote_file_path).st_size
+                        if remote_size != size:
+                            raise IOError(f"Size mismatch after upload: {remote_size} of {size} bytes")
 
-            finally:
-                sftp.close()
-                transport.close()
+                SFTP_UPLOADS.inc(outcome='success')
+                SFTP_UPLOAD_BYTES.inc(sent_bytes)
 
+                if progress_callback and size:
+                    progress_callback(size, size)
+                return True
+
+        except JobCancelledError:
+            SFTP_UPLOADS.inc(outcome='cancelled')
+            self.logger.info(f"FTP upload of {filename} cancelled")
+            raise
         except Exception as e:
+            SFTP_UPLOADS.inc(outcome='error')
+            self.dir_cache.invalidate(remote_path)
             self.logger.error(f"FTP upload failed: {str(e)}")
             return False
             
+    def _remove_partial(self, sftp, remote_file_path: str) -> None:
+        """Remove the incomplete file of an interrupted upload."""
+        try:
+            sftp.remove(remote_file_path)
+        except IOError as e:
+            self.logger.warning(f"Could not remove partial upload {remote_file_path}: {e}")
+
+    def move_file(self, source_path: str, target_path: str) -> None:
+        """
+        Move a remote file with a server-side rename, replacing any existing target.
+        
+        Args:
+            source_path: Current remote file path
+            target_path: New remote file path
+        """
+        try:
+            with self.pool.connection() as sftp, span('sftp', 'move'):
+                try:
+                    sftp.posix_rename(source_path, target_path)
+                except IOError as e:
+                    # An unsupported extension is reported as a bare status without an errno;
+                    # missing files, permissions and connection errors are not retried
+                    if type(e) is not OSError or e.errno is not None:
+                        raise
+                    self._replace_file(sftp, source_path, target_path)
+                self.logger.info(f"Moved {source_path} to {target_path}")
+
+        except Exception as e:
+            self.logger.error(f"Error moving remote file: {e}")
+            raise
+
+    def _replace_file(self, sftp, source_path: str, target_path: str) -> None:
+        """
+        Rename over an existing file on servers without the posix-rename extension.
+
+        Plain rename refuses to overwrite, so the target is moved aside first and
+        restored if the source cannot take its place.
+        """
+        # Fails with ENOENT before the target is touched if the source is gone
+        sftp.stat(source_path)
+        backup_path = f"{target_path}.{uuid.uuid4().hex[:8]}.old"
+        try:
+            sftp.rename(target_path, backup_path)
+        except FileNotFoundError:
+            backup_path = None
+
+        try:
+            sftp.rename(source_path, target_path)
+        except Exception:
+            if backup_path:
+                sftp.rename(backup_path, target_path)
+            raise
+
+        if backup_path:
+            try:
+                sftp.remove(backup_path)
+            except IOError as e:
+                self.logger.warning(f"Could not remove replaced file {backup_path}: {e}")
+
+    def remove_file(self, path: str) -> bool:
+        """
+        Remove a remote file.
+        
+        Args:
+            path: Remote file path
+            
+        Returns:
+            bool: True if the file was removed, False otherwise
+        """
+        try:
+            with self.pool.connection() as sftp:
+                sftp.remove(path)
+                return True
+        except Exception as e:
+            self.logger.error(f"Error removing remote file: {e}")
+            return False
+
+    def remove_directory(self, path: str) -> bool:
+        """
+        Remove an empty remote directory.
+        
+        Args:
+            path: Remote directory path
+            
+        Returns:
+            bool: True if the directory was removed, False otherwise
+        """
+        try:
+            with self.pool.connection() as sftp:
+                sftp.rmdir(path)
+            self.dir_cache.invalidate(path)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error removing remote directory: {e}")
+            return False
+
     def get_public_url(self, remote_path: str) -> str:
         """
         Generate the public URL for an uploaded file.
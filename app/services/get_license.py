@@ -1,57 +1,65 @@
-import base64
-import requests
-import os
 import json
 import logging
-from dotenv import load_dotenv
+from services.openai_service import IMAGE_PLACEHOLDER, get_openai_service
+from services.recognition_cache import get_recognition_cache
+from services.metrics import RECOGNITION_CACHE_LOOKUPS
+from services.tracing import span
+from services.cancellation import JobCancelledError
+from utils.image_processor import get_image_processor
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)  # Get a logger instance for this module
 
-def encode_image(image_path):
-    """Encode the image to base64 format"""
-    try:
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
-            return None
-            
-        with open(image_path, "rb") as image_file:
-            logger.debug(f"Reading image file: {image_path}")
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except Exception as e:
-        logger.error(f"Error encoding image: {str(e)}")
-        return None
+MODEL = "gpt-4o-mini"
+PROMPT = 'This image contains a sticker on a car tire. Get the license plate and car brand from the image. Only return the license plate number and the car brand (not the model). Please return a json with the keys "license_plate" and "car_brand" using double quotes. For example: {"license_plate": "ABC1234", "car_brand": "Toyota"}.'
+
+def encode_image(image):
+    """Downscale the image and encode it to base64 bytes"""
+    return get_image_processor().encode_base64(image)
+
+def get_license_from_image(image):
+    """Deduces the license plate from the image, reusing the cached result for an identical image"""
+    logger.info(f"Starting license plate detection for image: {image.name}")
+    cache = get_recognition_cache()
+    with span('license', 'cache_lookup'):
+        with image.getbuffer() as image_data:
+            cache_key = cache.make_key(image_data, 'license', MODEL, PROMPT)
+        cached_result = cache.get(cache_key)
+    RECOGNITION_CACHE_LOOKUPS.inc(kind='license', result='hit' if cached_result is not None else 'miss')
+    if cached_result is not None:
+        logger.info(f"Using cached license plate result for image: {image.name}")
+        return cached_result
+
+    result = _detect_license(image)
+    if result is not None:
+        cache.set(cache_key, result)
+    return result
 
-def get_license_from_image(image_path):
+def _detect_license(image):
     """Deduces the license plate from the image using OpenAI API"""
     try:
-        logger.info(f"Starting license plate detection for image: {image_path}")
-        base64_image = encode_image(image_path)
+        with span('license', 'encode'):
+            base64_image = encode_image(image)
         if not base64_image:
             return None
 
         logger.debug("Image encoded successfully")
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-
         payload = {
-            "model": "gpt-4o-mini",
+            "model": MODEL,
             "messages": [
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "text",
-                            "text": 'This image contains a sticker on a car tire. Get the license plate and car brand from the image. Only return the license plate number and the car brand (not the model). Please return a json with the keys "license_plate" and "car_brand" using double quotes. For example: {"license_plate": "ABC1234", "car_brand": "Toyota"}.'
+                            "text": PROMPT
                         },
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:image/jpeg;base64,{IMAGE_PLACEHOLDER}"
                             }
                         }
                     ]
@@ -61,52 +69,32 @@ def get_license_from_image(image_path):
         }
 
         logger.debug("Sending request to OpenAI API")
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
+        with span('license', 'api'):
+            response = get_openai_service().chat_completion(payload, {IMAGE_PLACEHOLDER: base64_image})
         
         logger.debug(f"OpenAI API Response Status: {response.status_code}")
         logger.debug(f"OpenAI API Response: {response.text}")
 
         if response.status_code == 200:
-            result = response.json().get('choices', [{}])[0].get('message', {}).get('content', None)
-            if result:
-                # Clean the response
-                logger.debug(f"Raw result from API: {result}")
-                result = result.replace("```json", "").replace("```", "").strip()
-                # Replace single quotes with double quotes if needed
-                result = result.replace("'", '"')
-                # Validate JSON format
-                json.loads(result)  # This will raise an error if JSON is invalid
-                logger.info(f"Successfully processed license plate result: {result}")
-                return result
-            else:
-                logger.error("No content in OpenAI response")
+            with span('license', 'parse'):
+                result = response.json().get('choices', [{}])[0].get('message', {}).get('content', None)
+                if result:
+                    # Clean the response
+                    logger.debug(f"Raw result from API: {result}")
+                    result = result.replace("```json", "").replace("```", "").strip()
+                    # Replace single quotes with double quotes if needed
+                    result = result.replace("'", '"')
+                    # Validate JSON format
+                    json.loads(result)  # This will raise an error if JSON is invalid
+                    logger.info(f"Successfully processed license plate result: {result}")
+                    return result
+                else:
+                    logger.error("No content in OpenAI response")
         else:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
         return None
+    except JobCancelledError:
+        raise
     except Exception as e:
         logger.error(f"Error in get_license_from_image: {str(e)}")
         return None
-
-# Get the current directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
-# Get the parent directory
-app_dir = os.path.dirname(os.path.dirname(current_dir))
-# Construct the path to the .env file
-dotenv_path = os.path.join(app_dir, 'app', 'config', 'openai', '.env')
-
-logger.debug(f"Loading .env file from: {dotenv_path}")
-
-# Load the environment variables from the .env file
-load_dotenv(dotenv_path=dotenv_path)
-
-# Get the OpenAI API key from the environment
-api_key = os.getenv('OPENAI_API_KEY')
-
-if api_key:
-    logger.info("OpenAI API key loaded successfully")
-else:
-    logger.error("Failed to load OpenAI API key")
\ No newline at end of file
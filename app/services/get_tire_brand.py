@@ -1,66 +1,67 @@
-import base64
-import requests
-import os
 import json
 import logging
-from dotenv import load_dotenv
+from services.openai_service import IMAGE_PLACEHOLDER, get_openai_service
+from services.recognition_cache import get_recognition_cache
+from services.metrics import RECOGNITION_CACHE_LOOKUPS
+from services.tracing import span
+from services.cancellation import JobCancelledError
+from utils.image_processor import get_image_processor
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def encode_image(image_path):
-    """Encode the image to base64 format"""
-    try:
-        if not os.path.exists(image_path):
-            logger.error(f"Image file not found: {image_path}")
-            return None
-            
-        with open(image_path, "rb") as image_file:
-            logger.debug(f"Reading image file: {image_path}")
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    except Exception as e:
-        logger.error(f"Error encoding image: {str(e)}")
-        return None
+MODEL = "gpt-4o-mini"
+PROMPT = 'This image of a section of a car tire contains the brand. Please get the brand from the image. Return the result as a JSON with a "tire_brand" key using double quotes. For example: {"tire_brand": "Michelin"}'
+
+def encode_image(image):
+    """Downscale the image and encode it to base64 bytes"""
+    return get_image_processor().encode_base64(image)
+
+def get_tire_brand_from_image(image):
+    """Deduces the tire brand from the image, reusing the cached result for an identical image"""
+    logger.info(f"Starting tire brand detection for image: {image.name}")
+    cache = get_recognition_cache()
+    with span('tire_brand', 'cache_lookup'):
+        with image.getbuffer() as image_data:
+            cache_key = cache.make_key(image_data, 'tire_brand', MODEL, PROMPT)
+        cached_result = cache.get(cache_key)
+    RECOGNITION_CACHE_LOOKUPS.inc(kind='tire_brand', result='hit' if cached_result is not None else 'miss')
+    if cached_result is not None:
+        logger.info(f"Using cached tire brand result for image: {image.name}")
+        return cached_result
 
-def get_tire_brand_from_image(image_path):
+    result = _detect_tire_brand(image)
+    if result is not None:
+        cache.set(cache_key, result)
+    return result
+
+def _detect_tire_brand(image):
     """Deduces the tire brand from the image using OpenAI API"""
     try:
-        logger.info(f"Starting tire brand detection for image: {image_path}")
-        
-        # Load API key
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            logger.error("OpenAI API key not found")
-            return None
-        
         # Encode image
-        base64_image = encode_image(image_path)
+        with span('tire_brand', 'encode'):
+            base64_image = encode_image(image)
         if not base64_image:
             return None
             
         logger.debug("Image encoded successfully")
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-
         # Note: Using double quotes in the prompt text for proper JSON formatting
         payload = {
-            "model": "gpt-4o-mini",
+            "model": MODEL,
             "messages": [
                 {
                     "role": "user",
                     "content": [
                         {
                             "type": "text",
-                            "text": 'This image of a section of a car tire contains the brand. Please get the brand from the image. Return the result as a JSON with a "tire_brand" key using double quotes. For example: {"tire_brand": "Michelin"}'
+                            "text": PROMPT
                         },
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:image/jpeg;base64,{IMAGE_PLACEHOLDER}"
                             }
                         }
                     ]
@@ -70,50 +71,49 @@ def get_tire_brand_from_image(image_path):
         }
 
         logger.debug("Sending request to OpenAI API")
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        with span('tire_brand', 'api'):
+            response = get_openai_service().chat_completion(payload, {IMAGE_PLACEHOLDER: base64_image})
         
         logger.debug(f"OpenAI API Response Status: {response.status_code}")
         logger.debug(f"OpenAI API Response: {response.text}")
 
         if response.status_code == 200:
-            result = response.json().get('choices', [{}])[0].get('message', {}).get('content', None)
-            if result:
-                logger.info(f"Successfully got tire brand result: {result}")
-                # Clean the response and handle potential JSON formatting issues
-                try:
-                    # Remove markdown formatting if present
-                    clean_result = result.replace("```json", "").replace("```", "").strip()
-                    # Convert single quotes to double quotes if needed
-                    clean_result = clean_result.replace("'", '"')
-                    # Parse and re-serialize to ensure proper JSON format
-                    parsed_data = json.loads(clean_result)
-                    final_result = json.dumps(parsed_data)
-                    logger.debug(f"Cleaned and formatted result: {final_result}")
-                    return final_result
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON parsing error: {e}")
-                    # Fallback: try to extract brand name and create proper JSON
-                    if "tire_brand" in result:
-                        try:
-                            brand = result.split(":")[1].strip().replace("'", "").replace('"', "").replace("}", "").strip()
-                            fallback_result = json.dumps({"tire_brand": brand})
-                            logger.debug(f"Created fallback result: {fallback_result}")
-                            return fallback_result
-                        except Exception as e:
-                            logger.error(f"Fallback parsing failed: {e}")
-                            return None
-            else:
-                logger.error("No content in OpenAI response")
+            with span('tire_brand', 'parse'):
+                result = response.json().get('choices', [{}])[0].get('message', {}).get('content', None)
+                if result:
+                    logger.info(f"Successfully got tire brand result: {result}")
+                    # Clean the response and handle potential JSON formatting issues
+                    try:
+                        # Remove markdown formatting if present
+                        clean_result = result.replace("```json", "").replace("```", "").strip()
+                        # Convert single quotes to double quotes if needed
+                        clean_result = clean_result.replace("'", '"')
+                        # Parse and re-serialize to ensure proper JSON format
+                        parsed_data = json.loads(clean_result)
+                        final_result = json.dumps(parsed_data)
+                        logger.debug(f"Cleaned and formatted result: {final_result}")
+                        return final_result
+                    except json.JSONDecodeError as e:
+                        logger.error(f"JSON parsing error: {e}")
+                        # Fallback: try to extract brand name and create proper JSON
+                        if "tire_brand" in result:
+                            try:
+                                brand = result.split(":")[1].strip().replace("'", "").replace('"', "").replace("}", "").strip()
+                                fallback_result = json.dumps({"tire_brand": brand})
+                                logger.debug(f"Created fallback result: {fallback_result}")
+                                return fallback_result
+                            except Exception as e:
+                                logger.error(f"Fallback parsing failed: {e}")
+                                return None
+                else:
+                    logger.error("No content in OpenAI response")
         else:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
         
         return None
         
+    except JobCancelledError:
+        raise
     except Exception as e:
         logger.error(f"Error in get_tire_brand_from_image: {str(e)}")
         return None
\ No newline at end of file
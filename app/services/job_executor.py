@@ -0,0 +1,182 @@
+# app/services/job_executor.py
+
+import time
+import logging
+import threading
+from queue import Queue, Empty
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from services.metrics import STAGE_DURATION
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the executor queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class JobExecutor:
+    def __init__(self, max_workers: int = 4, max_queue_size: int = 32, retry_after: int = 5):
+        """
+        Initialize a fixed-size worker pool with a bounded job queue.
+
+        Args:
+            max_workers: Number of worker threads processing jobs
+            max_queue_size: Maximum number of jobs waiting for a worker
+            retry_after: Seconds clients should wait before retrying when the queue is full
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.retry_after = retry_after
+        self.queue = Queue()
+        # Places for waiting jobs, taken when a job is submitted or reserved and freed when a worker takes it
+        self._places = threading.BoundedSemaphore(max_queue_size)
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+        self._shutdown = threading.Event()
+
+        self._workers = []
+        for index in range(max_workers):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"job-worker-{index + 1}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """
+        Queue a job for execution by the worker pool.
+
+        Args:
+            fn: Callable to execute
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        self._take_place(getattr(fn, '__name__', fn))
+        self._enqueue(fn, args, kwargs)
+
+    @contextmanager
+    def reserve(self) -> Iterator[Callable[..., None]]:
+        """
+        Hold a place in the queue while a job is prepared, so a full queue is
+        reported before any work is spent on the job.
+
+        Yields:
+            Callable: Queues the job as submit() does, using the reserved place;
+                the place is freed if it was not used when the block exits
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        self._take_place('reservation')
+        used = False
+
+        def submit(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+            nonlocal used
+            if used:
+                raise RuntimeError("Reserved place was already used")
+            used = True
+            self._enqueue(fn, args, kwargs)
+
+        try:
+            yield submit
+        finally:
+            if not used:
+                self._places.release()
+
+    def _take_place(self, name: Any) -> None:
+        if not self._places.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            self.logger.warning(f"Job queue full ({self.max_queue_size} waiting), rejecting {name}")
+            raise QueueFullError(self.retry_after)
+
+    def _enqueue(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        self.queue.put((fn, args, kwargs, time.monotonic()))
+        with self._lock:
+            self._submitted += 1
+        self.logger.debug(f"Queued job {getattr(fn, '__name__', fn)} (queue depth: {self.queue.qsize()})")
+
+    def _worker_loop(self) -> None:
+        """Take jobs from the queue and run them until shutdown."""
+        while not self._shutdown.is_set():
+            try:
+                fn, args, kwargs, enqueued_at = self.queue.get(timeout=1)
+            except Empty:
+                continue
+            self._places.release()
+
+            wait = time.monotonic() - enqueued_at
+            with self._lock:
+                self._active += 1
+                self._total_wait += wait
+                self._last_wait = wait
+                self._max_wait = max(self._max_wait, wait)
+            STAGE_DURATION.observe(wait, component='job', stage='queue_wait')
+            self.logger.debug(f"Starting job {getattr(fn, '__name__', fn)} after waiting {wait:.3f}s")
+
+            try:
+                fn(*args, **kwargs)
+                with self._lock:
+                    self._completed += 1
+            except Exception as e:
+                self.logger.error(f"Job {getattr(fn, '__name__', fn)} failed: {e}")
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self.queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get current executor statistics.
+
+        Returns:
+            Dict: Queue depth, active workers, job counters and wait times in seconds
+        """
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "workers": self.max_workers,
+                "active": self._active,
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.max_queue_size,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_seconds": round(self._total_wait / started, 4) if started else 0.0,
+                "max_wait_seconds": round(self._max_wait, 4),
+                "last_wait_seconds": round(self._last_wait, 4)
+            }
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker threads.
+
+        Args:
+            wait: Whether to wait for queued jobs to finish first
+            timeout: Maximum seconds to wait per worker
+        """
+        if wait:
+            self.queue.join()
+        self._shutdown.set()
+        for worker in self._workers:
+            worker.join(timeout)
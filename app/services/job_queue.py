@@ -0,0 +1,451 @@
+# app/services/job_queue.py
+
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import socket
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from services.job_store import JobStore, JobData
+from services.job_executor import JobExecutor, QueueFullError
+from services.cancellation import CancelToken, JobCancelledError, cancellable
+from utils.image_buffer import ImageBuffer
+
+JobFunction = Callable[[ImageBuffer, str, 'JobHandle'], None]
+
+class JobHandle(CancelToken):
+    def __init__(self, queue: 'DurableJobQueue', job: JobData):
+        """
+        Handle passed to a running job for reporting its progress.
+
+        The handle is also the job's cancel token: while the job function runs,
+        check_cancelled() checkpoints stop it once the handle is cancelled.
+
+        Args:
+            queue: Queue running the job
+            job: The job as recorded in the job table
+        """
+        super().__init__()
+        self.queue = queue
+        self.job_id = job['job_id']
+        self.kind = job['kind']
+        self.session_id = job['session_id']
+        self.created_at = job['created_at']
+        self.content_hash = job['content_hash']
+        self.attempt = job['attempts']
+        self.error: Optional[str] = None
+
+    def cancel(self, reason: str) -> bool:
+        """
+        Request cancellation and record it in the job table.
+
+        Args:
+            reason: Why the job is cancelled
+
+        Returns:
+            bool: True if this call cancelled the job, False if it already was
+        """
+        if not super().cancel(reason):
+            return False
+        try:
+            self.queue.store.mark_cancelled(self.job_id, reason)
+        except Exception as e:
+            self.queue.logger.error(f"Error recording cancellation of job {self.job_id}: {e}")
+        return True
+
+    def set_state(self, state: str) -> None:
+        """
+        Record the stage the job has reached (e.g., 'uploading').
+
+        Args:
+            state: New job state
+        """
+        try:
+            self.queue.store.set_state(self.job_id, state, self.queue.owner)
+        except Exception as e:
+            self.queue.logger.error(f"Error updating state of job {self.job_id}: {e}")
+
+    def fail(self, error: str) -> None:
+        """
+        Mark the job as failed once it returns.
+
+        Args:
+            error: Failure reason
+        """
+        self.error = error
+
+class DurableJobQueue:
+    def __init__(self, store: JobStore, executor: JobExecutor, payload_folder: str,
+                 load_image: Callable[[str, str, str], ImageBuffer], lease_seconds: float = 30,
+                 max_attempts: int = 3, retention: float = 7 * 86400,
+                 on_abandoned: Optional[Callable[[JobData], None]] = None,
+                 abandon_after: Optional[float] = None,
+                 last_seen: Optional[Callable[[str], Optional[float]]] = None):
+        """
+        Upload jobs recorded in a job table so they survive restarts.
+
+        Accepted jobs run on the worker pool as before. Each job and its image
+        are persisted first and leased by this process while it holds them; a
+        background thread renews the leases and resumes jobs left unfinished
+        by a process that stopped.
+
+        A job is cancelled when a newer job of the same kind is submitted for
+        its session, and when nobody has watched the session's status for
+        abandon_after seconds. Cancellation is cooperative: the job stops at
+        its next check_cancelled() checkpoint.
+
+        Args:
+            store: Persistent job table
+            executor: Worker pool running the jobs
+            payload_folder: Directory holding the images of unfinished jobs
+            load_image: Opens a persisted image as (path, session_id, kind) -> ImageBuffer
+            lease_seconds: Seconds a lease lasts unless renewed
+            max_attempts: Attempts after which an interrupted job is given up
+            retention: Seconds finished jobs are kept in the table
+            on_abandoned: Optional callback for jobs given up after max_attempts
+            abandon_after: Seconds without a status subscriber after which a session's
+                jobs are cancelled, or None to keep them running
+            last_seen: Returns when a session last had a status subscriber (epoch seconds)
+        """
+        self.store = store
+        self.executor = executor
+        self.payload_folder = payload_folder
+        self.load_image = load_image
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.on_abandoned = on_abandoned
+        self.abandon_after = abandon_after
+        self.last_seen = last_seen
+        self.hostname = socket.gethostname()
+        self.owner = f"{self.hostname}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(__name__)
+
+        self._functions: Dict[str, JobFunction] = {}
+        self._held: Dict[str, JobHandle] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        os.makedirs(payload_folder, exist_ok=True)
+
+    def register(self, kind: str, function: JobFunction) -> None:
+        """
+        Register the function running jobs of a kind.
+
+        Args:
+            kind: Job type (e.g., 'license')
+            function: Called as function(image, session_id, job_handle)
+        """
+        self._functions[kind] = function
+
+    def start(self) -> None:
+        """Resume unfinished jobs and start renewing leases."""
+        if self._thread is not None:
+            return
+        self.recover()
+        self._thread = threading.Thread(target=self._maintain_loop, name="job-queue-leases", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop renewing leases; held jobs are resumed elsewhere once their leases expire."""
+        self._stop.set()
+
+    def _payload_path(self, job_id: str) -> str:
+        return os.path.join(self.payload_folder, f"{job_id}.img")
+
+    def _persist_image(self, image: ImageBuffer, path: str) -> None:
+        """Write a job's image next to the job table, linking spooled images instead of copying."""
+        if image.spooled:
+            try:
+                os.link(image.path, path)
+                return
+            except OSError:
+                shutil.copyfile(image.path, path)
+                return
+        with open(path, 'wb') as payload, image.getbuffer() as data:
+            payload.write(data)
+
+    def _remove_payload(self, path: Optional[str]) -> None:
+        if not path:
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.error(f"Error removing job payload {path}: {e}")
+
+    def submit(self, kind: str, image: ImageBuffer, session_id: str) -> Tuple[str, bool]:
+        """
+        Persist a job and queue it on the worker pool, unless the same upload is in flight.
+
+        An upload of the same image for the same session and kind as an unfinished
+        job, e.g. from a double-tapped submit button, joins that job instead of
+        starting another one, and does not supersede it.
+
+        Args:
+            kind: Job type registered with register()
+            image: Uploaded image, owned by the queue from here on
+            session_id: Session the job belongs to
+
+        Returns:
+            Tuple[str, bool]: The job ID, and False if the upload joined a running job
+
+        Raises:
+            QueueFullError: If the worker pool queue is at capacity; nothing was persisted
+        """
+        with image.getbuffer() as data:
+            content_hash = hashlib.sha256(data).hexdigest()
+        running = self._find_running(kind, session_id, content_hash)
+        if running is not None:
+            return self._join(running, image)
+
+        # Only jobs with a place in the worker queue are written to disk
+        with self.executor.reserve() as queue_job:
+            job_id = uuid.uuid4().hex
+            payload_path = self._payload_path(job_id)
+            try:
+                self._persist_image(image, payload_path)
+                # Duplicates arriving at the same time, or at another process, are caught by the job table
+                job, created = self.store.create_unless_running(job_id, kind, session_id, payload_path,
+                                                                self.owner, self.lease_seconds, content_hash)
+            except Exception:
+                self._remove_payload(payload_path)
+                raise
+            if not created:
+                self._remove_payload(payload_path)
+                return self._join(job['job_id'], image)
+
+            handle = JobHandle(self, job)
+            with self._lock:
+                self._held[job_id] = handle
+            queue_job(self._run, handle, image)
+
+        self.logger.info(f"Queued {kind} job {job_id} for session {session_id}")
+        self._supersede(handle)
+        return job_id, True
+
+    def _find_running(self, kind: str, session_id: str, content_hash: str) -> Optional[str]:
+        """Find a job held here that is processing the same upload and was not cancelled."""
+        with self._lock:
+            for handle in self._held.values():
+                if (handle.session_id == session_id and handle.kind == kind
+                        and handle.content_hash == content_hash and not handle.cancelled):
+                    return handle.job_id
+        return None
+
+    def _join(self, job_id: str, image: ImageBuffer) -> Tuple[str, bool]:
+        """Drop a duplicate upload in favour of the job already processing it."""
+        image.close()
+        self.logger.info(f"Duplicate upload joined running job {job_id}")
+        return job_id, False
+
+    def _supersede(self, handle: JobHandle) -> None:
+        """Cancel the session's earlier jobs of the same kind, which the new upload replaces."""
+        with self._lock:
+            previous = [held for held in self._held.values()
+                        if held.session_id == handle.session_id and held.kind == handle.kind and held is not handle]
+        for job in previous:
+            if job.cancel('superseded'):
+                self.logger.info(f"Cancelling {job.kind} job {job.job_id}, superseded by job {handle.job_id}")
+        try:
+            # Jobs held by other processes are cancelled when those processes renew their leases
+            self.store.request_cancel(handle.session_id, handle.kind, 'superseded', handle.job_id)
+        except Exception as e:
+            self.logger.error(f"Error cancelling jobs superseded by job {handle.job_id}: {e}")
+
+    def _run(self, handle: JobHandle, image: ImageBuffer, claimed: Optional[JobData] = None) -> None:
+        """Claim a job, unless it was claimed when resumed, and run its function, recording the outcome."""
+        job_id = handle.job_id
+        try:
+            if claimed is not None:
+                job = claimed
+                self.store.set_state(job_id, 'recognizing', self.owner)
+            else:
+                job = self.store.claim(job_id, self.owner, self.lease_seconds)
+            if job is None:
+                self.logger.warning(f"Job {job_id} is finished or leased by another process, skipping")
+                image.close()
+                return
+
+            handle.attempt = job['attempts']
+            if handle.cancelled:
+                # Cancelled while waiting for a worker: nothing was spent on it yet
+                self.logger.info(f"Skipping {job['kind']} job {job_id}, cancelled: {handle.reason}")
+                image.close()
+                self.store.finish(job_id, 'cancelled', self.owner, handle.reason)
+                self._remove_payload(job['payload_path'])
+                return
+
+            state = 'done'
+            try:
+                with cancellable(handle):
+                    self._functions[job['kind']](image, job['session_id'], handle)
+                if handle.error:
+                    state = 'failed'
+            except JobCancelledError as e:
+                state = 'cancelled'
+                handle.error = e.reason
+                self.logger.info(f"Cancelled {job['kind']} job {job_id}: {e.reason}")
+            except Exception as e:
+                state = 'failed'
+                handle.fail(str(e) or type(e).__name__)
+                raise
+            finally:
+                self.store.finish(job_id, state, self.owner, handle.error)
+                self._remove_payload(job['payload_path'])
+        finally:
+            with self._lock:
+                self._held.pop(job_id, None)
+
+    def _owner_is_dead(self, owner: Optional[str]) -> bool:
+        """Check whether a lease holder is a stopped process on this host, e.g. after a reload."""
+        if not owner or os.name != 'posix':
+            return False
+        hostname, _, rest = owner.partition(':')
+        pid = rest.partition(':')[0]
+        if hostname != self.hostname or not pid.isdigit() or int(pid) == os.getpid():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            return False
+        return False
+
+    def recover(self) -> int:
+        """
+        Resume unfinished jobs whose lease expired or whose process stopped.
+
+        Returns:
+            int: Number of jobs resumed
+        """
+        resumed = 0
+        for job in self.store.find_unfinished():
+            if job['lease_owner'] == self.owner:
+                continue
+            dead_owners = [job['lease_owner']] if self._owner_is_dead(job['lease_owner']) else []
+            if not dead_owners and (job['lease_expires'] or 0) >= time.time():
+                continue
+            if self._resume(job, dead_owners):
+                resumed += 1
+        return resumed
+
+    def _resume(self, job: JobData, dead_owners: List[str]) -> bool:
+        """Claim an interrupted job and queue it again."""
+        job_id = job['job_id']
+        if job['cancel_reason']:
+            # Cancelled while its process was stopping; there is nothing to resume
+            if self.store.finish(job_id, 'cancelled', job['lease_owner'], job['cancel_reason']):
+                self.logger.info(f"Dropping interrupted {job['kind']} job {job_id}, cancelled: {job['cancel_reason']}")
+                self._remove_payload(job['payload_path'])
+            return False
+
+        if job['attempts'] >= self.max_attempts:
+            if self.store.finish(job_id, 'failed', job['lease_owner'],
+                                 f"Interrupted {job['attempts']} times, giving up"):
+                self.logger.error(f"Giving up {job['kind']} job {job_id} after {job['attempts']} attempts")
+                self._remove_payload(job['payload_path'])
+                if self.on_abandoned:
+                    self.on_abandoned(job)
+            return False
+
+        try:
+            image = self.load_image(job['payload_path'], job['session_id'], job['kind'])
+        except OSError as e:
+            self.logger.error(f"Cannot resume job {job_id}, its image is missing: {e}")
+            self.store.finish(job_id, 'failed', job['lease_owner'], "Image of the interrupted job is missing")
+            if self.on_abandoned:
+                self.on_abandoned(job)
+            return False
+
+        # Take the lease now so no other process resumes the job while it waits for a worker
+        claimed = self.store.claim(job_id, self.owner, self.lease_seconds, dead_owners)
+        if claimed is None:
+            image.close()
+            return False
+        self.store.set_state(job_id, 'queued', self.owner)
+
+        handle = JobHandle(self, claimed)
+        with self._lock:
+            self._held[job_id] = handle
+        try:
+            self.executor.submit(self._run, handle, image, claimed)
+        except QueueFullError:
+            # Let the lease lapse so the job is picked up again later
+            with self._lock:
+                self._held.pop(job_id, None)
+            image.close()
+            return False
+
+        self.logger.info(f"Resumed {job['kind']} job {job_id} for session {job['session_id']} "
+                         f"(attempt {claimed['attempts']})")
+        return True
+
+    def _cancel_requested(self, held: Dict[str, JobHandle]) -> None:
+        """Cancel held jobs that another process asked to cancel through the job table."""
+        for job_id, reason in self.store.cancel_requests(held).items():
+            if held[job_id].cancel(reason):
+                self.logger.info(f"Cancelling {held[job_id].kind} job {job_id}: {reason}")
+
+    def _cancel_unwatched(self, held: Iterable[JobHandle]) -> None:
+        """Cancel held jobs of sessions nobody has watched for abandon_after seconds."""
+        if not self.abandon_after or self.last_seen is None:
+            return
+        now = time.time()
+        seen_by_session: Dict[str, float] = {}
+        for handle in held:
+            if handle.cancelled:
+                continue
+            if handle.session_id not in seen_by_session:
+                seen_by_session[handle.session_id] = self.last_seen(handle.session_id) or 0
+            # A job is never abandoned before it had abandon_after seconds to be watched
+            if now - max(seen_by_session[handle.session_id], handle.created_at) > self.abandon_after:
+                if handle.cancel('abandoned'):
+                    self.logger.info(f"Cancelling {handle.kind} job {handle.job_id}, session "
+                                     f"{handle.session_id} unwatched for over {self.abandon_after:g}s")
+
+    def _maintain_loop(self) -> None:
+        """Renew held leases, apply cancellations, resume abandoned jobs and prune old ones."""
+        interval = max(self.lease_seconds / 3, 1)
+        rounds = 0
+        while not self._stop.wait(interval):
+            try:
+                with self._lock:
+                    held = dict(self._held)
+                self.store.renew(self.owner, held, self.lease_seconds)
+                self._cancel_requested(held)
+                self._cancel_unwatched(held.values())
+                self.recover()
+                rounds += 1
+                if rounds % 100 == 0:
+                    self.store.prune(self.retention)
+            except Exception as e:
+                self.logger.error(f"Error maintaining job leases: {e}")
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the status of a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Optional[Dict]: Public job fields, or None if unknown
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return {key: job[key] for key in ('job_id', 'kind', 'session_id', 'state', 'attempts', 'error',
+                                          'created_at', 'updated_at', 'finished_at')}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number of jobs per state and the jobs held by this process."""
+        with self._lock:
+            held = len(self._held)
+        return {"owner": self.owner, "held": held, "states": self.store.count_by_state()}
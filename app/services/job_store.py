@@ -0,0 +1,342 @@
+# app/services/job_store.py
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+JobData = Dict[str, Any]
+
+JOB_STATES = ('queued', 'recognizing', 'uploading', 'done', 'failed', 'cancelled')
+UNFINISHED_STATES = ('queued', 'recognizing', 'uploading')
+
+_COLUMNS = ('job_id', 'kind', 'session_id', 'state', 'payload_path', 'attempts', 'lease_owner',
+            'lease_expires', 'error', 'created_at', 'updated_at', 'finished_at', 'cancel_reason', 'content_hash')
+
+class JobStore:
+    def __init__(self, db_path: str):
+        """
+        Persistent table of upload jobs in an SQLite database in WAL mode.
+
+        Jobs are leased by the process running them. A job whose lease has
+        expired was left unfinished by a process that stopped and may be
+        claimed by another.
+
+        Args:
+            db_path: Path to the database file
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, session_id TEXT NOT NULL, state TEXT NOT NULL, "
+            "payload_path TEXT, attempts INTEGER NOT NULL DEFAULT 0, lease_owner TEXT, lease_expires REAL, "
+            "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, finished_at REAL, cancel_reason TEXT, "
+            "content_hash TEXT)"
+        )
+        # Tables created by earlier versions lack the later columns
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(jobs)")}
+        for column in ('cancel_reason', 'content_hash'):
+            if column not in columns:
+                connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, lease_expires)")
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_session ON jobs (session_id, created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _row_to_job(row) -> JobData:
+        return dict(zip(_COLUMNS, row))
+
+    def create_unless_running(self, job_id: str, kind: str, session_id: str, payload_path: str,
+                              owner: str, lease_seconds: float, content_hash: str) -> Tuple[JobData, bool]:
+        """
+        Record a new queued job unless the same upload is already being processed.
+
+        An unfinished job of the session with the same kind and content hash that
+        was not asked to cancel counts as the same upload. The check and the insert
+        are one transaction, so concurrent duplicates from any process find one job.
+
+        Args:
+            job_id: Identifier for the new job
+            kind: Job type (e.g., 'license', 'tire_brand')
+            session_id: Session the job belongs to
+            payload_path: File holding the uploaded image
+            owner: Identifier of the process holding the lease
+            lease_seconds: Seconds until the lease expires unless renewed
+            content_hash: Digest of the uploaded image
+
+        Returns:
+            Tuple[Dict, bool]: The new job and True, or the running job and False
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE session_id = ? AND kind = ? AND content_hash = ? "
+                f"AND cancel_reason IS NULL AND state IN (?, ?, ?) ORDER BY created_at LIMIT 1",
+                (session_id, kind, content_hash, *UNFINISHED_STATES)
+            ).fetchone()
+            if row:
+                connection.execute("ROLLBACK")
+                return self._row_to_job(row), False
+
+            job = self._new_job(job_id, kind, session_id, payload_path, owner, lease_seconds, content_hash)
+            self._insert(connection, job)
+            connection.execute("COMMIT")
+            return job, True
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _new_job(job_id: str, kind: str, session_id: str, payload_path: str, owner: str,
+                 lease_seconds: float, content_hash: Optional[str]) -> JobData:
+        now = time.time()
+        return {
+            'job_id': job_id, 'kind': kind, 'session_id': session_id, 'state': 'queued',
+            'payload_path': payload_path, 'attempts': 0, 'lease_owner': owner,
+            'lease_expires': now + lease_seconds, 'error': None,
+            'created_at': now, 'updated_at': now, 'finished_at': None, 'cancel_reason': None,
+            'content_hash': content_hash
+        }
+
+    @staticmethod
+    def _insert(connection: sqlite3.Connection, job: JobData) -> None:
+        connection.execute(
+            f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            tuple(job[column] for column in _COLUMNS)
+        )
+
+    def get(self, job_id: str) -> Optional[JobData]:
+        """
+        Load a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Optional[Dict]: The job, or None if unknown
+        """
+        row = self._connection().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float,
+              dead_owners: Iterable[str] = ()) -> Optional[JobData]:
+        """
+        Take the lease of an unfinished job and start an attempt.
+
+        The claim succeeds if the owner already holds the lease, the lease has
+        expired, or the lease is held by one of the given dead owners.
+
+        Args:
+            job_id: Job identifier
+            owner: Identifier of the claiming process
+            lease_seconds: Seconds until the lease expires unless renewed
+            dead_owners: Lease holders known to have stopped
+
+        Returns:
+            Optional[Dict]: The claimed job, or None if it is finished or leased elsewhere
+        """
+        connection = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent claims serialize
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            job = self._row_to_job(row) if row else None
+            if job is None or job['state'] not in UNFINISHED_STATES or not (
+                job['lease_owner'] == owner
+                or (job['lease_expires'] or 0) < now
+                or job['lease_owner'] in set(dead_owners)
+            ):
+                connection.execute("ROLLBACK")
+                return None
+
+            job.update(state='recognizing', attempts=job['attempts'] + 1, lease_owner=owner,
+                       lease_expires=now + lease_seconds, updated_at=now)
+            connection.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, lease_owner = ?, lease_expires = ?, updated_at = ? "
+                "WHERE job_id = ?",
+                (job['state'], job['attempts'], owner, job['lease_expires'], now, job_id)
+            )
+            connection.execute("COMMIT")
+            return job
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def set_state(self, job_id: str, state: str, owner: str) -> bool:
+        """
+        Move a job to another unfinished state.
+
+        Args:
+            job_id: Job identifier
+            state: New state ('recognizing' or 'uploading')
+            owner: Process that must hold the lease
+
+        Returns:
+            bool: True if the job was updated
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET state = ?, updated_at = ? WHERE job_id = ? AND lease_owner = ? AND state IN (?, ?, ?)",
+            (state, time.time(), job_id, owner, *UNFINISHED_STATES)
+        )
+        return cursor.rowcount > 0
+
+    def finish(self, job_id: str, state: str, owner: Optional[str], error: Optional[str] = None) -> bool:
+        """
+        Mark a job done, failed or cancelled and release its lease.
+
+        Args:
+            job_id: Job identifier
+            state: 'done', 'failed' or 'cancelled'
+            owner: Process that must hold the lease, or None to finish it regardless
+            error: Optional failure reason
+
+        Returns:
+            bool: True if the job was updated
+        """
+        now = time.time()
+        query = (
+            "UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, lease_expires = NULL, "
+            "updated_at = ?, finished_at = ? WHERE job_id = ?"
+        )
+        params = [state, error, now, now, job_id]
+        if owner is not None:
+            query += " AND lease_owner = ?"
+            params.append(owner)
+        return self._connection().execute(query, params).rowcount > 0
+
+    def renew(self, owner: str, job_ids: Iterable[str], lease_seconds: float) -> int:
+        """
+        Extend the leases of jobs an owner is still holding.
+
+        Args:
+            owner: Identifier of the process holding the leases
+            job_ids: Jobs to renew
+            lease_seconds: Seconds from now until the leases expire
+
+        Returns:
+            int: Number of leases renewed
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND job_id IN ({', '.join('?' * len(job_ids))})",
+            (time.time() + lease_seconds, owner, *job_ids)
+        )
+        return cursor.rowcount
+
+    def request_cancel(self, session_id: str, kind: str, reason: str, exclude_job_id: Optional[str] = None) -> int:
+        """
+        Ask the processes running a session's unfinished jobs of a kind to cancel them.
+
+        Args:
+            session_id: Session the jobs belong to
+            kind: Job type
+            reason: Why the jobs are cancelled (e.g., 'superseded')
+            exclude_job_id: Optional job to leave running, e.g. the one replacing the others
+
+        Returns:
+            int: Number of jobs marked
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET cancel_reason = ?, updated_at = ? "
+            "WHERE session_id = ? AND kind = ? AND job_id != ? AND cancel_reason IS NULL AND state IN (?, ?, ?)",
+            (reason, time.time(), session_id, kind, exclude_job_id or '', *UNFINISHED_STATES)
+        )
+        return cursor.rowcount
+
+    def mark_cancelled(self, job_id: str, reason: str) -> None:
+        """
+        Record that a job was cancelled, so it is neither resumed nor joined by duplicates.
+
+        Args:
+            job_id: Job identifier
+            reason: Why the job is cancelled
+        """
+        self._connection().execute(
+            "UPDATE jobs SET cancel_reason = ?, updated_at = ? WHERE job_id = ? AND cancel_reason IS NULL",
+            (reason, time.time(), job_id)
+        )
+
+    def cancel_requests(self, job_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Get the cancellation requests of jobs.
+
+        Args:
+            job_ids: Jobs to check, e.g. those held by a process
+
+        Returns:
+            Dict[str, str]: Cancellation reason by job ID, for the jobs asked to cancel
+        """
+        job_ids = list(job_ids)
+        if not job_ids:
+            return {}
+        rows = self._connection().execute(
+            f"SELECT job_id, cancel_reason FROM jobs WHERE cancel_reason IS NOT NULL "
+            f"AND job_id IN ({', '.join('?' * len(job_ids))})",
+            job_ids
+        ).fetchall()
+        return dict(rows)
+
+    def find_unfinished(self) -> List[JobData]:
+        """
+        List jobs that are queued or running.
+
+        Returns:
+            List[Dict]: Unfinished jobs, oldest first
+        """
+        rows = self._connection().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state IN (?, ?, ?) ORDER BY created_at",
+            UNFINISHED_STATES
+        ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def prune(self, max_age: float) -> int:
+        """
+        Remove finished jobs.
+
+        Args:
+            max_age: Seconds a finished job is kept
+
+        Returns:
+            int: Number of jobs removed
+        """
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE state IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+            (time.time() - max_age,)
+        )
+        return cursor.rowcount
+
+    def count_by_state(self) -> Dict[str, int]:
+        """
+        Count jobs per state.
+
+        Returns:
+            Dict[str, int]: Number of jobs in each state
+        """
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for state, count in self._connection().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+            counts[state] = count
+        return counts
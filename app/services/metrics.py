@@ -0,0 +1,296 @@
+# app/services/metrics.py
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans cache lookups of a few milliseconds up to slow vision API calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        """
+        Named metric with a fixed set of labels.
+
+        Args:
+            name: Metric name in Prometheus format (e.g., 'tms_jobs_total')
+            help_text: Description shown in the exposition
+            label_names: Names of the labels every sample carries
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """Get (suffix, label names, label values, value) samples for the exposition."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increase the counter.
+
+        Args:
+            amount: Non-negative amount to add
+            **labels: Label values of the sample
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [('', self.label_names, key, value) for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._functions: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge to a value."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increase the gauge."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels: str) -> None:
+        """
+        Read the gauge from a callable whenever metrics are collected.
+
+        Args:
+            function: Returns the current value (e.g., a queue size)
+            **labels: Label values of the sample
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = function
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, function in functions.items():
+            try:
+                values[key] = float(function())
+            except Exception:
+                continue
+        return [('', self.label_names, key, value) for key, value in sorted(values.items())]
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Distribution of observed values in cumulative buckets.
+
+        Args:
+            name: Metric name in Prometheus format
+            help_text: Description shown in the exposition
+            label_names: Names of the labels every sample carries
+            buckets: Upper bounds of the buckets; +Inf is added
+        """
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value: Observed value (e.g., seconds)
+            **labels: Label values of the sample
+        """
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+                self._sums[key] = 0.0
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._sums[key] += value
+
+    def samples(self):
+        bucket_names = self.label_names + ('le',)
+        samples = []
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[key]):
+                    cumulative += count
+                    samples.append(('_bucket', bucket_names, key + (_format_value(bound),), cumulative))
+                samples.append(('_sum', self.label_names, key, self._sums[key]))
+                samples.append(('_count', self.label_names, key, cumulative))
+        return samples
+
+class MetricsRegistry:
+    def __init__(self):
+        """Collection of metrics rendered together on the /metrics endpoint."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, help_text: str, label_names: Sequence[str], **options):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, help_text, label_names, **options)
+            elif not isinstance(metric, metric_class) or metric.label_names != tuple(label_names):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._register(Gauge, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram, name, help_text, label_names, buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text (content type text/plain; version=0.0.4)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry.
+
+    Returns:
+        MetricsRegistry: The shared registry
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+# Metrics shared by the services; components record into them directly
+STAGE_DURATION = get_metrics().histogram(
+    'tms_stage_duration_seconds',
+    'Duration of a processing stage in seconds',
+    ('component', 'stage')
+)
+JOB_DURATION = get_metrics().histogram(
+    'tms_job_duration_seconds',
+    'Duration of an upload job from start to completion in seconds',
+    ('job', 'outcome')
+)
+JOBS_IN_FLIGHT = get_metrics().gauge(
+    'tms_jobs_in_flight',
+    'Upload jobs currently running',
+    ('job',)
+)
+QUEUE_DEPTH = get_metrics().gauge(
+    'tms_queue_depth',
+    'Items waiting in a queue',
+    ('queue',)
+)
+SSE_SUBSCRIBERS = get_metrics().gauge(
+    'tms_sse_subscribers',
+    'Status event streams currently connected'
+)
+RECOGNITION_CACHE_LOOKUPS = get_metrics().counter(
+    'tms_recognition_cache_lookups_total',
+    'Recognition cache lookups',
+    ('kind', 'result')
+)
+VISION_API_RESPONSES = get_metrics().counter(
+    'tms_vision_api_responses_total',
+    'Vision API responses by HTTP status, including retried 429 responses',
+    ('status',)
+)
+SFTP_CONNECTIONS = get_metrics().counter(
+    'tms_sftp_connections_opened_total',
+    'SFTP connections opened by the pool',
+    ('outcome',)
+)
+SFTP_UPLOADS = get_metrics().counter(
+    'tms_sftp_uploads_total',
+    'SFTP file uploads',
+    ('outcome',)
+)
+SFTP_UPLOAD_BYTES = get_metrics().counter(
+    'tms_sftp_upload_bytes_total',
+    'Bytes written to the SFTP server'
+)
+UPLOADS_REJECTED = get_metrics().counter(
+    'tms_uploads_rejected_total',
+    'Uploads refused before processing',
+    ('status',)
+)
+UPLOADS_DEDUPLICATED = get_metrics().counter(
+    'tms_uploads_deduplicated_total',
+    'Repeated uploads that joined the job already processing the same image',
+    ('job',)
+)
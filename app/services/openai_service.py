@@ -0,0 +1,225 @@
+# app/services/openai_service.py
+
+import os
+import json
+import time
+import logging
+import threading
+import requests
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from services.rate_limiter import VisionAPIAdmission
+from services.metrics import VISION_API_RESPONSES
+from services.tracing import span, record_span, traceparent
+from services.cancellation import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Stands in for base64 image data in a payload until encode_body() splices it in
+IMAGE_PLACEHOLDER = '@@image_base64@@'
+
+class OpenAIService:
+    def __init__(self, api_key: Optional[str], api_url: str = "https://api.openai.com/v1/chat/completions",
+                 connect_timeout: float = 5, read_timeout: float = 60, max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 10,
+                 admission: Optional[VisionAPIAdmission] = None, image_token_estimate: int = 1000,
+                 request_deadline: float = 120):
+        """
+        Initialize a shared HTTP client for the OpenAI API.
+
+        Args:
+            api_key: OpenAI API key
+            api_url: Chat completions endpoint
+            connect_timeout: Seconds to wait for the connection to be established
+            read_timeout: Seconds to wait for the response
+            max_retries: Maximum retries on connection errors and 5xx responses; a request
+                that timed out while reading the response is not sent again
+            backoff_factor: Exponential backoff factor between retries
+            pool_size: Maximum number of kept-alive connections
+            admission: Concurrency and rate limiter; 429 responses are retried through it
+            image_token_estimate: Tokens assumed per image when budgeting requests
+            request_deadline: Seconds a call may take in total, including rate-limit retries
+        """
+        self.api_key = api_key
+        self.api_url = api_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.admission = admission or VisionAPIAdmission()
+        self.image_token_estimate = image_token_estimate
+        self.request_deadline = request_deadline
+        self.logger = logging.getLogger(__name__)
+
+        retry = Retry(
+            total=max_retries,
+            # The API may still be processing a request whose response timed out
+            read=0,
+            backoff_factor=backoff_factor,
+            # 429 is handled by the admission layer so all requests back off together;
+            # urllib3 would otherwise retry any response carrying Retry-After itself
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @staticmethod
+    def encode_body(payload: Dict[str, Any], attachments: Optional[Dict[str, bytes]] = None) -> bytes:
+        """
+        Serialize a request body, splicing large values in as bytes.
+
+        The payload carries a short placeholder string where each attachment
+        belongs, so an image is copied once into the body instead of passing
+        through str, JSON and encoded copies.
+
+        Args:
+            payload: Chat completion request body
+            attachments: Placeholder to JSON-safe bytes (e.g. base64) inserted in its place
+
+        Returns:
+            bytes: UTF-8 encoded JSON body
+        """
+        body = json.dumps(payload).encode('utf-8')
+        if not attachments:
+            return body
+
+        parts = [body]
+        for placeholder, value in attachments.items():
+            before, found, after = parts.pop().partition(placeholder.encode('utf-8'))
+            if not found:
+                raise ValueError(f"Placeholder {placeholder!r} not found in payload")
+            parts.extend([before, value, after])
+        return b''.join(parts)
+
+    def chat_completion(self, payload: Dict[str, Any],
+                        attachments: Optional[Dict[str, bytes]] = None) -> requests.Response:
+        """
+        Send a chat completion request over the pooled session.
+
+        The request waits for admission (concurrency and rate limits). Rate-limited
+        responses are retried after the Retry-After delay plus jitter, as long as the
+        retry can start before the request deadline. A cancelled job stops before
+        each request is sent, so it spends no API quota.
+
+        Args:
+            payload: Chat completion request body
+            attachments: Optional placeholder values spliced into the body, see encode_body()
+
+        Returns:
+            requests.Response: The API response after retries
+
+        Raises:
+            ValueError: If no API key is configured
+            requests.RequestException: If the request failed after all retries
+            JobCancelledError: If the calling job was cancelled before the request was sent
+        """
+        if not self.api_key:
+            raise ValueError("OpenAI API key not found")
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        estimated_tokens = self.estimate_tokens(payload)
+        body = self.encode_body(payload, attachments)
+
+        deadline = time.monotonic() + self.request_deadline
+        connect_timeout, read_timeout = self.timeout
+        attempt = 0
+        while True:
+            requested_at = time.perf_counter()
+            with self.admission.admit(estimated_tokens):
+                record_span('vision_api', 'admission_wait', time.perf_counter() - requested_at)
+                check_cancelled()
+                with span('vision_api', 'request', attempt=attempt, request_bytes=len(body)) as attributes:
+                    trace_header = traceparent()
+                    if trace_header:
+                        headers['traceparent'] = trace_header
+                    remaining = max(deadline - time.monotonic(), connect_timeout)
+                    response = self.session.post(self.api_url, headers=headers, data=body,
+                                                 timeout=(connect_timeout, min(read_timeout, remaining)))
+                    attributes['status'] = response.status_code
+                    attributes['response_bytes'] = len(response.content)
+                    if response.headers.get('x-request-id'):
+                        attributes['request_id'] = response.headers['x-request-id']
+            VISION_API_RESPONSES.inc(status=str(response.status_code))
+
+            if response.status_code != 429 or attempt >= self.admission.max_retries:
+                return response
+
+            delay = self.admission.backoff_delay(attempt, response.headers.get('Retry-After'))
+            if time.monotonic() + delay >= deadline:
+                self.logger.warning(f"Not retrying rate-limited request; the retry would pass the {self.request_deadline}s deadline")
+                return response
+            self.admission.rate_limited(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def estimate_tokens(self, payload: Dict[str, Any]) -> int:
+        """
+        Roughly estimate the tokens a chat completion request will consume.
+
+        Args:
+            payload: Chat completion request body
+
+        Returns:
+            int: Prompt text (about 4 characters per token), images and max_tokens
+        """
+        tokens = payload.get('max_tokens', 0)
+        for message in payload.get('messages', []):
+            content = message.get('content', '')
+            parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+            for part in parts:
+                if part.get('type') == 'image_url':
+                    tokens += self.image_token_estimate
+                else:
+                    tokens += len(part.get('text', '')) // 4
+        return tokens
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
+
+_service: Optional[OpenAIService] = None
+_service_lock = threading.Lock()
+
+def get_openai_service() -> OpenAIService:
+    """
+    Get the process-wide OpenAI client, creating it from configuration on first use.
+
+    Returns:
+        OpenAIService: The shared client
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config', 'openai', '.env')
+            load_dotenv(config_path)
+            _service = OpenAIService(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                api_url=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1').rstrip('/') + '/chat/completions',
+                connect_timeout=float(os.getenv('OPENAI_CONNECT_TIMEOUT', 5)),
+                read_timeout=float(os.getenv('OPENAI_READ_TIMEOUT', 60)),
+                max_retries=int(os.getenv('OPENAI_MAX_RETRIES', 3)),
+                backoff_factor=float(os.getenv('OPENAI_BACKOFF_FACTOR', 0.5)),
+                pool_size=int(os.getenv('OPENAI_POOL_SIZE', 10)),
+                admission=VisionAPIAdmission(
+                    max_in_flight=int(os.getenv('OPENAI_MAX_IN_FLIGHT', 4)),
+                    requests_per_minute=float(os.getenv('OPENAI_RPM_LIMIT', 0)),
+                    tokens_per_minute=float(os.getenv('OPENAI_TPM_LIMIT', 0)),
+                    max_retries=int(os.getenv('OPENAI_RATE_LIMIT_RETRIES', 5)),
+                    max_backoff=float(os.getenv('OPENAI_RATE_LIMIT_MAX_BACKOFF', 60))
+                ),
+                image_token_estimate=int(os.getenv('OPENAI_IMAGE_TOKEN_ESTIMATE', 1000)),
+                request_deadline=float(os.getenv('OPENAI_REQUEST_DEADLINE', 120))
+            )
+            if _service.api_key:
+                logger.info("OpenAI API key loaded successfully")
+            else:
+                logger.error("Failed to load OpenAI API key")
+        return _service
@@ -0,0 +1,183 @@
+# app/services/plate_index.py
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import datetime
+import threading
+from typing import Any, Dict, Optional
+
+class PlateHistoryIndex:
+    def __init__(self, db_path: str):
+        """
+        Local index of inspections by license plate.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS inspections ("
+            "session_id TEXT PRIMARY KEY, plate TEXT, license_plate TEXT, car_brand TEXT, "
+            "tire_brands TEXT NOT NULL DEFAULT '[]', public_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS inspections_by_plate ON inspections (plate, created_at DESC)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def normalize_plate(plate: Optional[str]) -> str:
+        """
+        Normalize a license plate for lookups (e.g. 'ab-123-c' -> 'AB123C').
+
+        Args:
+            plate: License plate as recognized or typed
+
+        Returns:
+            str: Upper-case plate without separators
+        """
+        return re.sub(r'[^0-9A-Z]', '', (plate or '').upper())
+
+    def _upsert(self, session_id: str, **fields: Any) -> None:
+        """Create the session's row if needed and set the given columns."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR IGNORE INTO inspections (session_id, created_at, updated_at) VALUES (?, ?, ?)",
+            (session_id, now, now)
+        )
+        if fields:
+            assignments = ', '.join(f"{column} = ?" for column in fields)
+            connection.execute(
+                f"UPDATE inspections SET {assignments}, updated_at = ? WHERE session_id = ?",
+                (*fields.values(), now, session_id)
+            )
+
+    def record_license(self, session_id: str, license_plate: str, car_brand: str) -> None:
+        """
+        Record the recognized plate and car brand of a session.
+
+        Args:
+            session_id: Session identifier
+            license_plate: Recognized license plate
+            car_brand: Recognized car brand
+        """
+        try:
+            self._upsert(
+                session_id,
+                plate=self.normalize_plate(license_plate),
+                license_plate=license_plate,
+                car_brand=car_brand
+            )
+        except Exception as e:
+            self.logger.error(f"Error indexing license plate: {e}")
+
+    def record_tire_brand(self, session_id: str, tire_brand: str, license_plate: Optional[str] = None) -> None:
+        """
+        Add a recognized tire brand to a session.
+
+        Args:
+            session_id: Session identifier
+            tire_brand: Recognized tire brand
+            license_plate: License plate of the session, if known
+        """
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT tire_brands FROM inspections WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                tire_brands = json.loads(row[0]) if row else []
+                if tire_brand not in tire_brands:
+                    tire_brands.append(tire_brand)
+
+                fields: Dict[str, Any] = {'tire_brands': json.dumps(tire_brands)}
+                if license_plate:
+                    fields['plate'] = self.normalize_plate(license_plate)
+                    fields['license_plate'] = license_plate
+                self._upsert(session_id, **fields)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            self.logger.error(f"Error indexing tire brand: {e}")
+
+    def record_public_url(self, session_id: str, public_url: str) -> None:
+        """
+        Record where a session's images were published.
+
+        Args:
+            session_id: Session identifier
+            public_url: Public URL of the session's upload directory
+        """
+        try:
+            self._upsert(session_id, public_url=public_url)
+        except Exception as e:
+            self.logger.error(f"Error indexing public URL: {e}")
+
+    def find_by_plate(self, plate: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+        """
+        List the inspections of a license plate, newest first.
+
+        Args:
+            plate: License plate in any formatting
+            page: 1-based page number
+            per_page: Number of inspections per page
+
+        Returns:
+            Dict: The normalized plate, paging information and the inspections
+        """
+        normalized = self.normalize_plate(plate)
+        page = max(page, 1)
+        per_page = min(max(per_page, 1), 100)
+        connection = self._connection()
+
+        total = connection.execute(
+            "SELECT COUNT(*) FROM inspections WHERE plate = ?", (normalized,)
+        ).fetchone()[0]
+        rows = connection.execute(
+            "SELECT session_id, license_plate, car_brand, tire_brands, public_url, created_at, updated_at "
+            "FROM inspections WHERE plate = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (normalized, per_page, (page - 1) * per_page)
+        ).fetchall()
+
+        return {
+            "plate": normalized,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "pages": (total + per_page - 1) // per_page,
+            "inspections": [
+                {
+                    "session_id": row[0],
+                    "license_plate": row[1],
+                    "car_brand": row[2],
+                    "tire_brands": json.loads(row[3]),
+                    "public_url": row[4],
+                    "created_at": datetime.datetime.fromtimestamp(row[5]).isoformat(timespec='seconds'),
+                    "updated_at": datetime.datetime.fromtimestamp(row[6]).isoformat(timespec='seconds')
+                }
+                for row in rows
+            ]
+        }
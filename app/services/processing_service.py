@@ -1,33 +1,42 @@
 # app/services/processing_service.py
 
-import os
 import json
 import logging
 from typing import Optional, Dict, Any
 from services.get_license import get_license_from_image
 from services.get_tire_brand import get_tire_brand_from_image
+from services.session_store import SessionRepository
+from services.plate_index import PlateHistoryIndex
+from services.tracing import span
+from services.cancellation import JobCancelledError, check_cancelled
+from utils.image_buffer import ImageBuffer
 
 class ProcessingService:
-    def __init__(self, upload_folder: str):
-        self.upload_folder = upload_folder
+    def __init__(self, session_store: SessionRepository, plate_index: Optional[PlateHistoryIndex] = None):
+        self.session_store = session_store
+        self.plate_index = plate_index
         self.logger = logging.getLogger(__name__)
 
-    def process_license_plate(self, image_path: str, session_id: str) -> Optional[Dict[str, Any]]:
+    def process_license_plate(self, image: ImageBuffer, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Process license plate image and store results.
         
         Args:
-            image_path: Path to the license plate image
+            image: Buffer holding the license plate image
             session_id: Current session identifier
             
         Returns:
             Optional[Dict]: Processing results or None if processing failed
+
+        Raises:
+            JobCancelledError: If the job was cancelled before its result was stored
         """
         try:
             self.logger.info(f"Processing license plate for session {session_id}")
             
             # Get license plate info
-            license_info_str = get_license_from_image(image_path)
+            with span('license', 'recognition'):
+                license_info_str = get_license_from_image(image)
             if license_info_str is None:
                 self.logger.error("License plate detection failed")
                 return None
@@ -41,14 +50,19 @@ class ProcessingService:
                 license_plate = license_info.get('license_plate')
                 car_brand = license_info.get('car_brand', 'Unknown')
 
-                # Store session data
-                session_data = {
-                    'license_plate': license_plate,
-                    'car_brand': car_brand,
-                    'session_id': session_id
-                }
-                
-                self._save_session_data(session_id, session_data)
+                # A superseded upload must not overwrite the newer one's result
+                check_cancelled()
+                with span('license', 'session_write'):
+                    # Store session data, keeping fields written by other jobs (e.g. tire brand)
+                    session_data = self.session_store.update(session_id, lambda session_data: {
+                        **session_data,
+                        'license_plate': license_plate,
+                        'car_brand': car_brand,
+                        'session_id': session_id
+                    })
+
+                    if self.plate_index:
+                        self.plate_index.record_license(session_id, license_plate, car_brand)
                 return session_data
 
             except json.JSONDecodeError as e:
@@ -56,31 +70,32 @@ class ProcessingService:
                 self.logger.error(f"Raw license info: {license_info_str}")
                 return None
 
+        except JobCancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Error processing license plate: {e}")
             return None
 
-    def process_tire_brand(self, image_path: str, session_id: str) -> Optional[Dict[str, Any]]:
+    def process_tire_brand(self, image: ImageBuffer, session_id: str) -> Optional[Dict[str, Any]]:
         """
         Process tire brand image and store results.
         
         Args:
-            image_path: Path to the tire brand image
+            image: Buffer holding the tire brand image
             session_id: Current session identifier
             
         Returns:
             Optional[Dict]: Processing results or None if processing failed
+
+        Raises:
+            JobCancelledError: If the job was cancelled before its result was stored
         """
         try:
             self.logger.info(f"Processing tire brand for session {session_id}")
             
-            # Get existing session data
-            session_data = self._load_session_data(session_id)
-            if not session_data:
-                session_data = {'session_id': session_id}
-
             # Get tire brand info
-            tire_brand_info = get_tire_brand_from_image(image_path)
+            with span('tire_brand', 'recognition'):
+                tire_brand_info = get_tire_brand_from_image(image)
             if tire_brand_info is None:
                 self.logger.error("Tire brand detection failed")
                 return None
@@ -89,36 +104,26 @@ class ProcessingService:
                 tire_brand_data = json.loads(tire_brand_info)
                 tire_brand = tire_brand_data.get('tire_brand', 'Unknown')
                 
-                # Update session data
-                session_data['tire_brand'] = tire_brand
-                self._save_session_data(session_id, session_data)
-                
+                # A superseded upload must not overwrite the newer one's result
+                check_cancelled()
+                with span('tire_brand', 'session_write'):
+                    # Update session data
+                    session_data = self.session_store.update(session_id, lambda session_data: {
+                        **session_data,
+                        'tire_brand': tire_brand,
+                        'session_id': session_id
+                    })
+
+                    if self.plate_index:
+                        self.plate_index.record_tire_brand(session_id, tire_brand, session_data.get('license_plate'))
                 return session_data
 
             except json.JSONDecodeError as e:
                 self.logger.error(f"Error parsing tire brand JSON: {e}")
                 return None
 
+        except JobCancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Error processing tire brand: {e}")
             return None
-
-    def _save_session_data(self, session_id: str, data: Dict[str, Any]) -> None:
-        """Save session data to a file."""
-        try:
-            session_file = os.path.join(self.upload_folder, f'session_{session_id}.json')
-            with open(session_file, 'w') as f:
-                json.dump(data, f)
-        except Exception as e:
-            self.logger.error(f"Error saving session data: {e}")
-
-    def _load_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Load session data from a file."""
-        try:
-            session_file = os.path.join(self.upload_folder, f'session_{session_id}.json')
-            if os.path.exists(session_file):
-                with open(session_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            self.logger.error(f"Error loading session data: {e}")
-        return None
\ No newline at end of file
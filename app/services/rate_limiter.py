@@ -0,0 +1,218 @@
+# app/services/rate_limiter.py
+
+import time
+import random
+import logging
+import threading
+import email.utils
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Token bucket refilled continuously at a per-minute rate.
+
+        Args:
+            per_minute: Tokens added per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Take tokens, going into debt if necessary.
+
+        Callers are served in the order they reserve, each waiting for the
+        debt in front of it to be repaid.
+
+        Args:
+            amount: Number of tokens to take
+
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class VisionAPIAdmission:
+    def __init__(self, max_in_flight: int = 4, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 60,
+                 acquire_timeout: float = 120):
+        """
+        Admission control in front of the vision API.
+
+        Args:
+            max_in_flight: Maximum concurrent API requests
+            requests_per_minute: Request rate limit (0 disables it)
+            tokens_per_minute: Token rate limit (0 disables it)
+            max_retries: Maximum retries of a rate-limited (429) request
+            base_backoff: Base seconds for exponential backoff without Retry-After
+            max_backoff: Upper bound in seconds for a single backoff
+            acquire_timeout: Seconds to wait for a free request slot
+        """
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.logger = logging.getLogger(__name__)
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rate_limited = 0
+        self._queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._throttle_time = 0.0
+        self._backoff_time = 0.0
+
+    @contextmanager
+    def admit(self, estimated_tokens: int = 0) -> Iterator[None]:
+        """
+        Wait for rate-limit budget and a request slot, then hold the slot.
+
+        Rate limits are waited out before a slot is taken, so a throttled request
+        does not keep a slot from requests that could be sent meanwhile.
+
+        Args:
+            estimated_tokens: Estimated tokens consumed by the request
+
+        Raises:
+            TimeoutError: If no slot became available in time
+        """
+        start = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            throttle = self._throttle_delay(estimated_tokens)
+            if throttle > 0:
+                self.logger.debug(f"Throttling vision API request for {throttle:.2f}s")
+                time.sleep(throttle)
+            acquired = self._acquire_slot()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise TimeoutError("Timed out waiting for a vision API request slot")
+
+        try:
+            queue_wait = time.monotonic() - start - throttle
+            with self._lock:
+                self._in_flight += 1
+                self._admitted += 1
+                self._queue_wait += queue_wait
+                self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+                self._throttle_time += throttle
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def _acquire_slot(self) -> bool:
+        """Take a request slot outside any rate-limit pause, within the acquire timeout."""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            if not self._slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                return False
+            if self._paused_until <= time.monotonic():
+                return True
+            # A 429 paused admissions while this request waited; give the slot back meanwhile
+            self._slots.release()
+
+    def _throttle_delay(self, estimated_tokens: int) -> float:
+        """Seconds to wait for a rate-limit pause and the request and token budgets."""
+        delays = [self._paused_until - time.monotonic()]
+        if self.request_bucket:
+            delays.append(self.request_bucket.reserve(1))
+        if self.token_bucket and estimated_tokens:
+            delays.append(self.token_bucket.reserve(estimated_tokens))
+        return max(max(delays), 0.0)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Compute how long to back off after a 429 response.
+
+        Args:
+            attempt: Zero-based retry attempt
+            retry_after: Value of the Retry-After header, if any
+
+        Returns:
+            float: Seconds to wait, with jitter
+        """
+        delay = self._parse_retry_after(retry_after)
+        if delay is not None:
+            # Honor the server's delay and spread retries over up to 20% more
+            delay = delay + random.uniform(0, delay * 0.2 + 0.1)
+        else:
+            delay = random.uniform(0, self.base_backoff * (2 ** attempt))
+        return min(delay, self.max_backoff)
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date."""
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(retry_at.timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def rate_limited(self, delay: float) -> None:
+        """
+        Record a 429 response and hold back all new requests for the delay.
+
+        Args:
+            delay: Seconds to pause admissions
+        """
+        with self._lock:
+            self._rate_limited += 1
+            self._backoff_time += delay
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.logger.warning(f"Vision API rate limited, backing off for {delay:.2f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get admission statistics.
+
+        Returns:
+            Dict: Slot usage, counters and total/average wait times in seconds
+        """
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "admitted": self._admitted,
+                "rate_limited": self._rate_limited,
+                "queue_wait_seconds_total": round(self._queue_wait, 4),
+                "queue_wait_seconds_avg": round(self._queue_wait / self._admitted, 4) if self._admitted else 0.0,
+                "queue_wait_seconds_max": round(self._max_queue_wait, 4),
+                "throttle_seconds_total": round(self._throttle_time, 4),
+                "backoff_seconds_total": round(self._backoff_time, 4),
+                "paused_seconds_remaining": round(max(self._paused_until - time.monotonic(), 0.0), 4)
+            }
@@ -0,0 +1,175 @@
+# app/services/recognition_cache.py
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class RecognitionCache:
+    def __init__(self, max_entries: int = 1000, ttl: Optional[float] = 86400, db_path: Optional[str] = None):
+        """
+        Cache of recognition results keyed by image content.
+
+        Args:
+            max_entries: Maximum number of results kept in memory (least recently used are evicted)
+            ttl: Optional seconds a result stays valid
+            db_path: Optional SQLite file that persists results across restarts
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS recognition_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                self.logger.error(f"Error opening recognition cache database, using memory only: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(image_data: bytes, kind: str, model: str, prompt: str) -> str:
+        """
+        Build a cache key from the image content and the request that interprets it.
+
+        Args:
+            image_data: Raw image bytes
+            kind: Recognizer name (e.g., 'license', 'tire_brand')
+            model: Model name sent to the API
+            prompt: Prompt text sent to the API
+
+        Returns:
+            str: Hex digest identifying the recognition request
+        """
+        digest = hashlib.sha256()
+        for part in (kind, model, prompt):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(image_data)
+        return digest.hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        return bool(self.ttl) and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a recognition result.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Optional[str]: The cached result, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created_at FROM recognition_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and not self._expired(row[1]):
+                        self._remember(key, row[1], row[0])
+                        self._hits += 1
+                        self._disk_hits += 1
+                        return row[0]
+                except Exception as e:
+                    self.logger.error(f"Error reading recognition cache: {e}")
+
+            self._misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Store a recognition result.
+
+        Args:
+            key: Key from make_key()
+            value: Recognition result
+        """
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO recognition_cache (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, value, created_at)
+                    )
+                    if self.ttl:
+                        self._db.execute(
+                            "DELETE FROM recognition_cache WHERE created_at < ?", (created_at - self.ttl,)
+                        )
+                    self._db.commit()
+                except Exception as e:
+                    self.logger.error(f"Error writing recognition cache: {e}")
+
+    def _remember(self, key: str, created_at: float, value: str) -> None:
+        """Insert into the in-memory LRU; the caller holds the lock."""
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict: Hits (total and from disk), misses, hit ratio and in-memory size
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None
+            }
+
+_cache: Optional[RecognitionCache] = None
+_cache_lock = threading.Lock()
+
+def get_recognition_cache() -> RecognitionCache:
+    """
+    Get the process-wide recognition cache, configured from the environment on first use.
+
+    Returns:
+        RecognitionCache: The shared cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RecognitionCache(
+                max_entries=int(os.getenv('RECOGNITION_CACHE_SIZE', 1000)),
+                ttl=float(os.getenv('RECOGNITION_CACHE_TTL', 86400)) or None,
+                db_path=os.getenv('RECOGNITION_CACHE_DB') or None
+            )
+        return _cache
@@ -0,0 +1,101 @@
+# app/services/remote_dir_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+class RemoteDirectoryCache:
+    def __init__(self, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        """
+        Cache of remote directories known to exist.
+
+        Args:
+            ttl: Optional seconds after which an entry must be verified again
+            max_entries: Optional maximum number of cached directories (least recently used are evicted)
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        """Normalize a remote path to '/a/b/c' form."""
+        return '/' + '/'.join(part for part in path.replace('\\', '/').split('/') if part)
+
+    @classmethod
+    def prefixes(cls, path: str) -> List[str]:
+        """
+        Get every directory level of a path, from the root down.
+
+        Args:
+            path: Remote directory path
+
+        Returns:
+            List[str]: e.g. ['/a', '/a/b', '/a/b/c'] for '/a/b/c'
+        """
+        parts = [part for part in cls.normalize(path).split('/') if part]
+        return ['/' + '/'.join(parts[:index + 1]) for index in range(len(parts))]
+
+    def contains(self, path: str) -> bool:
+        """
+        Check whether a directory is known to exist.
+
+        Args:
+            path: Remote directory path
+
+        Returns:
+            bool: True if the directory is cached and not expired
+        """
+        path = self.normalize(path)
+        with self._lock:
+            added = self._entries.get(path)
+            if added is None:
+                return False
+            if self.ttl and time.monotonic() - added > self.ttl:
+                del self._entries[path]
+                return False
+            self._entries.move_to_end(path)
+            return True
+
+    def add(self, path: str) -> None:
+        """
+        Record a directory, and therefore all of its parents, as existing.
+
+        Args:
+            path: Remote directory path
+        """
+        now = time.monotonic()
+        with self._lock:
+            for prefix in self.prefixes(path):
+                self._entries[prefix] = now
+                self._entries.move_to_end(prefix)
+            if self.max_entries:
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        """
+        Forget a directory and everything below it.
+
+        Args:
+            path: Remote directory path
+        """
+        path = self.normalize(path)
+        with self._lock:
+            stale = [
+                cached for cached in self._entries
+                if cached == path or cached.startswith(path.rstrip('/') + '/')
+            ]
+            for cached in stale:
+                del self._entries[cached]
+
+    def clear(self) -> None:
+        """Forget all cached directories."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -3,10 +3,24 @@
 import datetime
 import logging
 from typing import Dict, Tuple, Optional
+from services.file_handler import UploadRejectedError
 
 class SessionManager:
-    def __init__(self, file_handler):
+    def __init__(self, file_handler, session_store, max_uploads: Optional[int] = None,
+                 max_upload_bytes: Optional[int] = None):
+        """
+        Initialize the session manager.
+
+        Args:
+            file_handler: Handler for uploaded files
+            session_store: Repository holding the session data
+            max_uploads: Most uploads accepted per session, or None for no limit
+            max_upload_bytes: Most bytes accepted per session, or None for no limit
+        """
         self.file_handler = file_handler
+        self.session_store = session_store
+        self.max_uploads = max_uploads
+        self.max_upload_bytes = max_upload_bytes
         self.logger = logging.getLogger(__name__)
 
     def create_session(self) -> str:
@@ -41,7 +55,7 @@ class SessionManager:
             Tuple[str, str]: License plate and car brand
         """
         try:
-            session_data = self.file_handler.load_session_data(session_id) or {}
+            session_data = self.session_store.get(session_id) or {}
             return (
                 session_data.get('license_plate', ''),
                 session_data.get('car_brand', '')
@@ -65,13 +79,79 @@ class SessionManager:
                 return False
                 
             # Check if session data exists
-            session_data = self.file_handler.load_session_data(session_id)
-            return session_data is not None
+            return self.session_store.exists(session_id)
             
         except Exception as e:
             self.logger.error(f"Error validating session: {e}")
             return False
 
+    def check_upload_quota(self, session_id: str, size: Optional[int] = None) -> None:
+        """
+        Check that a session may upload another file, before the upload is read.
+
+        Args:
+            session_id: The session identifier
+            size: Announced size of the upload in bytes, if known
+
+        Raises:
+            UploadRejectedError: If the upload would exceed the session's limits
+        """
+        if self.max_uploads is None and self.max_upload_bytes is None:
+            return
+        self._check_quota(self.session_store.get(session_id) or {}, size or 0)
+
+    def reserve_upload(self, session_id: str, size: int) -> None:
+        """
+        Count an accepted upload against the session's limits.
+
+        The check and the update are one atomic store update, so concurrent
+        uploads of a session cannot overshoot the limits.
+
+        Args:
+            session_id: The session identifier
+            size: Size of the upload in bytes
+
+        Raises:
+            UploadRejectedError: If the upload would exceed the session's limits
+        """
+        if self.max_uploads is None and self.max_upload_bytes is None:
+            return
+
+        def reserve(data):
+            self._check_quota(data, size)
+            data['upload_count'] = data.get('upload_count', 0) + 1
+            data['upload_bytes'] = data.get('upload_bytes', 0) + size
+            return data
+
+        self.session_store.update(session_id, reserve)
+
+    def release_upload(self, session_id: str, size: int) -> None:
+        """
+        Return an upload that was not processed to the session's limits.
+
+        Args:
+            session_id: The session identifier
+            size: Size of the upload in bytes
+        """
+        if self.max_uploads is None and self.max_upload_bytes is None:
+            return
+
+        def release(data):
+            data['upload_count'] = max(data.get('upload_count', 0) - 1, 0)
+            data['upload_bytes'] = max(data.get('upload_bytes', 0) - size, 0)
+            return data
+
+        try:
+            self.session_store.update(session_id, release)
+        except Exception as e:
+            self.logger.error(f"Error releasing upload quota for session {session_id}: {e}")
+
+    def _check_quota(self, data: Dict, size: int) -> None:
+        if self.max_uploads is not None and data.get('upload_count', 0) >= self.max_uploads:
+            raise UploadRejectedError(f"Upload limit of {self.max_uploads} files per session reached", 429)
+        if self.max_upload_bytes is not None and data.get('upload_bytes', 0) + size > self.max_upload_bytes:
+            raise UploadRejectedError(f"Upload limit of {self.max_upload_bytes} bytes per session reached", 413)
+
     def get_session_file_paths(self, session_id: str, prefix: str) -> str:
         """
         Generate file paths for session-related files.
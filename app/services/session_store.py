@@ -0,0 +1,257 @@
+# app/services/session_store.py
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+SessionData = Dict[str, Any]
+
+# Locks shared by the sessions of a file repository; updates of one session always use the same lock
+_LOCK_STRIPES = 64
+
+class SessionRepository:
+    """Storage for per-session inspection data."""
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        """
+        Load session data.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Optional[Dict]: Session data or None if not found
+        """
+        raise NotImplementedError
+
+    def update(self, session_id: str, updater: Callable[[SessionData], SessionData]) -> SessionData:
+        """
+        Atomically read, modify and write session data.
+
+        Args:
+            session_id: Session identifier
+            updater: Receives a copy of the current data ({} if none) and returns the new data
+
+        Returns:
+            Dict: The stored session data
+        """
+        raise NotImplementedError
+
+    def save(self, session_id: str, data: SessionData) -> SessionData:
+        """
+        Replace session data.
+
+        Args:
+            session_id: Session identifier
+            data: New session data
+
+        Returns:
+            Dict: The stored session data
+        """
+        return self.update(session_id, lambda _: dict(data))
+
+    def exists(self, session_id: str) -> bool:
+        """
+        Check whether data is stored for a session.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            bool: True if the session exists
+        """
+        return self.get(session_id) is not None
+
+class FileSessionRepository(SessionRepository):
+    def __init__(self, folder: str):
+        """
+        Session storage as session_<id>.json files, as used by earlier versions.
+
+        Args:
+            folder: Directory holding the session files
+        """
+        self.folder = folder
+        self.logger = logging.getLogger(__name__)
+        # Striped so the number of locks stays fixed however many sessions are served
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.folder, f'session_{session_id}.json')
+
+    def _lock_for(self, session_id: str) -> threading.Lock:
+        return self._locks[hash(session_id) % _LOCK_STRIPES]
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        try:
+            with open(self._path(session_id), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Error loading session data: {e}")
+            return None
+
+    def update(self, session_id: str, updater: Callable[[SessionData], SessionData]) -> SessionData:
+        with self._lock_for(session_id):
+            data = updater(dict(self.get(session_id) or {}))
+            path = self._path(session_id)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+            return data
+
+class SQLiteSessionRepository(SessionRepository):
+    def __init__(self, db_path: str, legacy_folder: Optional[str] = None):
+        """
+        Session storage in an SQLite database in WAL mode.
+
+        Args:
+            db_path: Path to the database file
+            legacy_folder: Optional folder with session_<id>.json files imported on first access
+        """
+        self.db_path = db_path
+        self.legacy = FileSessionRepository(legacy_folder) if legacy_folder else None
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _import_legacy(self, session_id: str) -> Optional[SessionData]:
+        """Copy a session from its legacy JSON file into the database."""
+        if self.legacy is None:
+            return None
+        data = self.legacy.get(session_id)
+        if data is not None:
+            self._connection().execute(
+                "INSERT OR IGNORE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), time.time())
+            )
+        return data
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        try:
+            row = self._connection().execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+            return self._import_legacy(session_id)
+        except Exception as e:
+            self.logger.error(f"Error loading session data: {e}")
+            return None
+
+    def update(self, session_id: str, updater: Callable[[SessionData], SessionData]) -> SessionData:
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent updates serialize
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is not None:
+                current = json.loads(row[0])
+            else:
+                current = (self.legacy.get(session_id) if self.legacy else None) or {}
+            data = updater(dict(current))
+            connection.execute(
+                "INSERT INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (session_id, json.dumps(data), time.time())
+            )
+            connection.execute("COMMIT")
+            return data
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+class CachedSessionRepository(SessionRepository):
+    def __init__(self, backend: SessionRepository, max_entries: int = 1000, ttl: Optional[float] = 5):
+        """
+        In-process read cache in front of another session repository.
+
+        Args:
+            backend: Repository holding the authoritative data
+            max_entries: Maximum number of cached sessions (least recently used are evicted)
+            ttl: Optional seconds a cached entry is trusted, bounding staleness across processes
+        """
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, SessionData]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, session_id: str, data: SessionData) -> None:
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), data)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, session_id: str) -> Optional[SessionData]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and not (self.ttl and time.monotonic() - entry[0] > self.ttl):
+                self._entries.move_to_end(session_id)
+                return dict(entry[1])
+
+        data = self.backend.get(session_id)
+        if data is not None:
+            self._remember(session_id, data)
+            return dict(data)
+        return None
+
+    def update(self, session_id: str, updater: Callable[[SessionData], SessionData]) -> SessionData:
+        try:
+            data = self.backend.update(session_id, updater)
+        except Exception:
+            with self._lock:
+                self._entries.pop(session_id, None)
+            raise
+        self._remember(session_id, data)
+        return dict(data)
+
+def create_session_repository(backend: str, folder: str, db_path: Optional[str] = None,
+                              cache_size: int = 1000, cache_ttl: Optional[float] = 5) -> SessionRepository:
+    """
+    Build the configured session repository.
+
+    Args:
+        backend: 'sqlite' or 'file'
+        folder: Upload folder holding legacy session_<id>.json files
+        db_path: SQLite database path (defaults to sessions.db in the folder)
+        cache_size: Maximum number of sessions cached in memory (0 disables the cache)
+        cache_ttl: Optional seconds a cached session is trusted
+
+    Returns:
+        SessionRepository: The repository
+    """
+    if backend == 'file':
+        repository: SessionRepository = FileSessionRepository(folder)
+    else:
+        repository = SQLiteSessionRepository(db_path or os.path.join(folder, 'sessions.db'), legacy_folder=folder)
+
+    if cache_size:
+        repository = CachedSessionRepository(repository, max_entries=cache_size, ttl=cache_ttl)
+    return repository
@@ -0,0 +1,209 @@
+# app/services/sftp_pool.py
+
+import time
+import socket
+import logging
+import threading
+import paramiko
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from services.metrics import SFTP_CONNECTIONS
+from services.tracing import span, record_span
+
+class SFTPConnection:
+    def __init__(self, transport: paramiko.Transport, sftp: paramiko.SFTPClient):
+        """
+        Authenticated SFTP session held by the pool.
+
+        Args:
+            transport: The underlying SSH transport
+            sftp: SFTP client opened on the transport
+        """
+        self.transport = transport
+        self.sftp = sftp
+        self.last_used = time.monotonic()
+
+    def is_alive(self) -> bool:
+        """Check whether the transport is still connected and authenticated."""
+        return self.transport.is_active() and self.transport.is_authenticated()
+
+    def close(self) -> None:
+        """Close the SFTP session and its transport."""
+        try:
+            self.sftp.close()
+        except Exception:
+            pass
+        try:
+            self.transport.close()
+        except Exception:
+            pass
+
+class SFTPConnectionPool:
+    def __init__(self, host: str, port: int, username: str, password: str,
+                 max_size: int = 4, idle_timeout: float = 300, probe_after: float = 30,
+                 acquire_timeout: float = 30, window_size: Optional[int] = None,
+                 max_packet_size: Optional[int] = None):
+        """
+        Initialize a thread-safe pool of authenticated SFTP connections.
+
+        Args:
+            host: SFTP host address
+            port: SFTP port number
+            username: SFTP username
+            password: SFTP password
+            max_size: Maximum number of open connections
+            idle_timeout: Seconds after which an unused connection is closed
+            probe_after: Seconds of idleness after which a connection is probed before reuse
+            acquire_timeout: Seconds to wait for a free connection
+            window_size: Optional SSH channel window in bytes (paramiko's default if omitted)
+            max_packet_size: Optional maximum SSH packet size in bytes (paramiko's default if omitted)
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.probe_after = probe_after
+        self.acquire_timeout = acquire_timeout
+        self.window_size = window_size
+        self.max_packet_size = max_packet_size
+        self.logger = logging.getLogger(__name__)
+
+        self._idle: List[SFTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+        self._reaper = threading.Thread(target=self._reap_loop, name="sftp-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _connect(self) -> SFTPConnection:
+        """Open and authenticate a new SFTP connection."""
+        self.logger.debug(f"Opening SFTP connection to {self.host}:{self.port}")
+        transport_options = {}
+        if self.window_size:
+            transport_options['default_window_size'] = self.window_size
+        if self.max_packet_size:
+            transport_options['default_max_packet_size'] = self.max_packet_size
+        with span('sftp', 'handshake'):
+            transport = paramiko.Transport((self.host, self.port), **transport_options)
+            try:
+                transport.connect(username=self.username, password=self.password)
+                sftp = paramiko.SFTPClient.from_transport(
+                    transport, window_size=self.window_size, max_packet_size=self.max_packet_size
+                )
+            except Exception:
+                transport.close()
+                SFTP_CONNECTIONS.inc(outcome='error')
+                raise
+        SFTP_CONNECTIONS.inc(outcome='success')
+        return SFTPConnection(transport, sftp)
+
+    def _is_usable(self, connection: SFTPConnection) -> bool:
+        """Check liveness, probing the server if the connection has been idle for a while."""
+        if not connection.is_alive():
+            return False
+        if time.monotonic() - connection.last_used < self.probe_after:
+            return True
+        try:
+            connection.sftp.normalize('.')
+            return True
+        except Exception as e:
+            self.logger.debug(f"SFTP connection probe failed: {e}")
+            return False
+
+    def _checkout(self) -> SFTPConnection:
+        """Take a live idle connection or open a new one."""
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self._connect()
+            if self._is_usable(connection):
+                return connection
+            self.logger.info("Discarding dead SFTP connection, reconnecting")
+            connection.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[paramiko.SFTPClient]:
+        """
+        Borrow an SFTP client from the pool.
+
+        The connection is returned to the pool afterwards, or discarded if it
+        failed at the transport level.
+
+        Yields:
+            paramiko.SFTPClient: An authenticated SFTP client
+
+        Raises:
+            TimeoutError: If no connection became available in time
+        """
+        requested_at = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError("Timed out waiting for a free SFTP connection")
+
+        connection: Optional[SFTPConnection] = None
+        try:
+            connection = self._checkout()
+            # Waiting for a free slot plus any reconnect
+            record_span('sftp', 'acquire', time.perf_counter() - requested_at)
+            yield connection.sftp
+        except Exception as e:
+            if connection is not None and (
+                isinstance(e, (paramiko.SSHException, EOFError, ConnectionError, socket.timeout))
+                or not connection.is_alive()
+            ):
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None:
+                connection.last_used = time.monotonic()
+                with self._lock:
+                    if self._closed:
+                        connection.close()
+                    else:
+                        self._idle.append(connection)
+            self._slots.release()
+
+    def _reap_loop(self) -> None:
+        """Periodically close connections that have been idle too long."""
+        interval = max(min(self.idle_timeout / 2, 60), 1)
+        while not self._closed:
+            time.sleep(interval)
+            self.close_idle()
+
+    def close_idle(self, max_idle: Optional[float] = None) -> int:
+        """
+        Close idle connections.
+
+        Args:
+            max_idle: Close connections idle longer than this many seconds (defaults to idle_timeout)
+
+        Returns:
+            int: Number of connections closed
+        """
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.monotonic()
+        with self._lock:
+            expired = [c for c in self._idle if now - c.last_used >= max_idle]
+            self._idle = [c for c in self._idle if c not in expired]
+        for connection in expired:
+            connection.close()
+        if expired:
+            self.logger.debug(f"Closed {len(expired)} idle SFTP connection(s)")
+        return len(expired)
+
+    def close(self) -> None:
+        """Close all pooled connections and stop handing out new ones."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def get_stats(self) -> dict:
+        """Get the number of idle connections and the pool size limit."""
+        with self._lock:
+            return {"idle": len(self._idle), "max_size": self.max_size}
@@ -1,21 +1,354 @@
 # app/services/status_service.py
 
 import json
+import time
+import asyncio
+import itertools
 import logging
-from typing import Any, Dict, Optional
-from queue import Queue
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from queue import Empty
+from services.event_broker import EventBroker
+
+# Event ID and serialized event
+Event = Tuple[int, str]
+
+def _append_event(subscription, event: Event, replaceable: bool) -> None:
+    """
+    Append an event to a subscriber buffer or session history.
+
+    A replaceable event overwrites the previous one if that is still the
+    unconsumed tail of the buffer, so slow consumers only see the latest value.
+    """
+    buffer = subscription.buffer
+    if replaceable and subscription._replaceable_tail and buffer:
+        buffer[-1] = event
+        return
+    if len(buffer) == buffer.maxlen:
+        subscription.dropped += 1
+    buffer.append(event)
+    subscription._replaceable_tail = replaceable
+
+class StatusSubscription:
+    def __init__(self, session_id: str, max_size: int):
+        """
+        Bounded event buffer for a single SSE subscriber.
+
+        Args:
+            session_id: Session the subscriber listens to
+            max_size: Maximum number of buffered events; the oldest are dropped when full
+        """
+        self.session_id = session_id
+        self.buffer: Deque[Event] = deque(maxlen=max_size)
+        self.dropped = 0
+        self._replaceable_tail = False
+        self._condition = threading.Condition()
+
+    def put(self, event: Event, replaceable: bool = False) -> None:
+        """
+        Add an event to the buffer, dropping the oldest one if it is full.
+
+        Args:
+            event: Event ID and serialized event
+            replaceable: Whether the event may be overwritten by a newer replaceable
+                event (e.g. progress) while it has not been consumed yet
+        """
+        with self._condition:
+            _append_event(self, event, replaceable)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Event:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Tuple[int, str]: ID and serialized event of the next event
+
+        Raises:
+            queue.Empty: If no event arrived within the timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.buffer, timeout):
+                raise Empty
+            if len(self.buffer) == 1:
+                self._replaceable_tail = False
+            return self.buffer.popleft()
+
+class AsyncStatusSubscription:
+    def __init__(self, session_id: str, max_size: int, loop: asyncio.AbstractEventLoop):
+        """
+        Bounded event buffer for a subscriber served from an asyncio event loop.
+
+        Events are published from worker threads and handed to the loop thread-safely.
+
+        Args:
+            session_id: Session the subscriber listens to
+            max_size: Maximum number of buffered events; the oldest are dropped when full
+            loop: Event loop the subscriber is consumed on
+        """
+        self.session_id = session_id
+        self.buffer: Deque[Event] = deque(maxlen=max_size)
+        self.dropped = 0
+        self.loop = loop
+        self._replaceable_tail = False
+        self._available = asyncio.Event()
+
+    def put(self, event: Event, replaceable: bool = False) -> None:
+        """Schedule an event for delivery on the subscriber's event loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._append, event, replaceable)
+        except RuntimeError:
+            # The event loop has shut down; the subscriber is gone
+            pass
+
+    def _append(self, event: Event, replaceable: bool) -> None:
+        _append_event(self, event, replaceable)
+        self._available.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Event:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Tuple[int, str]: ID and serialized event of the next event
+
+        Raises:
+            asyncio.TimeoutError: If no event arrived within the timeout
+        """
+        while not self.buffer:
+            self._available.clear()
+            await asyncio.wait_for(self._available.wait(), timeout)
+        if len(self.buffer) == 1:
+            self._replaceable_tail = False
+        return self.buffer.popleft()
+
+class _SessionHistory:
+    def __init__(self, max_size: int):
+        """
+        Recent events of a session, replayed to subscribers that reconnect.
+
+        Events published while the session had no subscriber are marked as
+        undelivered and handed to the next subscriber that connects.
+        """
+        self.buffer: Deque[Event] = deque(maxlen=max_size)
+        self.dropped = 0
+        self.undelivered_from: Optional[int] = None
+        self.updated = time.monotonic()
+        self._replaceable_tail = False
+
+    def since(self, event_id: int) -> List[Event]:
+        """Get the kept events with an ID above event_id, in ID order."""
+        return sorted(event for event in self.buffer if event[0] > event_id)
 
 class StatusService:
-    def __init__(self):
-        self.queue = Queue()
+    def __init__(self, subscriber_buffer_size: int = 100, history_size: int = 100,
+                 history_ttl: float = 300, progress_min_step: int = 5,
+                 progress_min_interval: float = 0.25, broker: Optional[EventBroker] = None):
+        """
+        Initialize the per-session status broker.
+
+        Every event gets an increasing ID and is kept in a bounded per-session
+        history, so a subscriber that reconnects with the ID of the last event
+        it received is sent the events it missed.
+
+        Args:
+            subscriber_buffer_size: Maximum buffered events per SSE subscriber
+            history_size: Maximum events kept per session for replay
+            history_ttl: Seconds to keep the history of a session without subscribers
+            progress_min_step: Minimum percentage change before another progress update is sent
+            progress_min_interval: Seconds after which a changed progress value is sent regardless of step
+            broker: Optional broker exchanging events with the other processes serving the app
+        """
+        self.subscriber_buffer_size = subscriber_buffer_size
+        self.history_size = history_size
+        self.history_ttl = history_ttl
+        self.progress_min_step = progress_min_step
+        self.progress_min_interval = progress_min_interval
+        self._subscribers: Dict[str, List[Any]] = {}
+        self._history: Dict[str, _SessionHistory] = {}
+        # Epoch seconds each session without subscribers last had one
+        self._seen: Dict[str, float] = {}
+        self._last_prune = time.monotonic()
+        # IDs of events without a broker-assigned ID; seeded from the clock so they keep increasing across restarts
+        self._event_ids = itertools.count(int(time.time() * 1000))
+        self._last_progress: Dict[str, Tuple[int, float]] = {}
+        self._progress_lock = threading.Lock()
+        self._lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
+        self.broker = broker or EventBroker()
+        self.broker.start(self._deliver, self._subscribed_sessions)
+
+    def subscribe(self, session_id: str, last_event_id: Optional[int] = None) -> StatusSubscription:
+        """
+        Register a new subscriber for a session's status updates.
+
+        A subscriber reconnecting with the ID of the last event it received is
+        sent the later events first; otherwise it receives the events published
+        while nobody was subscribed.
+
+        Args:
+            session_id: The session identifier
+            last_event_id: Optional ID of the last event the client received
+
+        Returns:
+            StatusSubscription: Buffer receiving the session's events
+        """
+        return self._register(StatusSubscription(session_id, self.subscriber_buffer_size), last_event_id)
+
+    def subscribe_async(self, session_id: str, loop: asyncio.AbstractEventLoop,
+                        last_event_id: Optional[int] = None) -> AsyncStatusSubscription:
+        """
+        Register a subscriber consumed from an asyncio event loop.
+
+        Args:
+            session_id: The session identifier
+            loop: Event loop the subscriber is consumed on
+            last_event_id: Optional ID of the last event the client received
+
+        Returns:
+            AsyncStatusSubscription: Buffer receiving the session's events
+        """
+        return self._register(
+            AsyncStatusSubscription(session_id, self.subscriber_buffer_size, loop), last_event_id
+        )
+
+    def _register(self, subscription, last_event_id: Optional[int] = None):
+        """Add a subscriber and replay the events it has not received."""
+        session_id = subscription.session_id
+        with self._lock:
+            self._subscribers.setdefault(session_id, []).append(subscription)
+            history = self._history.get(session_id)
+            if history is not None:
+                if last_event_id is not None:
+                    replay = history.since(last_event_id)
+                    if history.dropped and (not history.buffer or history.buffer[0][0] > last_event_id + 1):
+                        self.logger.warning(
+                            f"History of session {session_id} may not reach back to event {last_event_id}"
+                        )
+                elif history.undelivered_from is not None:
+                    replay = history.since(history.undelivered_from - 1)
+                else:
+                    replay = []
+                history.undelivered_from = None
+                for event in replay:
+                    subscription.put(event)
+            self._seen.pop(session_id, None)
+        self.broker.mark_seen([session_id])
+        self.logger.debug(f"Subscriber added for session {session_id}")
+        return subscription
+
+    def unsubscribe(self, subscription) -> None:
+        """
+        Remove a subscriber.
+
+        Args:
+            subscription: The subscription returned by subscribe()
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.session_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.session_id, None)
+                self._seen[subscription.session_id] = time.time()
+                left = True
+            else:
+                left = False
+        if left:
+            self.broker.mark_seen([subscription.session_id])
+        if subscription.dropped:
+            self.logger.warning(
+                f"Subscriber for session {subscription.session_id} dropped {subscription.dropped} events"
+            )
+        self.logger.debug(f"Subscriber removed for session {subscription.session_id}")
+
+    def _publish(self, session_id: str, status_data: Dict[str, Any], replaceable: bool = False) -> None:
+        """
+        Deliver an event to the subscribers of a single session in every process.
+
+        Raises:
+            Exception: If the broker could not share the event; it is then delivered nowhere
+        """
+        event = json.dumps(status_data)
+        # The broker numbers events when it shares them, so IDs agree between processes.
+        # An event it failed to share is not numbered locally instead: those IDs come from
+        # another range, and replay after a reconnect would skip the broker's later events.
+        event_id = self.broker.publish(session_id, event, replaceable)
+        self._deliver(session_id, event, replaceable, event_id)
+
+    def _deliver(self, session_id: str, event: str, replaceable: bool = False,
+                 event_id: Optional[int] = None) -> None:
+        """Record a serialized event in the session history and deliver it to this process's subscribers."""
+        with self._lock:
+            if event_id is None:
+                event_id = next(self._event_ids)
+            now = time.monotonic()
+            if now - self._last_prune > 1:
+                self._prune_history(now)
+
+            history = self._history.get(session_id)
+            if history is None:
+                history = self._history[session_id] = _SessionHistory(self.history_size)
+            _append_event(history, (event_id, event), replaceable)
+            history.updated = now
+
+            subscribers = self._subscribers.get(session_id)
+            if subscribers:
+                for subscription in subscribers:
+                    subscription.put((event_id, event), replaceable)
+            elif history.undelivered_from is None:
+                history.undelivered_from = event_id
+
+    def _prune_history(self, now: float) -> None:
+        """Drop the history of sessions without subscribers that have been idle too long."""
+        self._last_prune = now
+        expired = [
+            session_id for session_id, history in self._history.items()
+            if now - history.updated > self.history_ttl and session_id not in self._subscribers
+        ]
+        for session_id in expired:
+            del self._history[session_id]
+        cutoff = time.time() - self.history_ttl
+        for session_id in [session_id for session_id, seen in self._seen.items() if seen < cutoff]:
+            del self._seen[session_id]
+
+    def _subscribed_sessions(self) -> List[str]:
+        """List the sessions with a subscriber in this process."""
+        with self._lock:
+            return list(self._subscribers)
+
+    def last_seen(self, session_id: str) -> Optional[float]:
+        """
+        Get when a session last had a status subscriber in any process.
+
+        Args:
+            session_id: The session identifier
 
-    def send_processing_status(self, process_type: str, status: str, message: str, 
+        Returns:
+            Optional[float]: Epoch seconds, the current time while a subscriber is
+            connected, or None if the session was not watched recently
+        """
+        with self._lock:
+            if self._subscribers.get(session_id):
+                return time.time()
+            seen = self._seen.get(session_id)
+        remote = self.broker.last_seen(session_id)
+        return max((value for value in (seen, remote) if value is not None), default=None)
+
+    def send_processing_status(self, session_id: str, process_type: str, status: str, message: str,
                              additional_data: Optional[Dict[str, Any]] = None) -> None:
         """
         Send a processing status update.
-        
+
         Args:
+            session_id: Session the update belongs to
             process_type: Type of process (e.g., 'license', 'tire_brand')
             status: Current status (e.g., 'processing', 'success', 'error')
             message: Status message
@@ -27,36 +360,67 @@ class StatusService:
                 "status": status,
                 "message": message
             }
-            
+
             if additional_data:
                 status_data.update(additional_data)
-                
-            self.queue.put(json.dumps(status_data))
-            
+
+            self._publish(session_id, status_data)
+
         except Exception as e:
             self.logger.error(f"Error sending status update: {e}")
 
-    def send_progress_update(self, progress: int) -> None:
+    def send_progress_update(self, session_id: str, progress: int) -> None:
         """
         Send a progress update.
-        
+
+        Updates are coalesced: 0 and 100 are always sent, values in between only
+        once they moved by progress_min_step or progress_min_interval has passed.
+        An unconsumed progress update is replaced by the newer one.
+
         Args:
+            session_id: Session the update belongs to
             progress: Progress percentage (0-100)
         """
         try:
-            self.queue.put(json.dumps({
+            progress = min(max(progress, 0), 100)
+            if not self._should_send_progress(session_id, progress):
+                return
+
+            self._publish(session_id, {
                 "type": "progress",
                 "status": "uploading",
-                "progress": min(max(progress, 0), 100)
-            }))
+                "progress": progress
+            }, replaceable=True)
         except Exception as e:
             self.logger.error(f"Error sending progress update: {e}")
 
-    def send_ftp_status(self, status: str, message: str, link: Optional[str] = None) -> None:
+    def _should_send_progress(self, session_id: str, progress: int) -> bool:
+        """Decide whether a progress value is worth sending and record it if so."""
+        now = time.monotonic()
+        with self._progress_lock:
+            if progress in (0, 100):
+                if progress == 100:
+                    self._last_progress.pop(session_id, None)
+                else:
+                    self._last_progress[session_id] = (0, now)
+                return True
+
+            last_progress, last_sent = self._last_progress.get(session_id, (0, 0.0))
+            if progress == last_progress:
+                return False
+            if (abs(progress - last_progress) < self.progress_min_step
+                    and now - last_sent < self.progress_min_interval):
+                return False
+
+            self._last_progress[session_id] = (progress, now)
+            return True
+
+    def send_ftp_status(self, session_id: str, status: str, message: str, link: Optional[str] = None) -> None:
         """
         Send an FTP-related status update.
-        
+
         Args:
+            session_id: Session the update belongs to
             status: Current status (e.g., 'uploaded', 'error')
             message: Status message
             link: Optional public URL for uploaded file
@@ -67,37 +431,56 @@ class StatusService:
                 "status": status,
                 "message": message
             }
-            
+
             if link:
                 status_data["link"] = link
-                
-            self.queue.put(json.dumps(status_data))
-            
+
+            self._publish(session_id, status_data)
+
         except Exception as e:
             self.logger.error(f"Error sending FTP status: {e}")
 
-    def send_error(self, message: str) -> None:
+    def send_error(self, session_id: str, message: str) -> None:
         """
         Send an error status update.
-        
+
         Args:
+            session_id: Session the update belongs to
             message: Error message
         """
         try:
-            self.queue.put(json.dumps({
+            self._publish(session_id, {
                 "type": "error",
                 "message": message
-            }))
+            })
         except Exception as e:
             self.logger.error(f"Error sending error status: {e}")
 
-    def send_completion(self) -> None:
-        """Send a completion status update."""
+    def send_completion(self, session_id: str) -> None:
+        """
+        Send a completion status update.
+
+        Args:
+            session_id: Session the update belongs to
+        """
         try:
-            self.queue.put(json.dumps({"status": "done"}))
+            with self._progress_lock:
+                self._last_progress.pop(session_id, None)
+            self._publish(session_id, {"status": "done"})
         except Exception as e:
             self.logger.error(f"Error sending completion status: {e}")
 
-    def get_status_queue(self) -> Queue:
-        """Get the status queue for the SSE endpoint."""
-        return self.queue
\ No newline at end of file
+    def get_subscriber_count(self, session_id: Optional[str] = None) -> int:
+        """
+        Get the number of connected subscribers.
+
+        Args:
+            session_id: Optional session to count; all sessions if omitted
+
+        Returns:
+            int: Number of subscribers
+        """
+        with self._lock:
+            if session_id is not None:
+                return len(self._subscribers.get(session_id, []))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
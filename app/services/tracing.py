@@ -0,0 +1,370 @@
+# app/services/tracing.py
+
+import os
+import json
+import atexit
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from services.metrics import STAGE_DURATION
+
+Span = Dict[str, Any]
+
+# Seconds between deletions of persisted spans older than the TTL
+_PRUNE_INTERVAL = 600
+
+# Session whose timeline spans are recorded into, and the innermost open span
+_active_session: contextvars.ContextVar = contextvars.ContextVar('trace_session', default=None)
+_active_span: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+class _SessionTrace:
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.dropped = 0
+
+class TraceStore:
+    def __init__(self, max_sessions: int = 1000, max_spans: int = 500, db_path: Optional[str] = None,
+                 ttl: Optional[float] = 7 * 86400, flush_interval: float = 1.0, max_pending: int = 10000):
+        """
+        Span timelines of recent sessions.
+
+        Spans are persisted by a background writer in batches, so recording a
+        span never waits for the disk.
+
+        Args:
+            max_sessions: Sessions kept in memory (least recently used are evicted)
+            max_spans: Spans kept per session; the oldest are dropped when full
+            db_path: Optional SQLite file that keeps timelines beyond memory and restarts
+            ttl: Optional seconds persisted spans are kept
+            flush_interval: Seconds between batch writes to the database
+            max_pending: Spans waiting to be written beyond which new ones are not persisted
+        """
+        self.max_sessions = max_sessions
+        self.max_spans = max_spans
+        self.db_path = db_path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.logger = logging.getLogger(__name__)
+
+        self._traces: "OrderedDict[str, _SessionTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, str, Span]] = []
+        self._unpersisted = 0
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS trace_spans ("
+                    "session_id TEXT NOT NULL, trace_id TEXT NOT NULL, start REAL NOT NULL, span TEXT NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS trace_spans_session ON trace_spans (session_id, start)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS trace_spans_start ON trace_spans (start)")
+                self._db.commit()
+            except Exception as e:
+                self.logger.error(f"Error opening trace database, keeping traces in memory only: {e}")
+                self._db = None
+
+        if self._db is not None:
+            self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _trace_for(self, session_id: str) -> _SessionTrace:
+        """Get or create a session's trace; the caller holds the lock."""
+        trace = self._traces.get(session_id)
+        if trace is not None:
+            self._traces.move_to_end(session_id)
+            return trace
+
+        trace_id = self._load_trace_id(session_id) or uuid.uuid4().hex
+        trace = self._traces[session_id] = _SessionTrace(trace_id, self.max_spans)
+        while len(self._traces) > self.max_sessions:
+            self._traces.popitem(last=False)
+        return trace
+
+    def _write_loop(self) -> None:
+        """Write pending spans in batches and prune expired ones, on the writer's own connection."""
+        connection = sqlite3.connect(self.db_path)
+        last_prune = 0.0
+        while not self._stop.wait(self.flush_interval):
+            self._flush(connection)
+            now = time.time()
+            if self.ttl and now - last_prune > _PRUNE_INTERVAL:
+                last_prune = now
+                self._prune_persisted(connection)
+        self._flush(connection)
+        connection.close()
+
+    def _flush(self, connection: sqlite3.Connection) -> None:
+        """Write the spans recorded since the last flush in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            connection.executemany(
+                "INSERT INTO trace_spans (session_id, trace_id, start, span) VALUES (?, ?, ?, ?)",
+                [(session_id, trace_id, span['start'], json.dumps(span)) for session_id, trace_id, span in pending]
+            )
+            connection.commit()
+        except Exception as e:
+            self.logger.error(f"Error persisting {len(pending)} spans: {e}")
+
+    def _prune_persisted(self, connection: sqlite3.Connection) -> None:
+        """Delete persisted spans older than the TTL."""
+        try:
+            connection.execute("DELETE FROM trace_spans WHERE start < ?", (time.time() - self.ttl,))
+            connection.commit()
+        except Exception as e:
+            self.logger.error(f"Error pruning trace database: {e}")
+
+    def close(self) -> None:
+        """Write the remaining spans and stop the background writer."""
+        if self._writer is None:
+            return
+        self._stop.set()
+        self._writer.join()
+
+    def _load_trace_id(self, session_id: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT trace_id FROM trace_spans WHERE session_id = ? LIMIT 1", (session_id,)
+            ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            self.logger.error(f"Error reading trace database: {e}")
+            return None
+
+    def trace_id(self, session_id: str) -> str:
+        """
+        Get the trace ID of a session, assigning one on first use.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            str: 32 hex digit trace ID
+        """
+        with self._lock:
+            return self._trace_for(session_id).trace_id
+
+    def add_span(self, session_id: str, span: Span) -> None:
+        """
+        Append a finished span to a session's timeline.
+
+        Args:
+            session_id: Session identifier
+            span: Span from span() or record_span()
+        """
+        with self._lock:
+            trace = self._trace_for(session_id)
+            if len(trace.spans) == trace.spans.maxlen:
+                trace.dropped += 1
+            trace.spans.append(span)
+            if self._writer is None:
+                return
+            if len(self._pending) >= self.max_pending:
+                self._unpersisted += 1
+                return
+            self._pending.append((session_id, trace.trace_id, span))
+
+    def get_trace(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a session's timeline.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Optional[Dict]: Trace ID and spans ordered by start time with offsets from
+                the first span, or None if nothing was recorded for the session
+        """
+        with self._lock:
+            trace = self._traces.get(session_id)
+            if trace is not None:
+                trace_id, spans, dropped = trace.trace_id, list(trace.spans), trace.dropped
+            else:
+                trace_id, spans, dropped = self._load_spans(session_id)
+        if not spans:
+            return None
+
+        spans.sort(key=lambda span: span['start'])
+        started = spans[0]['start']
+        finished = max(span['start'] + span['duration_ms'] / 1000 for span in spans)
+        return {
+            "session_id": session_id,
+            "trace_id": trace_id,
+            "start": started,
+            "duration_ms": round((finished - started) * 1000, 3),
+            "dropped_spans": dropped,
+            "spans": [
+                {**span, "offset_ms": round((span['start'] - started) * 1000, 3)}
+                for span in spans
+            ]
+        }
+
+    def _load_spans(self, session_id: str):
+        """Load a persisted timeline; the caller holds the lock."""
+        if self._db is None:
+            return None, [], 0
+        try:
+            rows = self._db.execute(
+                "SELECT trace_id, span FROM trace_spans WHERE session_id = ? ORDER BY start DESC LIMIT ?",
+                (session_id, self.max_spans)
+            ).fetchall()
+        except Exception as e:
+            self.logger.error(f"Error reading trace database: {e}")
+            return None, [], 0
+        if not rows:
+            return None, [], 0
+        return rows[0][0], [json.loads(row[1]) for row in rows], 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number of sessions and spans held in memory."""
+        with self._lock:
+            return {
+                "sessions": len(self._traces),
+                "spans": sum(len(trace.spans) for trace in self._traces.values()),
+                "max_sessions": self.max_sessions,
+                "max_spans": self.max_spans,
+                "persistent": self._db is not None,
+                "pending_spans": len(self._pending),
+                "unpersisted_spans": self._unpersisted
+            }
+
+_store: Optional[TraceStore] = None
+_store_lock = threading.Lock()
+
+def get_trace_store() -> TraceStore:
+    """
+    Get the process-wide trace store, configured from the environment on first use.
+
+    Returns:
+        TraceStore: The shared store
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TraceStore(
+                max_sessions=int(os.getenv('TRACE_MAX_SESSIONS', 1000)),
+                max_spans=int(os.getenv('TRACE_MAX_SPANS', 500)),
+                db_path=os.getenv('TRACE_DB_PATH') or None,
+                ttl=float(os.getenv('TRACE_TTL', 7 * 86400)) or None
+            )
+        return _store
+
+@contextmanager
+def activate(session_id: str) -> Iterator[None]:
+    """
+    Record the spans of a block into a session's timeline.
+
+    The session is bound to the current context; hand work to other threads
+    with contextvars.copy_context().run to keep recording into it.
+
+    Args:
+        session_id: Session identifier
+    """
+    token = _active_session.set(session_id)
+    try:
+        yield
+    finally:
+        _active_session.reset(token)
+
+def _new_span(component: str, name: str, start: float, duration: float,
+              parent_id: Optional[str], attributes: Dict[str, Any], span_id: Optional[str] = None) -> Span:
+    return {
+        "span_id": span_id or os.urandom(8).hex(),
+        "parent_id": parent_id,
+        "component": component,
+        "name": name,
+        "start": start,
+        "duration_ms": round(duration * 1000, 3),
+        "thread": threading.current_thread().name,
+        "status": 'error' if 'error' in attributes else 'ok',
+        "attributes": attributes
+    }
+
+@contextmanager
+def span(component: str, name: str, session_id: Optional[str] = None,
+         record_metric: bool = True, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a stage, recording it in the stage histogram and the session's timeline.
+
+    Args:
+        component: Component the stage belongs to (e.g., 'license', 'sftp')
+        name: Stage name (e.g., 'encode', 'transfer')
+        session_id: Session to record into; defaults to the active session
+        record_metric: Whether to observe tms_stage_duration_seconds
+        **attributes: Attributes stored with the span
+
+    Yields:
+        Dict: The span attributes, which the block may add to
+    """
+    session_id = session_id or _active_session.get()
+    span_id = os.urandom(8).hex()
+    parent_id = _active_span.get()
+    token = _active_span.set(span_id)
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except Exception as e:
+        attributes['error'] = str(e) or type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _active_span.reset(token)
+        if record_metric:
+            STAGE_DURATION.observe(duration, component=component, stage=name)
+        if session_id:
+            get_trace_store().add_span(
+                session_id, _new_span(component, name, start, duration, parent_id, attributes, span_id)
+            )
+
+def record_span(component: str, name: str, duration: float, session_id: Optional[str] = None,
+                **attributes: Any) -> None:
+    """
+    Record a stage that just ended and was timed by the caller.
+
+    Args:
+        component: Component the stage belongs to
+        name: Stage name
+        duration: Seconds the stage took, ending now
+        session_id: Session to record into; defaults to the active session
+        **attributes: Attributes stored with the span
+    """
+    STAGE_DURATION.observe(duration, component=component, stage=name)
+    session_id = session_id or _active_session.get()
+    if session_id:
+        get_trace_store().add_span(
+            session_id, _new_span(component, name, time.time() - duration, duration, _active_span.get(), attributes)
+        )
+
+def traceparent() -> Optional[str]:
+    """
+    Get a W3C traceparent header value for the active session and span.
+
+    Returns:
+        Optional[str]: Header value, or None outside a session
+    """
+    session_id = _active_session.get()
+    if not session_id:
+        return None
+    span_id = _active_span.get() or os.urandom(8).hex()
+    return f"00-{get_trace_store().trace_id(session_id)}-{span_id}-01"
@@ -20,12 +20,24 @@ export class EventSourceHandler {
         this.errorHandler = createErrorHandler(elements);
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 3;
+        this.lastEventId = null;
+    }
+
+    /**
+     * Builds the stream URL, asking the server to replay the events missed since
+     * the last one received. A new EventSource does not send Last-Event-ID itself.
+     * @returns {string} URL of the status stream
+     */
+    buildUrl() {
+        if (!this.lastEventId) return this.statusActionUrl;
+        const separator = this.statusActionUrl.includes('?') ? '&' : '?';
+        return `${this.statusActionUrl}${separator}last_event_id=${encodeURIComponent(this.lastEventId)}`;
     }
 
     initialize() {
         console.log("Initializing EventSource...");
         try {
-            this.eventSource = new EventSource(this.statusActionUrl);
+            this.eventSource = new EventSource(this.buildUrl());
             this.setupEventListeners();
             this.reconnectAttempts = 0;
             return this.eventSource;
@@ -59,6 +71,10 @@ export class EventSourceHandler {
     }
 
     handleMessage(event) {
+        if (event.lastEventId) {
+            this.lastEventId = event.lastEventId;
+        }
+
         try {
             const data = this.parser.parse(event);
             console.log("Parsed event data:", data);
@@ -57,7 +57,9 @@ export class FormSubmissionHandler {
         });
 
         if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+            // Rejected uploads carry the reason, e.g. an unsupported image or a size limit
+            const body = await response.json().catch(() => ({}));
+            throw new Error(body.error || `HTTP error! status: ${response.status}`);
         }
 
         console.log("Form submitted successfully");
@@ -0,0 +1,139 @@
+"""
+Objective:
+This file contains the in-memory image handoff used by upload jobs. An uploaded image
+is read once and shared by recognition and the SFTP upload without further copies.
+Most Likely Classes:
+- ImageBuffer
+"""
+
+import io
+import os
+import mmap
+import shutil
+import logging
+import threading
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+class ImageBuffer:
+    def __init__(self, name: str, data: Optional[bytes] = None, path: Optional[str] = None):
+        """
+        Image content held in memory, or in a spool file for large images.
+
+        Args:
+            name: Name used in log messages (e.g., 'license_<session_id>')
+            data: Image bytes held in memory
+            path: Spool file holding the image, used when data is None
+        """
+        self.name = name
+        self.path = path
+        self._data = data
+        self._size = len(data) if data is not None else os.path.getsize(path)
+        self._mmap: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_stream(cls, stream: BinaryIO, name: str, spool_threshold: int,
+                    spool_path: str) -> 'ImageBuffer':
+        """
+        Read an image stream once, keeping it in memory up to the spool threshold.
+
+        Args:
+            stream: Readable binary stream positioned at the start of the image
+            name: Name used in log messages
+            spool_threshold: Largest size in bytes kept in memory
+            spool_path: File the image is written to if it is larger
+
+        Returns:
+            ImageBuffer: Buffer owning the image content
+        """
+        head = stream.read(spool_threshold + 1)
+        if len(head) <= spool_threshold:
+            return cls(name, data=head)
+
+        with open(spool_path, 'wb') as spool_file:
+            spool_file.write(head)
+            del head
+            shutil.copyfileobj(stream, spool_file, 1024 * 1024)
+        logger.debug(f"Spooled large image {name} to {spool_path}")
+        return cls(name, path=spool_path)
+
+    @property
+    def spooled(self) -> bool:
+        """Whether the image is held in a spool file rather than in memory."""
+        return self._data is None
+
+    @property
+    def size(self) -> int:
+        """Size of the image in bytes, recorded when the buffer was created."""
+        return self._size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def getbuffer(self) -> memoryview:
+        """
+        Get a read-only view of the image without copying it.
+
+        Spooled images are memory-mapped. Release the view (e.g. with a
+        `with` block) before closing the buffer.
+
+        Returns:
+            memoryview: View of the image bytes
+        """
+        if self._data is not None:
+            return memoryview(self._data)
+        with self._lock:
+            if self._mmap is None:
+                if self.size == 0:
+                    return memoryview(b'')
+                with open(self.path, 'rb') as spool_file:
+                    self._mmap = mmap.mmap(spool_file.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self._mmap)
+
+    def open(self) -> BinaryIO:
+        """
+        Open an independent reader over the image.
+
+        Returns:
+            BinaryIO: Stream positioned at the start of the image
+        """
+        if self._data is not None:
+            # BytesIO shares the bytes object until it is written to
+            return io.BytesIO(self._data)
+        return open(self.path, 'rb')
+
+    def close(self) -> None:
+        """Release the image, removing its spool file."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._data = None
+            if self._mmap is not None:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    # A view is still held; the mapping is released with it
+                    logger.warning(f"Image {self.name} is still referenced while closing")
+                self._mmap = None
+        if self.path:
+            try:
+                os.remove(self.path)
+                logger.info(f"Cleaned up file: {self.path}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Error cleaning up file: {e}")
+
+    def __enter__(self) -> 'ImageBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        state = ', closed' if self._closed else ''
+        return f"ImageBuffer({self.name!r}, {self._size} bytes{state})"
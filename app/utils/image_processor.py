@@ -1,9 +1,129 @@
 """
-Objective: 
+Objective:
 This file contains utility functions for processing images, such as resizing and encoding.
 Most Likely Classes:
 - ImageProcessor
 """
 
+import io
+import os
+import base64
+import logging
+import threading
+from typing import BinaryIO, Optional, Union
+from utils.image_buffer import ImageBuffer
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then sent unmodified
+    Image = None
+    ImageOps = None
+
 class ImageProcessor:
-    pass
+    def __init__(self, max_edge: int = 1600, jpeg_quality: int = 85):
+        """
+        Initialize the image processor.
+
+        Args:
+            max_edge: Maximum width or height in pixels of a processed image
+            jpeg_quality: JPEG quality (1-95) used when re-encoding
+        """
+        self.max_edge = max_edge
+        self.jpeg_quality = jpeg_quality
+        self.logger = logging.getLogger(__name__)
+
+        if Image is None:
+            self.logger.warning("Pillow is not installed, images will not be downscaled")
+
+    def downscale(self, data: Union[bytes, memoryview]) -> Union[bytes, memoryview]:
+        """
+        Apply EXIF orientation, shrink to max_edge and re-encode as JPEG.
+
+        The original bytes are returned if processing is unavailable, fails,
+        or would not make the image any smaller.
+
+        Args:
+            data: Raw image bytes
+
+        Returns:
+            Union[bytes, memoryview]: JPEG image bytes
+        """
+        processed = self._reencode(io.BytesIO(data), len(data))
+        return data if processed is None else processed
+
+    def _reencode(self, source: BinaryIO, size: int) -> Optional[bytes]:
+        """Re-encode an image read from a stream, or return None to keep the original."""
+        if Image is None:
+            return None
+
+        try:
+            with source, Image.open(source) as image:
+                source_format = image.format
+                rotated = image.getexif().get(0x0112, 1) != 1
+                needs_resize = max(image.size) > self.max_edge
+                if not (rotated or needs_resize) and source_format == 'JPEG':
+                    return None
+
+                image = ImageOps.exif_transpose(image)
+
+                if needs_resize:
+                    image.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+
+                output = io.BytesIO()
+                image.save(output, format='JPEG', quality=self.jpeg_quality, optimize=True)
+                processed = output.getvalue()
+
+            if len(processed) >= size and source_format == 'JPEG':
+                return None
+
+            self.logger.debug(f"Image reduced from {size} to {len(processed)} bytes")
+            return processed
+
+        except Exception as e:
+            self.logger.error(f"Error processing image, using original: {e}")
+            return None
+
+    def encode_base64(self, data: Union[bytes, memoryview, ImageBuffer]) -> bytes:
+        """
+        Downscale an image and encode it to base64.
+
+        The result is kept as ASCII bytes so it can be placed in a request
+        body without another str copy. An image buffer sent unmodified is
+        encoded from a view of it that is released before returning, so the
+        buffer can be closed right away.
+
+        Args:
+            data: Raw image bytes or an image buffer
+
+        Returns:
+            bytes: Base64-encoded JPEG
+        """
+        if not isinstance(data, ImageBuffer):
+            return base64.b64encode(self.downscale(data))
+
+        processed = self._reencode(data.open(), data.size)
+        if processed is not None:
+            return base64.b64encode(processed)
+        with data.getbuffer() as view:
+            return base64.b64encode(view)
+
+_processor: Optional[ImageProcessor] = None
+_processor_lock = threading.Lock()
+
+def get_image_processor() -> ImageProcessor:
+    """
+    Get the process-wide image processor, configured from the environment on first use.
+
+    Returns:
+        ImageProcessor: The shared processor
+    """
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = ImageProcessor(
+                max_edge=int(os.getenv('IMAGE_MAX_EDGE', 1600)),
+                jpeg_quality=int(os.getenv('IMAGE_JPEG_QUALITY', 85))
+            )
+        return _processor
@@ -0,0 +1,158 @@
+"""
+Objective:
+This file contains the early validation of uploaded images. The format is recognized
+from the magic bytes and the dimensions are read from the image header, without
+decoding the image or reading the rest of the upload.
+Most Likely Classes:
+- ImageValidator
+- ImageValidationError
+"""
+
+import os
+import struct
+import logging
+from typing import BinaryIO, Iterable, NamedTuple
+
+# JPEG start-of-frame markers carrying the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length field
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD8, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}
+_JPEG_MAX_SEGMENTS = 256
+
+class ImageInfo(NamedTuple):
+    format: str
+    width: int
+    height: int
+
+class ImageValidationError(ValueError):
+    def __init__(self, message: str, reason: str):
+        """
+        Raised when an upload is not an acceptable image.
+
+        Args:
+            message: Description for the client
+            reason: 'format' for unsupported or unrecognized files, 'dimensions' for
+                images of the wrong size, 'corrupt' for unreadable headers
+        """
+        super().__init__(message)
+        self.reason = reason
+
+class ImageValidator:
+    def __init__(self, allowed_formats: Iterable[str] = ('JPEG', 'PNG', 'WEBP'),
+                 min_dimension: int = 200, max_dimension: int = 16000, max_pixels: int = 60_000_000):
+        """
+        Initialize the image validator.
+
+        Args:
+            allowed_formats: Accepted formats ('JPEG', 'PNG', 'WEBP')
+            min_dimension: Minimum width and height in pixels
+            max_dimension: Maximum width and height in pixels
+            max_pixels: Maximum width times height, guarding against decompression bombs
+        """
+        self.allowed_formats = {image_format.upper() for image_format in allowed_formats}
+        self.min_dimension = min_dimension
+        self.max_dimension = max_dimension
+        self.max_pixels = max_pixels
+        self.logger = logging.getLogger(__name__)
+
+    def validate(self, stream: BinaryIO) -> ImageInfo:
+        """
+        Check the format and dimensions of an image stream.
+
+        Only the header is read; the stream is returned to its start position.
+
+        Args:
+            stream: Seekable binary stream at the start of the image
+
+        Returns:
+            ImageInfo: Format and dimensions of the image
+
+        Raises:
+            ImageValidationError: If the image is not acceptable
+        """
+        info = self.probe(stream)
+        if info.format not in self.allowed_formats:
+            raise ImageValidationError(f"Unsupported image format: {info.format}", 'format')
+        if min(info.width, info.height) < self.min_dimension:
+            raise ImageValidationError(
+                f"Image is too small ({info.width}x{info.height}), "
+                f"at least {self.min_dimension} pixels per side are required", 'dimensions'
+            )
+        if max(info.width, info.height) > self.max_dimension or info.width * info.height > self.max_pixels:
+            raise ImageValidationError(f"Image is too large ({info.width}x{info.height})", 'dimensions')
+        return info
+
+    def probe(self, stream: BinaryIO) -> ImageInfo:
+        """
+        Read the format and dimensions from an image header.
+
+        Args:
+            stream: Seekable binary stream at the start of the image
+
+        Returns:
+            ImageInfo: Format and dimensions of the image
+
+        Raises:
+            ImageValidationError: If the format is not recognized or the header is unreadable
+        """
+        start = stream.tell()
+        try:
+            head = stream.read(32)
+            if head.startswith(b'\xff\xd8\xff'):
+                width, height = self._jpeg_size(stream, start)
+                return ImageInfo('JPEG', width, height)
+            if head.startswith(b'\x89PNG\r\n\x1a\n'):
+                return ImageInfo('PNG', *self._png_size(head))
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                return ImageInfo('WEBP', *self._webp_size(head))
+            raise ImageValidationError("File is not a supported image", 'format')
+        except struct.error:
+            raise ImageValidationError("Image header is truncated or corrupt", 'corrupt')
+        finally:
+            stream.seek(start)
+
+    @staticmethod
+    def _png_size(head: bytes):
+        if head[12:16] != b'IHDR':
+            raise ImageValidationError("Image header is truncated or corrupt", 'corrupt')
+        return struct.unpack('>II', head[16:24])
+
+    @staticmethod
+    def _webp_size(head: bytes):
+        chunk = head[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', head[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = struct.unpack('<I', head[21:25])[0]
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return (int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1)
+        raise ImageValidationError("Image header is truncated or corrupt", 'corrupt')
+
+    @staticmethod
+    def _jpeg_size(stream: BinaryIO, start: int):
+        """Walk the JPEG segments up to the frame header, seeking over segment contents."""
+        stream.seek(start + 2)
+        for _ in range(_JPEG_MAX_SEGMENTS):
+            byte = stream.read(1)
+            if byte != b'\xff':
+                break
+            marker = stream.read(1)
+            while marker == b'\xff':  # fill bytes
+                marker = stream.read(1)
+            if not marker:
+                break
+            marker = marker[0]
+            if marker in _JPEG_STANDALONE_MARKERS:
+                continue
+            if marker == 0xD9:  # end of image before any frame
+                break
+            length = struct.unpack('>H', stream.read(2))[0]
+            if length < 2:
+                break
+            if marker in _JPEG_SOF_MARKERS:
+                _, height, width = struct.unpack('>BHH', stream.read(5))
+                return width, height
+            stream.seek(length - 2, os.SEEK_CUR)
+        raise ImageValidationError("Image header is truncated or corrupt", 'corrupt')
@@ -0,0 +1,306 @@
+"""
+End-to-end load driver for the inspection flow.
+
+Runs N concurrent start-session -> license upload -> status stream -> tire upload
+flows against a running app and reports p50/p95/p99 latencies per stage and the
+overall throughput. Run it against tools/mock_vision_api.py to avoid paid API calls.
+"""
+
+import io
+import sys
+import json
+import math
+import time
+import queue
+import socket
+import http.client
+import urllib.parse
+import random
+import argparse
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed to generate images when none are given
+    Image = None
+
+STAGES = [
+    'start_session',
+    'license_upload',
+    'license_recognition',
+    'license_done',
+    'tire_upload',
+    'tire_recognition',
+    'tire_done',
+    'flow'
+]
+
+class FlowError(Exception):
+    """Raised when a flow cannot continue."""
+
+class Recorder:
+    def __init__(self):
+        """Thread-safe collection of stage timings, outcomes and errors."""
+        self.timings = {stage: [] for stage in STAGES}
+        self.errors = {}
+        self.outcomes = {}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.timings[stage].append(seconds)
+
+    def outcome(self, name):
+        with self._lock:
+            self.outcomes[name] = self.outcomes.get(name, 0) + 1
+
+    def error(self, stage, message):
+        with self._lock:
+            key = f"{stage}: {message}"
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+def generate_image(text, size=(1280, 960)):
+    """Create a JPEG that is unique per flow so recognition results are not served from cache."""
+    if Image is None:
+        raise SystemExit("Pillow is required to generate images; pass --license-image and --tire-image instead")
+    image = Image.new('RGB', size, tuple(random.randrange(256) for _ in range(3)))
+    pixels = image.load()
+    for _ in range(2000):
+        pixels[random.randrange(size[0]), random.randrange(size[1])] = tuple(random.randrange(256) for _ in range(3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=85, comment=text.encode('utf-8'))
+    return buffer.getvalue()
+
+class EventStream:
+    def __init__(self, url):
+        """
+        Status stream of a session, read on a background thread.
+
+        Args:
+            url: URL of the session's upload-status stream
+        """
+        self.events = queue.Queue()
+        self._closed = False
+        parsed = urllib.parse.urlsplit(url)
+        self._connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+        self._path = parsed.path
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        try:
+            self._connection.request('GET', self._path, headers={'Accept': 'text/event-stream'})
+            self._connection.sock.settimeout(None)
+            response = self._connection.getresponse()
+            while not self._closed:
+                line = response.readline()
+                if not line:
+                    break
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data: '):
+                    continue
+                try:
+                    event = json.loads(line[len('data: '):])
+                except ValueError:
+                    continue
+                if event.get('type') != 'heartbeat':
+                    self.events.put(event)
+        except Exception as e:
+            if not self._closed:
+                self.events.put({'type': 'error', 'message': f"status stream: {type(e).__name__}"})
+
+    def get(self, timeout):
+        """Wait for the next event, returning None on timeout."""
+        try:
+            return self.events.get(timeout=max(timeout, 0))
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Disconnect without waiting for the reader, which may be blocked until the next heartbeat."""
+        self._closed = True
+        sock = self._connection.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._connection.close()
+
+class FlowRunner:
+    def __init__(self, base_url, recorder, license_image=None, tire_image=None, timeout=120,
+                 max_rejections=10):
+        """
+        Runs inspection flows against the app.
+
+        Args:
+            base_url: Base URL of the app, e.g. http://127.0.0.1:5000
+            recorder: Recorder collecting the results
+            license_image: Optional license image bytes (generated per flow if omitted)
+            tire_image: Optional tire image bytes (generated per flow if omitted)
+            timeout: Seconds to wait for a job to finish
+            max_rejections: Maximum retries of an upload answered with 503 (queue full)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.license_image = license_image
+        self.tire_image = tire_image
+        self.timeout = timeout
+        self.max_rejections = max_rejections
+
+    def run(self, flow_number):
+        client = requests.Session()
+        events = None
+        flow_start = time.perf_counter()
+        try:
+            start = time.perf_counter()
+            response = client.post(f"{self.base_url}/start-session", allow_redirects=False, timeout=30)
+            location = response.headers.get('Location', '')
+            if response.status_code not in (301, 302, 303) or '/session/' not in location:
+                raise FlowError(f"start_session: unexpected response {response.status_code}")
+            session_id = location.rstrip('/').rsplit('/', 1)[-1]
+            self.recorder.record('start_session', time.perf_counter() - start)
+
+            # One stream for the whole flow; events published before it connects are
+            # kept by the server until the first subscriber arrives
+            events = EventStream(f"{self.base_url}/session/{session_id}/upload-status")
+
+            license_image = self.license_image or generate_image(f"license-{flow_number}-{session_id}")
+            self._run_job(client, events, session_id, 'license', 'upload_license_plate', license_image)
+
+            tire_image = self.tire_image or generate_image(f"tire-{flow_number}-{session_id}")
+            self._run_job(client, events, session_id, 'tire', 'upload_tire_brand', tire_image)
+
+            self.recorder.record('flow', time.perf_counter() - flow_start)
+            self.recorder.outcome('completed')
+        except FlowError as e:
+            stage, _, message = str(e).partition(': ')
+            self.recorder.error(stage, message)
+            self.recorder.outcome('failed')
+        except requests.RequestException as e:
+            self.recorder.error('request', type(e).__name__)
+            self.recorder.outcome('failed')
+        finally:
+            if events is not None:
+                events.close()
+            client.close()
+
+    def _upload(self, client, session_id, endpoint, image):
+        """Post an image, retrying while the job queue is full."""
+        for _ in range(self.max_rejections + 1):
+            response = client.post(
+                f"{self.base_url}/session/{session_id}/{endpoint}",
+                files={'image': ('image.jpg', image, 'image/jpeg')},
+                timeout=30
+            )
+            if response.status_code != 503:
+                return response
+            self.recorder.reject()
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+        return response
+
+    def _run_job(self, client, events, session_id, kind, endpoint, image):
+        """Upload an image and follow the status stream until the job is done."""
+        recognition_type = 'license' if kind == 'license' else 'tire_brand'
+
+        start = time.perf_counter()
+        response = self._upload(client, session_id, endpoint, image)
+        if response.status_code not in (200, 202):
+            raise FlowError(f"{kind}_upload: status {response.status_code}")
+        accepted = time.perf_counter()
+        self.recorder.record(f'{kind}_upload', accepted - start)
+
+        recognized = False
+        deadline = accepted + self.timeout
+        while True:
+            event = events.get(deadline - time.perf_counter())
+            if event is None:
+                raise FlowError(f"{kind}_done: timed out")
+            if event.get('type') == recognition_type and event.get('status') in ('success', 'error'):
+                if event['status'] == 'error':
+                    raise FlowError(f"{kind}_recognition: {event.get('message', 'failed')}")
+                recognized = True
+                self.recorder.record(f'{kind}_recognition', time.perf_counter() - accepted)
+            elif event.get('type') == 'error' or (event.get('type') == 'ftp' and event.get('status') == 'error'):
+                raise FlowError(f"{kind}_done: {event.get('message', 'failed')}")
+            elif event.get('status') == 'done':
+                if not recognized:
+                    raise FlowError(f"{kind}_recognition: finished without a result")
+                self.recorder.record(f'{kind}_done', time.perf_counter() - accepted)
+                return
+
+def report(recorder, elapsed, flows, concurrency):
+    """Print the stage latency table and throughput."""
+    print()
+    print(f"Flows: {flows}  Concurrency: {concurrency}  Elapsed: {elapsed:.2f}s")
+    completed = recorder.outcomes.get('completed', 0)
+    print(f"Completed: {completed}  Failed: {recorder.outcomes.get('failed', 0)}  "
+          f"Rejected uploads (503): {recorder.rejected}")
+    print(f"Throughput: {completed / elapsed if elapsed else 0:.2f} flows/s")
+    print()
+    print(f"{'stage':<22}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for stage in STAGES:
+        values = recorder.timings[stage]
+        print(f"{stage:<22}{len(values):>7}"
+              f"{percentile(values, 0.50):>10.3f}{percentile(values, 0.95):>10.3f}"
+              f"{percentile(values, 0.99):>10.3f}{max(values) if values else 0:>10.3f}")
+    if recorder.errors:
+        print()
+        print("Errors:")
+        for message, count in sorted(recorder.errors.items(), key=lambda item: -item[1]):
+            print(f"  {count:>5}  {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent inspection flows against the app and report stage latencies.")
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000', help="Base URL of the app")
+    parser.add_argument('--flows', type=int, default=50, help="Total number of flows to run")
+    parser.add_argument('--concurrency', type=int, default=10, help="Number of flows running at the same time")
+    parser.add_argument('--license-image', help="License image to upload (a unique image is generated per flow if omitted)")
+    parser.add_argument('--tire-image', help="Tire image to upload (a unique image is generated per flow if omitted)")
+    parser.add_argument('--timeout', type=float, default=120, help="Seconds to wait for each job to finish")
+    parser.add_argument('--json', action='store_true', help="Also print the raw timings as JSON")
+    args = parser.parse_args()
+
+    def read_image(path):
+        if not path:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    recorder = Recorder()
+    runner = FlowRunner(
+        args.base_url,
+        recorder,
+        license_image=read_image(args.license_image),
+        tire_image=read_image(args.tire_image),
+        timeout=args.timeout
+    )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for number in range(args.flows):
+            executor.submit(runner.run, number)
+    elapsed = time.perf_counter() - start
+
+    report(recorder, elapsed, args.flows, args.concurrency)
+    if args.json:
+        print(json.dumps({"elapsed": elapsed, "timings": recorder.timings, "errors": recorder.errors}))
+    return 0 if not recorder.outcomes.get('failed') else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
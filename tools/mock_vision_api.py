@@ -0,0 +1,273 @@
+"""
+Local stand-in for the OpenAI chat completions API, for load tests without paid calls.
+
+Point the app at it with OPENAI_API_BASE=http://127.0.0.1:8081/v1 in app/config/openai/.env.
+License plate and tire brand prompts are answered with canned JSON; the latency
+and the share of failed (5xx) and rate-limited (429) responses are configurable.
+Counters are available at GET /stats. Requests carrying a W3C traceparent header
+(sent by the app for each session) are listed at GET /traces/<trace_id>.
+"""
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LICENSE_ANSWERS = [
+    {"license_plate": "AB-123-C", "car_brand": "Toyota"},
+    {"license_plate": "XY-987-Z", "car_brand": "Volkswagen"},
+    {"license_plate": "12-ABC-3", "car_brand": "Peugeot"}
+]
+DEFAULT_TIRE_ANSWERS = [
+    {"tire_brand": "Michelin"},
+    {"tire_brand": "Continental"},
+    {"tire_brand": "Pirelli"}
+]
+MAX_TRACES = 1000
+
+class LatencyModel:
+    def __init__(self, distribution, mean, stddev=0.0, minimum=0.0, maximum=None):
+        """
+        Response latency in seconds drawn from a distribution.
+
+        Args:
+            distribution: 'fixed', 'uniform', 'normal' or 'lognormal'
+            mean: Mean latency in seconds
+            stddev: Standard deviation in seconds (uniform uses mean +/- stddev)
+            minimum: Lower bound in seconds
+            maximum: Optional upper bound in seconds
+        """
+        self.distribution = distribution
+        self.mean = mean
+        self.stddev = stddev
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def sample(self):
+        if self.distribution == 'uniform':
+            value = random.uniform(self.mean - self.stddev, self.mean + self.stddev)
+        elif self.distribution == 'normal':
+            value = random.gauss(self.mean, self.stddev)
+        elif self.distribution == 'lognormal' and self.mean > 0:
+            # Parameters of the underlying normal distribution for the requested mean and deviation
+            variance = 1 + (self.stddev / self.mean) ** 2
+            value = random.lognormvariate(math.log(self.mean / math.sqrt(variance)), math.sqrt(math.log(variance)))
+        else:
+            value = self.mean
+        value = max(value, self.minimum)
+        if self.maximum is not None:
+            value = min(value, self.maximum)
+        return value
+
+class MockVisionAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency, error_rate=0.0, rate_limit_rate=0.0, retry_after=1,
+                 license_answers=None, tire_answers=None):
+        """
+        Chat completions server answering the app's recognition prompts.
+
+        Args:
+            address: (host, port) to listen on
+            latency: LatencyModel for successful and failed responses
+            error_rate: Share of requests answered with a 500 error
+            rate_limit_rate: Share of requests answered with a 429 and Retry-After
+            retry_after: Retry-After seconds sent with 429 responses
+            license_answers: Canned license plate answers
+            tire_answers: Canned tire brand answers
+        """
+        super().__init__(address, MockVisionHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.license_answers = license_answers or DEFAULT_LICENSE_ANSWERS
+        self.tire_answers = tire_answers or DEFAULT_TIRE_ANSWERS
+        self.stats = {"requests": 0, "license": 0, "tire_brand": 0, "unknown": 0,
+                      "errors": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+        self.stats_lock = threading.Lock()
+        self.traces = OrderedDict()
+
+    def record_trace(self, trace_id, entry):
+        """Remember a request under its trace ID, keeping the most recent traces."""
+        with self.stats_lock:
+            self.traces.setdefault(trace_id, []).append(entry)
+            self.traces.move_to_end(trace_id)
+            while len(self.traces) > MAX_TRACES:
+                self.traces.popitem(last=False)
+
+    def count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def answer(self, prompt):
+        """Pick a canned answer for a prompt, returning its kind and content."""
+        prompt = prompt.lower()
+        if 'license plate' in prompt:
+            return 'license', json.dumps(random.choice(self.license_answers))
+        if 'tire' in prompt and 'brand' in prompt:
+            return 'tire_brand', json.dumps(random.choice(self.tire_answers))
+        return 'unknown', '{}'
+
+def parse_traceparent(value):
+    """Get (trace ID, parent span ID) from a traceparent header, or (None, None)."""
+    parts = (value or '').split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+class MockVisionHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the cost of a load test
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/stats':
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        elif path.startswith('/traces/'):
+            trace_id = path[len('/traces/'):]
+            with self.server.stats_lock:
+                requests = list(self.server.traces.get(trace_id, []))
+            if requests:
+                self._send_json(200, {"trace_id": trace_id, "requests": requests})
+            else:
+                self._send_json(404, {"error": {"message": "Unknown trace"}})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        server = self.server
+        server.count('requests')
+        server.count('in_flight')
+        trace_id, parent_span_id = parse_traceparent(self.headers.get('traceparent'))
+        request_id = f"req_mock_{random.getrandbits(64):016x}"
+        headers = {"x-request-id": request_id}
+        received_at = time.time()
+        kind, status, latency = 'unknown', 400, 0.0
+        try:
+            try:
+                payload = json.loads(body)
+                content = payload['messages'][0]['content']
+                prompt = ' '.join(part.get('text', '') for part in content if isinstance(part, dict))
+            except (ValueError, KeyError, IndexError, TypeError):
+                self._send_json(400, {"error": {"message": "Invalid request body"}}, headers)
+                return
+
+            latency = server.latency.sample()
+            time.sleep(latency)
+
+            roll = random.random()
+            if roll < server.rate_limit_rate:
+                server.count('rate_limited')
+                status = 429
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                {**headers, "Retry-After": str(server.retry_after)})
+                return
+            if roll < server.rate_limit_rate + server.error_rate:
+                server.count('errors')
+                status = 500
+                self._send_json(500, {"error": {"message": "Mock server error", "type": "server_error"}}, headers)
+                return
+
+            kind, answer = server.answer(prompt)
+            server.count(kind)
+            status = 200
+            self._send_json(200, {
+                "id": f"chatcmpl-mock-{random.getrandbits(48):012x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get('model', 'mock'),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020}
+            }, headers)
+        finally:
+            server.count('in_flight', -1)
+            if trace_id:
+                server.record_trace(trace_id, {
+                    "request_id": request_id,
+                    "parent_span_id": parent_span_id,
+                    "kind": kind,
+                    "status": status,
+                    "received_at": received_at,
+                    "latency_ms": round(latency * 1000, 3)
+                })
+
+def load_answers(value):
+    """Parse canned answers given as a JSON object, a JSON list or a path to a JSON file."""
+    if value is None:
+        return None
+    if not value.lstrip().startswith(('{', '[')):
+        with open(value, 'r', encoding='utf-8') as f:
+            value = f.read()
+    answers = json.loads(value)
+    return answers if isinstance(answers, list) else [answers]
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock chat completions API answering the app's recognition prompts.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=8081, help="Port to listen on")
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'normal', 'lognormal'], default='lognormal',
+                        help="Latency distribution")
+    parser.add_argument('--latency-mean', type=float, default=1.5, help="Mean latency in seconds")
+    parser.add_argument('--latency-stddev', type=float, default=0.5, help="Latency standard deviation in seconds")
+    parser.add_argument('--latency-min', type=float, default=0.0, help="Minimum latency in seconds")
+    parser.add_argument('--latency-max', type=float, default=None, help="Maximum latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failing with 500 (0-1)")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Share of requests answered with 429 (0-1)")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument('--license-answers', help="License answers as JSON or a path to a JSON file")
+    parser.add_argument('--tire-answers', help="Tire brand answers as JSON or a path to a JSON file")
+    parser.add_argument('--seed', type=int, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = MockVisionAPI(
+        (args.host, args.port),
+        LatencyModel(args.latency, args.latency_mean, args.latency_stddev, args.latency_min, args.latency_max),
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        license_answers=load_answers(args.license_answers),
+        tire_answers=load_answers(args.tire_answers)
+    )
+    print(f"Mock vision API listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+SFTP transfer benchmark for FTPService.
+
+Measures connection handshakes, directory walks, chunk sizes, pipelined writes and
+concurrent uploads against the in-process SFTP test server (optionally behind a
+simulated slow link) or any other SFTP server, and reports MB/s and latency
+histograms. Results can be saved as JSON and compared against a baseline to catch
+regressions.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.ftp_service import FTPService
+from sftp_test_server import LatencyProxy, SFTPTestServer
+
+MB = 1024 * 1024
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+def summarize(latencies, total_bytes=0, elapsed=0.0):
+    """Latency percentiles in milliseconds and, for transfers, the throughput."""
+    summary = {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+        "latencies": latencies
+    }
+    if total_bytes:
+        summary["mb_per_s"] = round(total_bytes / MB / elapsed, 2) if elapsed else 0.0
+    return summary
+
+def print_histogram(name, summary):
+    """Print a latency summary with an ASCII histogram."""
+    line = (f"{name:<34} n={summary['count']:<5} p50={summary['p50_ms']:>9.2f}ms "
+            f"p95={summary['p95_ms']:>9.2f}ms p99={summary['p99_ms']:>9.2f}ms")
+    if 'mb_per_s' in summary:
+        line += f"  {summary['mb_per_s']:>8.2f} MB/s"
+    print(line)
+
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for latency in summary['latencies']:
+        milliseconds = latency * 1000
+        index = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if milliseconds <= bound),
+                     len(HISTOGRAM_BUCKETS_MS))
+        counts[index] += 1
+    peak = max(counts) or 1
+    for index, count in enumerate(counts):
+        if not count:
+            continue
+        label = f"<= {HISTOGRAM_BUCKETS_MS[index]} ms" if index < len(HISTOGRAM_BUCKETS_MS) else \
+            f"> {HISTOGRAM_BUCKETS_MS[-1]} ms"
+        print(f"    {label:>12} {count:>6} {'#' * max(1, round(40 * count / peak))}")
+
+class SFTPBenchmark:
+    def __init__(self, ftp_service, remote_root, file_size, iterations):
+        """
+        Benchmark cases run against one SFTP server.
+
+        Args:
+            ftp_service: FTPService connected to the server
+            remote_root: Remote directory the benchmark may write to
+            file_size: Size in bytes of the uploaded test files
+            iterations: Number of repetitions per case
+        """
+        self.ftp_service = ftp_service
+        self.remote_root = remote_root.rstrip('/')
+        self.file_size = file_size
+        self.iterations = iterations
+        self.payload = os.urandom(file_size)
+        self.local_dir = tempfile.mkdtemp(prefix='sftp-benchmark-')
+        self.local_file = os.path.join(self.local_dir, 'payload.bin')
+        with open(self.local_file, 'wb') as f:
+            f.write(self.payload)
+
+    def _remote_dir(self, *parts):
+        return '/'.join([self.remote_root, f"run-{uuid.uuid4().hex[:8]}", *parts])
+
+    def handshake(self):
+        """Time opening and authenticating fresh connections."""
+        latencies = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            connection = self.ftp_service.pool._connect()
+            latencies.append(time.perf_counter() - start)
+            connection.close()
+        return {"handshake": summarize(latencies)}
+
+    def mkdir_walk(self, depth=5):
+        """Time directory walks that create, find or skip every level."""
+        results = {}
+        paths = [self._remote_dir(*[f"level{level}" for level in range(depth)]) for _ in range(self.iterations)]
+
+        for name in ('mkdir_walk_create', 'mkdir_walk_existing', 'mkdir_walk_cached'):
+            self.ftp_service.dir_cache.clear()
+            if name == 'mkdir_walk_cached':
+                for path in paths:
+                    self.ftp_service.dir_cache.add(path)
+            latencies = []
+            for path in paths:
+                start = time.perf_counter()
+                with self.ftp_service.pool.connection() as sftp:
+                    self.ftp_service._ensure_remote_directory(sftp, path)
+                latencies.append(time.perf_counter() - start)
+                if name == 'mkdir_walk_existing':
+                    self.ftp_service.dir_cache.clear()
+            results[name] = summarize(latencies)
+        return results
+
+    def _write(self, remote_path, chunk_size, pipelined):
+        with self.ftp_service.pool.connection() as sftp:
+            with sftp.file(remote_path, 'wb') as remote_file:
+                remote_file.set_pipelined(pipelined)
+                view = memoryview(self.payload)
+                for offset in range(0, len(view), chunk_size):
+                    remote_file.write(view[offset:offset + chunk_size])
+
+    def chunk_sizes(self, chunk_sizes, pipelined):
+        """Time single uploads of the test file with different chunk sizes."""
+        results = {}
+        directory = self._remote_dir()
+        self.ftp_service.create_remote_directory(directory)
+        mode = 'pipelined' if pipelined else 'sequential'
+        for chunk_size in chunk_sizes:
+            latencies = []
+            for iteration in range(self.iterations):
+                start = time.perf_counter()
+                self._write(f"{directory}/{mode}-{chunk_size}-{iteration}.bin", chunk_size, pipelined)
+                latencies.append(time.perf_counter() - start)
+            results[f"write_{mode}_{chunk_size // 1024}k"] = summarize(
+                latencies, self.file_size * len(latencies), sum(latencies)
+            )
+        return results
+
+    def concurrent_uploads(self, concurrency):
+        """Upload the test file from several threads through FTPService.upload_file."""
+        directory = self._remote_dir()
+        self.ftp_service.create_remote_directory(directory)
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        def upload(number):
+            start = time.perf_counter()
+            success = self.ftp_service.upload_file(self.local_file, directory, f"upload-{number}.bin")
+            with lock:
+                (latencies if success else failures).append(time.perf_counter() - start)
+
+        count = self.iterations * concurrency
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(upload, range(count)))
+        elapsed = time.perf_counter() - start
+
+        summary = summarize(latencies, self.file_size * len(latencies), elapsed)
+        summary["failures"] = len(failures)
+        return {f"upload_concurrent_{concurrency}": summary}
+
+    def close(self):
+        shutil.rmtree(self.local_dir, ignore_errors=True)
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline run.
+
+    Returns:
+        list: Descriptions of cases whose throughput dropped or median latency rose beyond the tolerance
+    """
+    regressions = []
+    for name, summary in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if 'mb_per_s' in summary and reference.get('mb_per_s'):
+            if summary['mb_per_s'] < reference['mb_per_s'] * (1 - tolerance):
+                regressions.append(f"{name}: {summary['mb_per_s']:.2f} MB/s vs {reference['mb_per_s']:.2f} MB/s")
+        elif reference.get('p50_ms') and summary['p50_ms'] > reference['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {summary['p50_ms']:.2f} ms vs {reference['p50_ms']:.2f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SFTP handshakes, directory walks and uploads through FTPService.")
+    parser.add_argument('--host', help="SFTP server to benchmark (an in-process test server is used if omitted)")
+    parser.add_argument('--port', type=int, default=22, help="SFTP port")
+    parser.add_argument('--username', default='test', help="SFTP username")
+    parser.add_argument('--password', default='test', help="SFTP password")
+    parser.add_argument('--remote-root', default='/benchmark', help="Remote directory the benchmark writes to")
+    parser.add_argument('--rtt', type=float, default=0.0, help="Simulated round-trip time in seconds for the test server")
+    parser.add_argument('--file-size', type=float, default=4, help="Size of the uploaded test file in MB")
+    parser.add_argument('--iterations', type=int, default=5, help="Repetitions per case")
+    parser.add_argument('--chunk-sizes', default='8,32,64,256', help="Comma-separated chunk sizes in KB")
+    parser.add_argument('--concurrency', default='1,4', help="Comma-separated numbers of concurrent uploads")
+    parser.add_argument('--upload-chunk-size', type=int, default=256, help="FTPService chunk size in KB for concurrent uploads")
+    parser.add_argument('--window-size', type=int, default=0, help="SSH channel window in bytes (0 = paramiko default)")
+    parser.add_argument('--sequential', action='store_true', help="Disable pipelined writes in FTPService")
+    parser.add_argument('--cases', default='handshake,mkdir,chunks,pipelined,concurrent',
+                        help="Comma-separated cases to run")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with results previously written with --output")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # The test server logs every connection the handshake case closes as a reset
+    logging.getLogger('paramiko').setLevel(logging.CRITICAL)
+    cases = set(args.cases.split(','))
+    chunk_sizes = [int(size) * 1024 for size in args.chunk_sizes.split(',')]
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+
+    server = proxy = server_root = None
+    host, port = args.host, args.port
+    if host is None:
+        server_root = tempfile.mkdtemp(prefix='sftp-benchmark-server-')
+        server = SFTPTestServer(server_root, args.username, args.password).start()
+        host, port = server.host, server.port
+        if args.rtt:
+            proxy = LatencyProxy(host, port, args.rtt).start()
+            host, port = proxy.host, proxy.port
+
+    ftp_service = FTPService(
+        host, port, args.username, args.password,
+        pool_size=max(concurrency_levels),
+        chunk_size=args.upload_chunk_size * 1024,
+        pipelined=not args.sequential,
+        window_size=args.window_size or None
+    )
+    benchmark = SFTPBenchmark(ftp_service, args.remote_root, int(args.file_size * MB), args.iterations)
+    print(f"Benchmarking {host}:{port} (RTT {args.rtt * 1000:.0f} ms simulated, "
+          f"{args.file_size} MB file, {args.iterations} iterations)")
+    print()
+
+    results = {}
+    try:
+        ftp_service.create_remote_directory(args.remote_root)
+        if 'handshake' in cases:
+            results.update(benchmark.handshake())
+        if 'mkdir' in cases:
+            results.update(benchmark.mkdir_walk())
+        if 'chunks' in cases:
+            results.update(benchmark.chunk_sizes(chunk_sizes, pipelined=False))
+        if 'pipelined' in cases:
+            results.update(benchmark.chunk_sizes(chunk_sizes, pipelined=True))
+        if 'concurrent' in cases:
+            for level in concurrency_levels:
+                results.update(benchmark.concurrent_uploads(level))
+    finally:
+        benchmark.close()
+        ftp_service.pool.close()
+        if proxy is not None:
+            proxy.stop()
+        if server is not None:
+            server.stop()
+            shutil.rmtree(server_root, ignore_errors=True)
+
+    for name, summary in results.items():
+        print_histogram(name, summary)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"rtt": args.rtt, "file_size_mb": args.file_size, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
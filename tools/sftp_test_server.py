@@ -0,0 +1,298 @@
+"""
+In-process SFTP server for benchmarks and local runs without the production host.
+
+Serves a local directory over SFTP using paramiko, with password authentication.
+LatencyProxy can be put in front of it to simulate a high-latency link.
+
+Run standalone to serve a directory, for example:
+    python tools/sftp_test_server.py --root /tmp/webdisk --port 2222 --rtt 0.08
+"""
+
+import os
+import time
+import queue
+import socket
+import logging
+import argparse
+import threading
+import paramiko
+from paramiko import SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface, SFTP_OK, SFTP_FAILURE
+
+logger = logging.getLogger(__name__)
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+
+    def check_auth_password(self, username, password):
+        if username == self.username and password == self.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+class _Handle(SFTPHandle):
+    def stat(self):
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        return SFTP_OK
+
+class _LocalDirectorySFTP(SFTPServerInterface):
+    def __init__(self, server, root, *args, **kwargs):
+        """SFTP operations mapped onto a local root directory."""
+        super().__init__(server, *args, **kwargs)
+        self.root = root
+
+    def _local(self, path):
+        return os.path.join(self.root, self.canonicalize(path).lstrip('/'))
+
+    def list_folder(self, path):
+        local = self._local(path)
+        try:
+            entries = []
+            for name in os.listdir(local):
+                attributes = SFTPAttributes.from_stat(os.stat(os.path.join(local, name)))
+                attributes.filename = name
+                entries.append(attributes)
+            return entries
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        try:
+            fd = os.open(self._local(path), flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY:
+            mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR:
+            mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else:
+            mode = 'rb'
+        handle = _Handle(flags)
+        handle.filename = self._local(path)
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        try:
+            os.remove(self._local(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def rename(self, oldpath, newpath):
+        # Plain SFTP rename does not overwrite, like most servers
+        if os.path.exists(self._local(newpath)):
+            return SFTP_FAILURE
+        try:
+            os.rename(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def posix_rename(self, oldpath, newpath):
+        try:
+            os.replace(self._local(oldpath), self._local(newpath))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def mkdir(self, path, attr):
+        try:
+            os.mkdir(self._local(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+    def rmdir(self, path):
+        try:
+            os.rmdir(self._local(path))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+        return SFTP_OK
+
+class SFTPTestServer:
+    def __init__(self, root, username='test', password='test', host='127.0.0.1', port=0, host_key=None):
+        """
+        SFTP server serving a local directory.
+
+        Args:
+            root: Local directory exposed as the remote root
+            username: Accepted username
+            password: Accepted password
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+            host_key: Optional paramiko host key (an RSA key is generated if omitted)
+        """
+        self.root = os.path.abspath(root)
+        self.username = username
+        self.password = password
+        self.host_key = host_key or paramiko.RSAKey.generate(2048)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(100)
+        self.host, self.port = self.sock.getsockname()
+        self.connections = 0
+        self.transports = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """Accept connections on a background thread."""
+        os.makedirs(self.root, exist_ok=True)
+        threading.Thread(target=self._accept_loop, name='sftp-test-server', daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            transport = paramiko.Transport(client)
+            transport.add_server_key(self.host_key)
+            root = self.root
+            transport.set_subsystem_handler(
+                'sftp', SFTPServer,
+                sftp_si=lambda server, *args, **kwargs: _LocalDirectorySFTP(server, root, *args, **kwargs)
+            )
+            try:
+                transport.start_server(server=_ServerInterface(self.username, self.password))
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                logger.debug(f"SFTP test server handshake failed: {e}")
+                continue
+            self.transports.append(transport)
+
+    def stop(self):
+        """Stop accepting connections and close the open ones."""
+        self._stop.set()
+        self.sock.close()
+        for transport in self.transports:
+            transport.close()
+
+class LatencyProxy:
+    def __init__(self, target_host, target_port, rtt, host='127.0.0.1', port=0):
+        """
+        TCP proxy that delays traffic in both directions to simulate a slow link.
+
+        Args:
+            target_host: Host to forward connections to
+            target_port: Port to forward connections to
+            rtt: Simulated round-trip time in seconds (half is added in each direction)
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.target = (target_host, target_port)
+        self.delay = rtt / 2
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(100)
+        self.host, self.port = self.sock.getsockname()
+        self._stop = threading.Event()
+
+    def start(self):
+        """Accept connections on a background thread."""
+        threading.Thread(target=self._accept_loop, name='latency-proxy', daemon=True).start()
+        return self
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection(self.target)
+            except OSError:
+                client.close()
+                continue
+            for source, destination in ((client, upstream), (upstream, client)):
+                source.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._forward(source, destination)
+
+    def _forward(self, source, destination):
+        """Copy one direction of a connection, releasing each read after the delay."""
+        pending = queue.Queue()
+
+        def receive():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b''
+                pending.put((time.monotonic() + self.delay, data))
+                if not data:
+                    return
+
+        def send():
+            while True:
+                due, data = pending.get()
+                wait = due - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    if not data:
+                        destination.shutdown(socket.SHUT_WR)
+                        return
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=receive, daemon=True).start()
+        threading.Thread(target=send, daemon=True).start()
+
+    def stop(self):
+        """Stop accepting connections."""
+        self._stop.set()
+        self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local directory over SFTP for benchmarks and local runs.")
+    parser.add_argument('--root', required=True, help="Local directory exposed as the remote root")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on")
+    parser.add_argument('--port', type=int, default=2222, help="Port to listen on")
+    parser.add_argument('--username', default='test', help="Accepted username")
+    parser.add_argument('--password', default='test', help="Accepted password")
+    parser.add_argument('--rtt', type=float, default=0.0, help="Simulated round-trip time in seconds")
+    args = parser.parse_args()
+
+    if args.rtt:
+        server = SFTPTestServer(args.root, args.username, args.password).start()
+        proxy = LatencyProxy(server.host, server.port, args.rtt, host=args.host, port=args.port).start()
+        host, port = proxy.host, proxy.port
+    else:
+        server = SFTPTestServer(args.root, args.username, args.password, host=args.host, port=args.port).start()
+        host, port = server.host, server.port
+
+    print(f"Serving {server.root} over SFTP on {host}:{port} (user {args.username}, RTT {args.rtt * 1000:.0f} ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()